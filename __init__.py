@@ -21,5 +21,38 @@
 ## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 ## SOFTWARE.
 
-from .patterns import *
-from .task import *
+from . import lazy
+
+__getattr__, __dir__, __all__ = lazy.attach(
+    __name__,
+    submodules=[
+        'asynctask',
+        'batch',
+        'cache',
+        'checkpoint',
+        'config',
+        'containers',
+        'distributed',
+        'executor',
+        'export',
+        'filetask',
+        'instrument',
+        'log',
+        'manifest',
+        'mapreduce',
+        'patterns',
+        'pipeline',
+        'scheduler',
+        'serialization',
+        'shared',
+        'signatures',
+        'spill',
+        'stream',
+        'table',
+        'task'
+    ],
+    attributes=dict(
+        patterns=['T', 'S', 'RegistryMetaclassMixin', 'Container'],
+        task=['TaskStatus', 'TaskResult', 'BaseTask']
+    )
+)
@@ -0,0 +1,273 @@
+## -*- coding: UTF-8 -*-
+## asynctask.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import (
+    Optional, Any, AsyncIterator, Counter, Dict, Iterable, Iterator, Sequence, Tuple,
+    Union
+)
+
+import asyncio
+import collections
+from concurrent.futures import Executor
+from functools import partial
+from itertools import islice
+
+from .task import TaskStatus, TaskResult, BaseTask
+
+Task = Union['AsyncBaseTask', BaseTask]
+
+
+class AsyncBaseTask:
+    """Asynchronous counterpart of BaseTask, whose _preamble, _process_task
+    and _postamble are coroutines.  Run with await task.run(...) or
+    await task(...), or in bulk with AsyncTaskExecutor.
+    """
+
+    def __init__(self, result: Optional[TaskResult] = None) -> None:
+        self.result = result
+
+    @property
+    def result(self) -> Optional[TaskResult]:
+        """Getter for result"""
+        return self.__result
+
+    @result.setter
+    def result(self, value: Optional[TaskResult]) -> None:
+        """Setter for result"""
+        self.__result = value
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.run(*args, **kwargs)
+
+    async def _preamble(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Args:
+            N/A
+        Procedure:
+            Conduct necessary setup steps before the task is processed.
+        Preconditions:
+            N/A
+        """
+
+    async def _process_task(self) -> None:
+        """
+        Args:
+            N/A
+        Procedure:
+            Process this task.
+        Preconditions:
+            N/A
+        """
+        raise NotImplementedError(
+            '_process_task is not implemented for type %s'%type(self).__name__
+        )
+
+    async def _postamble(self) -> None:
+        """
+        Args:
+            N/A
+        Procedure:
+            Conduct necessary teardown tasks after task is processed.
+        """
+
+    async def run(self, *args: Any, **kwargs: Any) -> Optional[TaskResult]:
+        """
+        Args:
+            N/A
+        Returns:
+            @BaseTask.run
+        Preconditions:
+            N/A
+        """
+        await self._preamble(*args, **kwargs)
+        await self._process_task()
+        await self._postamble()
+        return self.result
+
+
+class AsyncTaskExecutor:
+    """Runs many AsyncBaseTasks (and BaseTasks, offloaded to a thread pool)
+    concurrently on the running event loop, with at most max_concurrency
+    tasks in flight, and yields their results as they complete along with
+    aggregated TaskStatus counts (see summary).  A task that raises yields
+    a TaskStatus.FAILURE result (see TaskResult.from_exception) instead of
+    stopping the batch.
+    """
+
+    def __init__(self,
+        max_concurrency: int = 64,
+        executor: Optional[Executor] = None
+    ) -> None:
+        """
+        Args:
+            max_concurrency => maximum number of tasks running at once
+            executor        => executor to run BaseTasks in (defaults to the
+                               event loop's default thread pool)
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.executor = executor
+        self._summary = collections.Counter()
+
+    @property
+    def summary(self) -> Counter[Optional[TaskStatus]]:
+        """Getter for counts of result statuses of the current (or last) run"""
+        return collections.Counter(self._summary)
+
+    async def run_task(self,
+        task: Task,
+        *args: Any,
+        **kwargs: Any
+    ) -> Optional[TaskResult]:
+        """
+        Args:
+            task    => AsyncBaseTask or BaseTask to run
+            args    => positional arguments to task.run
+            kwargs  => keyword arguments to task.run
+        Returns:
+            Result of running task, or a failure result if it raised.  A
+            BaseTask is run in executor so it does not block the event loop.
+        Preconditions:
+            N/A
+        """
+        try:
+            if isinstance(task, AsyncBaseTask):
+                return await task.run(*args, **kwargs)
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                partial(task.run, *args, **kwargs)
+            )
+        except Exception as exc:    #pylint: disable=W0703
+            return TaskResult.from_exception(exc)
+
+    def run(self,
+        tasks: Iterable[Task],
+        *args: Any,
+        **kwargs: Any
+    ) -> AsyncIterator[Tuple[int, Optional[TaskResult]]]:
+        """
+        Args:
+            tasks   => tasks to run
+            args    => positional arguments to every task.run
+            kwargs  => keyword arguments to every task.run
+        Returns:
+            Async iterator of (index, result) pairs in completion order,
+            where index is the position of the task in tasks.
+        Preconditions:
+            Called with a running event loop
+        """
+        return self._execute(
+            ((index, task, args) for index, task in enumerate(tasks)),
+            kwargs
+        )
+
+    def map(self,
+        task_cls: Any,
+        inputs: Iterable[Any],
+        **kwargs: Any
+    ) -> AsyncIterator[Tuple[int, Optional[TaskResult]]]:
+        """
+        Args:
+            task_cls    => task class to instantiate for each input
+            inputs      => inputs passed as the only positional argument to run
+            kwargs      => keyword arguments to every task.run
+        Returns:
+            @run
+        Preconditions:
+            task_cls can be instantiated without arguments
+        """
+        return self._execute(
+            ((index, task_cls(), (item,)) for index, item in enumerate(inputs)),
+            kwargs
+        )
+
+    def starmap(self,
+        task_cls: Any,
+        inputs: Iterable[Sequence[Any]],
+        **kwargs: Any
+    ) -> AsyncIterator[Tuple[int, Optional[TaskResult]]]:
+        """
+        Args:
+            task_cls    => task class to instantiate for each input
+            inputs      => sequences of positional arguments to run
+            kwargs      => keyword arguments to every task.run
+        Returns:
+            @run
+        Preconditions:
+            task_cls can be instantiated without arguments
+        """
+        return self._execute(
+            ((index, task_cls(), tuple(item)) for index, item in enumerate(inputs)),
+            kwargs
+        )
+
+    async def gather(self,
+        tasks: Iterable[Task],
+        *args: Any,
+        **kwargs: Any
+    ) -> Tuple[Optional[TaskResult], ...]:
+        """
+        Args:
+            @run
+        Returns:
+            Results of every task, in the order of tasks.
+        Preconditions:
+            Called with a running event loop
+        """
+        results = dict()
+        async for index, result in self.run(tasks, *args, **kwargs):
+            results[index] = result
+        return tuple(results[index] for index in range(len(results)))
+
+    async def _execute(self,
+        items: Iterator[Tuple[int, Task, Sequence[Any]]],
+        kwargs: Dict[str, Any]
+    ) -> AsyncIterator[Tuple[int, Optional[TaskResult]]]:
+        """
+        Args:
+            items   => (index, task, args) items to run
+            kwargs  => keyword arguments to every task.run
+        Returns:
+            Async iterator of (index, result) pairs in completion order.
+            Items are consumed lazily as running tasks complete.
+        Preconditions:
+            N/A
+        """
+        self._summary = collections.Counter()
+        pending = dict()
+        try:
+            while True:
+                free = self.max_concurrency - len(pending)
+                for index, task, args in islice(items, free):
+                    future = asyncio.ensure_future(self.run_task(task, *args, **kwargs))
+                    pending[future] = index
+                if not pending:
+                    return
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    result = future.result()
+                    self._summary[None if result is None else result.status] += 1
+                    yield index, result
+        finally:
+            for future in pending:
+                future.cancel()
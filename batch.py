@@ -0,0 +1,143 @@
+## -*- coding: UTF-8 -*-
+## batch.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Iterable, Iterator, Tuple
+
+import collections
+
+from .patterns import Container
+from .task import TaskStatus, TaskResult, BaseTask
+
+
+class BatchTask(BaseTask):
+    """Task that processes a stream of inputs with a single setup and
+    teardown: _preamble runs once with the arguments of the batch,
+    _process_task(item) runs for each input and sets result as for a
+    single run, and _postamble runs once at the end (even if the batch
+    is stopped early).  Expensive setup (opening databases, loading
+    lookup tables, compiling patterns) is therefore paid once per batch
+    instead of once per input.
+
+    An exception raised while processing one input becomes that input's
+    failure result (see TaskResult.from_exception) and the batch moves on
+    to the next input; an input that sets no result succeeds with no
+    state.  Once the batch ends, result holds the batch summary: status
+    aggregated over the inputs (see TaskStatus.aggregate), and in state
+    the number of inputs processed, summary (counts of each status) and
+    failed (indexes of inputs that failed).  If the consumer stops early
+    state.cancelled is set and the status is PARTIAL_SUCCESS.
+    """
+
+    def _process_task(self, item: Any) -> None:   #pylint: disable=W0221
+        """
+        Args:
+            item    => input to process
+        Procedure:
+            Process one input of the batch and set result.
+        Preconditions:
+            _preamble has been called
+        """
+        raise NotImplementedError(
+            '_process_task is not implemented for type %s'%type(self).__name__
+        )
+
+    def batch(self,
+        inputs: Iterable[Any],
+        *args: Any,
+        **kwargs: Any
+    ) -> Iterator[Tuple[int, TaskResult]]:
+        """
+        Args:
+            inputs  => inputs to process
+            args    => positional arguments to _preamble
+            kwargs  => keyword arguments to _preamble
+        Returns:
+            Iterator of (index, result) pairs in input order, where index
+            is the position of the input in inputs.  Nothing runs until
+            the first pair is requested, and result is set to the batch
+            summary once it is exhausted or closed.
+        Preconditions:
+            N/A
+        """
+        self._preamble(*args, **kwargs)
+        yield from self._process_batch(inputs)
+
+    def run(self,                       #pylint: disable=W0221
+        inputs: Iterable[Any],
+        *args: Any,
+        **kwargs: Any
+    ) -> Optional[TaskResult]:
+        """
+        Args:
+            @batch
+        Returns:
+            Batch summary, with the result of every input collected into
+            the list state.results.
+        Preconditions:
+            N/A
+        """
+        results = [result for _, result in self.batch(inputs, *args, **kwargs)]
+        self.result.state.results = results
+        return self.result
+
+    def _process_batch(self, inputs: Iterable[Any]) -> Iterator[Tuple[int, TaskResult]]:
+        """
+        Args:
+            inputs  => inputs to process
+        Returns:
+            @batch
+        Preconditions:
+            _preamble has been called
+        """
+        summary = collections.Counter()
+        failed = list()
+        completed = False
+        try:
+            for index, item in enumerate(inputs):
+                self.result = None
+                try:
+                    self._process_task(item)
+                    result = self.result
+                    if result is None:
+                        result = TaskResult(TaskStatus.SUCCESS)
+                except Exception as exc:    #pylint: disable=W0703
+                    result = TaskResult.from_exception(exc)
+                summary[result.status] += 1
+                if result.status == TaskStatus.FAILURE:
+                    failed.append(index)
+                yield index, result
+            completed = True
+        finally:
+            self.result = None
+            self._postamble()
+            self.result = TaskResult(
+                TaskStatus.aggregate(summary),
+                Container(
+                    inputs=sum(summary.values()),
+                    summary=summary,
+                    failed=failed
+                )
+            )
+            if not completed:
+                self.result.state.cancelled = True
+                self.result.status = TaskStatus.PARTIAL_SUCCESS
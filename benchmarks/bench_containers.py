@@ -0,0 +1,81 @@
+## -*- coding: UTF-8 -*-
+## bench_containers.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+"""Benchmark memory use and access time of Container against schema-backed
+containers created by make_container_type.  Run with:
+    python -m <package>.benchmarks.bench_containers
+"""
+
+from typing import Any, Callable, List
+
+import tracemalloc
+from timeit import timeit
+
+from ..patterns import Container
+from ..containers import make_container_type
+
+FIELDS = ('inode', 'sequence', 'flags', 'size', 'name', 'parent', 'created', 'modified')
+RECORDS = 100000
+ACCESSES = 1000000
+
+Record = make_container_type('Record', FIELDS)
+
+
+def build(factory: Callable[..., Any]) -> List[Any]:
+    """Create RECORDS containers with factory."""
+    return [
+        factory(
+            inode=i, sequence=1, flags=1, size=i * 1024, name='file%d'%i,
+            parent=5, created=1.0, modified=2.0
+        ) for i in range(RECORDS)
+    ]
+
+
+def measure_memory(factory: Callable[..., Any]) -> float:
+    """Bytes allocated per container created with factory."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build(factory)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return (after - before) / RECORDS
+
+
+def main() -> None:
+    print('%-12s %14s %14s %14s %14s'%(
+        'type', 'bytes/record', 'attr (ns)', 'item (ns)', 'get (ns)'
+    ))
+    for label, factory in (('Container', Container), ('Record', Record)):
+        record = factory(dict(zip(FIELDS, range(len(FIELDS)))))
+        print('%-12s %14.1f %14.1f %14.1f %14.1f'%(
+            label,
+            measure_memory(factory),
+            timeit(lambda: record.size, number=ACCESSES) / ACCESSES * 1e9,
+            timeit(lambda: record['size'], number=ACCESSES) / ACCESSES * 1e9,
+            timeit(lambda: record.get('size'), number=ACCESSES) / ACCESSES * 1e9
+        ))
+
+
+if __name__ == '__main__':
+    main()
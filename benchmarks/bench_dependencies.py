@@ -0,0 +1,106 @@
+## -*- coding: UTF-8 -*-
+## bench_dependencies.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+"""Benchmark cold-start time of importing a generated set of vendored
+dependencies from a loose source directory (without cached bytecode, as
+on read-only media) against a bundle from build_dependency_bundle.  Run
+with:
+    python -m <package>.benchmarks.bench_dependencies [packages] [modules]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from ..config import DEPENDENCY_BUNDLE_NAME, build_dependency_bundle
+
+PACKAGE = __package__.split('.')[0]
+PACKAGE_PARENT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+REPEAT = 5
+
+
+def generate(dirpath: str, packages: int, modules: int) -> None:
+    """Write packages vendored packages of modules modules each."""
+    for package in range(packages):
+        package_dir = os.path.join(dirpath, 'vendored%d'%package)
+        os.makedirs(package_dir)
+        with open(os.path.join(package_dir, '__init__.py'), 'w') as init_file:
+            init_file.write(''.join(
+                'from . import module%d\n'%module for module in range(modules)
+            ))
+        for module in range(modules):
+            module_path = os.path.join(package_dir, 'module%d.py'%module)
+            with open(module_path, 'w') as module_file:
+                module_file.write(''.join(
+                    'def function%d(value):\n'
+                    '    """Docstring of function %d."""\n'
+                    '    return [value * %d for _ in range(10)]\n\n'%(i, i, i)
+                    for i in range(50)
+                ))
+
+
+def cold_start(dirpath: str, packages: int) -> float:
+    """Best wall time of a fresh interpreter including dirpath and importing
+    every vendored package, without writing bytecode."""
+    code = 'from %s.config import include_dependencies_in_path\n' \
+        'include_dependencies_in_path(%r)\n' \
+        'import %s'%(
+            PACKAGE, dirpath,
+            ', '.join('vendored%d'%package for package in range(packages))
+        )
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, '-B', '-c', code],
+            cwd=PACKAGE_PARENT,
+            check=True,
+            env=dict(os.environ, PYTHONPATH=PACKAGE_PARENT)
+        )
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main() -> None:
+    packages = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    modules = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as directory:
+        dirpath = os.path.join(directory, 'lib')
+        generate(dirpath, packages, modules)
+        loose = cold_start(dirpath, packages)
+        build_dependency_bundle(dirpath)
+        assert os.path.exists(os.path.join(dirpath, DEPENDENCY_BUNDLE_NAME))
+        bundled = cold_start(dirpath, packages)
+    print('%d packages of %d modules'%(packages, modules))
+    print('%-20s %12s'%('source', 'seconds'))
+    print('%-20s %12.3f'%('loose directory', loose))
+    print('%-20s %12.3f'%('bundle', bundled))
+
+
+if __name__ == '__main__':
+    main()
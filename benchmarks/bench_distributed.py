@@ -0,0 +1,76 @@
+## -*- coding: UTF-8 -*-
+## bench_distributed.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+"""Benchmark throughput of a LocalCluster (broker plus worker processes
+simulating nodes) from one worker to one per core, on CPU-bound tasks and
+on empty tasks (measuring per-task broker overhead).  Run with:
+    python -m <package>.benchmarks.bench_distributed [tasks]
+"""
+
+import os
+import sys
+import time
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult, BaseTask
+from ..distributed import LocalCluster
+
+
+class HashTask(BaseTask):
+    """Repeatedly mixes an integer (CPU-bound, holds the GIL)."""
+
+    def _preamble(self, rounds: int) -> None:
+        """@BaseTask._preamble"""
+        self.rounds = rounds
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        value = 0
+        for index in range(self.rounds):
+            value = (value * 31 + index) & 0xffffffff
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(value=value))
+
+
+def throughput(workers: int, tasks: int, rounds: int) -> float:
+    """Tasks per second on a cluster of workers."""
+    with LocalCluster(workers=workers, prefetch=4) as cluster:
+        start = time.perf_counter()
+        for _, result in cluster.broker.run((HashTask() for _ in range(tasks)), rounds):
+            assert result.status == TaskStatus.SUCCESS
+        return tasks / (time.perf_counter() - start)
+
+
+def main() -> None:
+    tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print('%-8s %16s %10s %16s'%('workers', 'cpu tasks/s', 'speedup', 'empty tasks/s'))
+    baseline = None
+    for workers in range(1, (os.cpu_count() or 1) + 1):
+        rate = throughput(workers, tasks, 200000)
+        baseline = baseline or rate
+        print('%-8d %16.1f %10.2f %16.1f'%(
+            workers, rate, rate / baseline, throughput(workers, tasks * 10, 0)
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+## -*- coding: UTF-8 -*-
+## bench_export.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+"""Benchmark lazy against eager Container conversion, and streaming
+export against materializing the encoded text, for a deep tree (nested
+mappings) and a wide table (a list of flat records) of the same number of
+leaves.  Reports time and peak traced memory.  Run with:
+    python -m <package>.benchmarks.bench_export [million leaves]
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+
+import csv
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from ..containers import LazyContainer, to_container
+from ..export import flatten, write_csv, write_json, write_jsonl
+
+FIELDS = 10
+FANOUT = 8
+
+
+def tree_depth(leaves: int) -> int:
+    """Levels of a tree with FANOUT children per node and >= leaves leaves."""
+    depth = 1
+    while FANOUT ** (depth - 1) * FIELDS < leaves:
+        depth += 1
+    return depth
+
+
+def deep_tree(leaves: int) -> Dict[str, Any]:
+    """Nested mappings with FANOUT children per node and >= leaves leaves."""
+    depth = tree_depth(leaves)
+    def node(level: int) -> Dict[str, Any]:
+        if level == depth:
+            return {'field%d'%index: index * 0.5 for index in range(FIELDS)}
+        return {'child%d'%index: node(level + 1) for index in range(FANOUT)}
+    return node(1)
+
+
+def wide_table(leaves: int) -> List[Dict[str, Any]]:
+    """Records of FIELDS leaves, one of them in a nested mapping."""
+    return [
+        dict(
+            {'field%d'%index: index for index in range(FIELDS - 2)},
+            name='record%d'%record,
+            host=dict(name='ws%d'%(record % 100))
+        )
+        for record in range(leaves // FIELDS)
+    ]
+
+
+def measure(function: Callable[[], Any]) -> Tuple[float, float]:
+    """Seconds taken by function, and peak traced MiB in a second run."""
+    gc.collect()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak / (1 << 20)
+
+
+def lazy_access(data: Any) -> Any:
+    container = LazyContainer(data if isinstance(data, dict) else dict(rows=data))
+    return container.get('child0', container).get('field1')
+
+
+def eager_access(data: Any) -> Any:
+    container = to_container(data if isinstance(data, dict) else dict(rows=data))
+    return container.get('child0', container).get('field1')
+
+
+def dump_json(data: Any) -> None:
+    with open(os.devnull, 'w', encoding='utf-8') as stream:
+        stream.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+
+
+def dump_jsonl(data: List[Dict[str, Any]]) -> None:
+    with open(os.devnull, 'w', encoding='utf-8') as stream:
+        stream.write(''.join(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+            for record in data
+        ))
+
+
+def dump_csv(data: List[Dict[str, Any]]) -> None:
+    rows = [dict(flatten(record)) for record in data]
+    with open(os.devnull, 'w', encoding='utf-8', newline='') as stream:
+        writer = csv.DictWriter(stream, list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_cases(name: str, data: Any) -> None:
+    """Print time and peak memory of each case over data."""
+    cases = [
+        ('convert eager', eager_access),
+        ('convert lazy', lazy_access),
+        ('json dumps', dump_json),
+        ('json stream', lambda data: write_json(data, os.devnull))
+    ]
+    if isinstance(data, list):
+        cases.extend((
+            ('jsonl dumps', dump_jsonl),
+            ('jsonl stream', lambda data: write_jsonl(data, os.devnull)),
+            ('csv rows', dump_csv),
+            ('csv stream', lambda data: write_csv(data, os.devnull))
+        ))
+    print(name)
+    print('  %-16s %10s %12s'%('case', 'time (s)', 'peak (MiB)'))
+    for case, function in cases:
+        elapsed, peak = measure(lambda: function(data))   #pylint: disable=W0640
+        print('  %-16s %10.2f %12.1f'%(case, elapsed, peak))
+
+
+def main() -> None:
+    leaves = int(float(sys.argv[1]) * 1000000) if len(sys.argv) > 1 else 2000000
+    depth = tree_depth(leaves)
+    run_cases('deep (%d levels, %d leaves)'%(
+        depth, FANOUT ** (depth - 1) * FIELDS
+    ), deep_tree(leaves))
+    wide = wide_table(leaves)
+    run_cases('wide (%d records, %d leaves)'%(len(wide), len(wide) * FIELDS), wide)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+## -*- coding: UTF-8 -*-
+## bench_filetask.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+"""Benchmark throughput of MappedFileTask chunk iteration against buffered
+read() and readinto() loops, checksumming a generated file.  Run with:
+    python -m <package>.benchmarks.bench_filetask [megabytes]
+"""
+
+from typing import Callable
+
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult
+from ..filetask import MappedFileTask
+
+CHUNK_SIZES = (4096, 65536, 1 << 20)
+
+
+class ChecksumTask(MappedFileTask):
+    """CRC32 of the input file computed over chunks of the mapping."""
+
+    def _preamble(self, path: str, chunk_size: int) -> None:   #pylint: disable=W0221
+        """@MappedFileTask._preamble"""
+        super()._preamble(path)
+        self.chunk_size = chunk_size
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        checksum = 0
+        for _, chunk in self.chunks(self.chunk_size):
+            checksum = zlib.crc32(chunk, checksum)
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(checksum=checksum))
+
+
+def mapped(path: str, chunk_size: int) -> int:
+    return ChecksumTask(drop_behind=True).run(path, chunk_size).state.checksum
+
+
+def buffered_read(path: str, chunk_size: int) -> int:
+    checksum = 0
+    with open(path, 'rb') as input_file:
+        for block in iter(lambda: input_file.read(chunk_size), b''):
+            checksum = zlib.crc32(block, checksum)
+    return checksum
+
+
+def buffered_readinto(path: str, chunk_size: int) -> int:
+    checksum = 0
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as input_file:
+        while True:
+            count = input_file.readinto(buffer)
+            if not count:
+                break
+            checksum = zlib.crc32(view[:count], checksum)
+    return checksum
+
+
+def throughput(reader: Callable[[str, int], int], path: str, chunk_size: int) -> float:
+    """Best of three MiB/s of reader over path."""
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        reader(path, chunk_size)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return os.path.getsize(path) / best / (1 << 20)
+
+
+def main() -> None:
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'image.bin')
+        with open(path, 'wb') as image_file:
+            for _ in range(megabytes):
+                image_file.write(os.urandom(1 << 20))
+        assert mapped(path, 65536) == buffered_read(path, 65536)
+        print('%-12s %14s %14s %14s'%('chunk size', 'read (MiB/s)', 'readinto', 'mmap'))
+        for chunk_size in CHUNK_SIZES:
+            print('%-12d %14.1f %14.1f %14.1f'%(
+                chunk_size,
+                throughput(buffered_read, path, chunk_size),
+                throughput(buffered_readinto, path, chunk_size),
+                throughput(mapped, path, chunk_size)
+            ))
+
+
+if __name__ == '__main__':
+    main()
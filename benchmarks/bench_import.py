@@ -0,0 +1,94 @@
+## -*- coding: UTF-8 -*-
+## bench_import.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+"""Benchmark import time of the package and its core modules with
+python -X importtime, failing (exit status 1) if any exceeds its budget
+in BUDGETS scaled by the optional argument (for slower machines).  Run
+with:
+    python -m <package>.benchmarks.bench_import [budget scale]
+"""
+
+from typing import Dict
+
+import os
+import subprocess
+import sys
+
+PACKAGE = __package__.split('.')[0]
+PACKAGE_PARENT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+REPEAT = 7
+
+# Budgets in microseconds of cumulative import time of each statement
+# (formatted with the package name), including the standard library
+# modules it imports
+BUDGETS = {
+    'import {0}': 10000,
+    'from {0} import *': 60000,
+    'import {0}.task': 60000,
+    'import {0}.executor': 90000
+}
+
+
+def import_time(statement: str) -> int:
+    """Best cumulative time of package modules imported by statement at
+    top level, over REPEAT fresh interpreters."""
+    best = None
+    for _ in range(REPEAT):
+        stderr = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', statement],
+            cwd=PACKAGE_PARENT,
+            check=True,
+            stderr=subprocess.PIPE,
+            env=dict(os.environ, PYTHONPATH=PACKAGE_PARENT)
+        ).stderr.decode('utf-8')
+        cumulative = 0
+        for line in stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            _, total, name = line.split('|')
+            if name[1:].split('.')[0] == PACKAGE:
+                cumulative += int(total)
+        best = cumulative if best is None else min(best, cumulative)
+    return best
+
+
+def main() -> None:
+    scale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    failed: Dict[str, int] = dict()
+    print('%-36s %14s %14s'%('statement', 'import (us)', 'budget (us)'))
+    for statement, budget in BUDGETS.items():
+        statement = statement.format(PACKAGE)
+        elapsed = import_time(statement)
+        budget = int(budget * scale)
+        print('%-36s %14d %14d'%(statement, elapsed, budget))
+        if elapsed > budget:
+            failed[statement] = elapsed
+    if failed:
+        print('Import time regressed: %s'%', '.join(sorted(failed)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+## -*- coding: UTF-8 -*-
+## bench_log.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+"""Benchmark the per-call cost on the logging thread of a synchronous
+FileHandler formatted with LOGGING_DEFAULTS against configure_logging
+(text and JSON lines), for a log-heavy parsing loop.  Reports the CPU time
+of the producing thread per call, and its wall time per call (which on
+few cores includes time the writer thread holds the GIL).  Run with:
+    python -m <package>.benchmarks.bench_log [records]
+"""
+
+from typing import Callable, Tuple
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from ..config import LOGGING_DEFAULTS
+from ..log import configure_logging
+
+
+def producer_time(logger: logging.Logger, records: int) -> Tuple[float, float]:
+    """CPU and wall seconds spent in records logging calls."""
+    cpu = time.thread_time()
+    wall = time.perf_counter()
+    for index in range(records):
+        logger.info('parsed record %d at offset %d', index, index * 1024)
+    return time.thread_time() - cpu, time.perf_counter() - wall
+
+
+def synchronous(filename: str, records: int) -> Tuple[float, float]:
+    logger = logging.getLogger('bench.synchronous')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.FileHandler(filename)
+    handler.setFormatter(logging.Formatter(
+        LOGGING_DEFAULTS['format'],
+        LOGGING_DEFAULTS['datefmt']
+    ))
+    logger.addHandler(handler)
+    try:
+        return producer_time(logger, records)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def queued(structured: bool) -> Callable[[str, int], Tuple[float, float]]:
+    def run(filename: str, records: int) -> Tuple[float, float]:
+        name = 'bench.queued.%s'%structured
+        logging.getLogger(name).propagate = False
+        writer = configure_logging(filename=filename, structured=structured, logger=name)
+        try:
+            return producer_time(logging.getLogger(name), records)
+        finally:
+            writer.stop()
+    return run
+
+
+def main() -> None:
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print('%-20s %14s %14s %14s'%('handler', 'cpu us/call', 'wall us/call', 'total (s)'))
+    with tempfile.TemporaryDirectory() as directory:
+        for label, run in (
+            ('FileHandler', synchronous),
+            ('queued text', queued(False)),
+            ('queued JSON lines', queued(True))
+        ):
+            filename = os.path.join(directory, '%s.log'%label.replace(' ', '_'))
+            start = time.perf_counter()
+            cpu, wall = run(filename, records)
+            total = time.perf_counter() - start
+            print('%-20s %14.2f %14.2f %14.2f'%(
+                label, cpu / records * 1e6, wall / records * 1e6, total
+            ))
+
+
+if __name__ == '__main__':
+    main()
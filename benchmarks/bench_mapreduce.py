@@ -0,0 +1,106 @@
+## -*- coding: UTF-8 -*-
+## bench_mapreduce.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+"""Benchmark scaling of SplittableTask from one worker process to one per
+core, parsing a generated CSV file split into record-aligned byte ranges.
+Run with:
+    python -m <package>.benchmarks.bench_mapreduce [megabytes]
+"""
+
+from typing import Any, Iterable, Sequence
+
+import os
+import sys
+import tempfile
+import time
+
+from ..patterns import Container
+from ..mapreduce import split_records, SplittableTask
+
+CHUNK_SIZE = 1 << 20
+
+
+class ParseTask(SplittableTask):
+    """Parses comma separated records and sums their size column."""
+
+    def _preamble(self, path: str) -> None:
+        """@BaseTask._preamble"""
+        self.path = path
+
+    def _split(self) -> Iterable[Any]:
+        """@SplittableTask._split"""
+        return split_records(self.path, CHUNK_SIZE)
+
+    def _process_chunk(self, chunk: Any) -> Container:
+        """@SplittableTask._process_chunk"""
+        offset, length = chunk
+        with open(self.path, 'rb') as input_file:
+            input_file.seek(offset)
+            data = input_file.read(length)
+        total = 0
+        records = 0
+        for line in data.splitlines():
+            fields = line.split(b',')
+            total += int(fields[2])
+            records += 1
+        return Container(total=total, records=records)
+
+    def _reduce(self, states: Sequence[Container]) -> Container:
+        """@SplittableTask._reduce"""
+        return Container(
+            total=sum(state.total for state in states),
+            records=sum(state.records for state in states)
+        )
+
+
+def generate(path: str, megabytes: int) -> None:
+    """Write about megabytes MiB of records to path."""
+    with open(path, 'wb') as output_file:
+        record = 0
+        while output_file.tell() < megabytes << 20:
+            output_file.write(b''.join(
+                b'%d,file%d.txt,%d,2019-01-01T00:00:00\n'%(i, i, i * 512)
+                for i in range(record, record + 10000)
+            ))
+            record += 10000
+
+
+def main() -> None:
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'records.csv')
+        generate(path, megabytes)
+        print('%-8s %12s %10s %12s'%('workers', 'seconds', 'speedup', 'records'))
+        baseline = None
+        for workers in range(1, (os.cpu_count() or 1) + 1):
+            start = time.perf_counter()
+            result = ParseTask(max_workers=workers).run(path)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print('%-8d %12.3f %10.2f %12d'%(
+                workers, elapsed, baseline / elapsed, result.state.records
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+## -*- coding: UTF-8 -*-
+## bench_serialization.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+"""Benchmark serialization of TaskResults carrying a bytes payload from
+1 KiB up to a maximum size (1 GiB with enough memory) with plain pickle
+against out-of-band serialization, both in process (dumps then loads) and
+echoed through a pipe to a worker process.  Run with:
+    python -m <package>.benchmarks.bench_serialization [max megabytes]
+"""
+
+from typing import Any, Callable
+
+import gc
+import pickle
+import sys
+import time
+from multiprocessing import Pipe, Process
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult
+from .. import serialization
+
+
+def plain_round_trip(result: TaskResult) -> Any:
+    return pickle.loads(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def out_of_band_round_trip(result: TaskResult) -> Any:
+    data, buffers = serialization.dumps(result)
+    return serialization.loads(data, buffers)
+
+
+def plain_send(connection: Any, obj: Any) -> None:
+    connection.send(obj)
+
+
+def plain_recv(connection: Any) -> Any:
+    return connection.recv()
+
+
+def echo(connection: Any, out_of_band: bool) -> None:
+    """Echo objects until None is received."""
+    send = serialization.send if out_of_band else plain_send
+    recv = serialization.recv if out_of_band else plain_recv
+    while True:
+        obj = recv(connection)
+        send(connection, obj)
+        if obj is None:
+            return
+
+
+def timed(function: Callable[[], Any], repeat: int) -> float:
+    """Best time of repeat calls of function, in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        gc.collect()
+    return best * 1e3
+
+
+def measure(pipes: Any, size: int) -> None:
+    """Print timings for a result carrying a payload of size bytes."""
+    result = TaskResult(TaskStatus.SUCCESS, Container(image=b'\xa5' * size, name='image'))
+    repeat = 20 if size < 1 << 20 else 3
+    plain, out_of_band = pipes[False][0], pipes[True][0]
+    print('%-12d %14.3f %14.3f %14.3f %14.3f'%(
+        size,
+        timed(lambda: plain_round_trip(result), repeat),
+        timed(lambda: out_of_band_round_trip(result), repeat),
+        timed(lambda: (plain.send(result), plain.recv()), repeat),
+        timed(lambda: (
+            serialization.send(out_of_band, result),
+            serialization.recv(out_of_band)
+        ), repeat)
+    ))
+
+
+def main() -> None:
+    max_size = (int(sys.argv[1]) if len(sys.argv) > 1 else 256) << 20
+    sizes = list()
+    size = 1 << 10
+    while size <= max_size:
+        sizes.append(size)
+        size <<= 4
+    if sizes[-1] != max_size:
+        sizes.append(max_size)
+    pipes = dict()
+    for out_of_band in (False, True):
+        parent, child = Pipe()
+        worker = Process(target=echo, args=(child, out_of_band), daemon=True)
+        worker.start()
+        pipes[out_of_band] = (parent, worker)
+    print('%-12s %14s %14s %14s %14s'%(
+        'payload', 'pickle (ms)', 'oob (ms)', 'pickle pipe', 'oob pipe'
+    ))
+    for size in sizes:
+        measure(pipes, size)
+    pipes[False][0].send(None)
+    pipes[False][0].recv()
+    serialization.send(pipes[True][0], None)
+    serialization.recv(pipes[True][0])
+    for _, worker in pipes.values():
+        worker.join()
+
+
+if __name__ == '__main__':
+    main()
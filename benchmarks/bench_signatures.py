@@ -0,0 +1,96 @@
+## -*- coding: UTF-8 -*-
+## bench_signatures.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+"""Benchmark signature dispatch through RegistryMetaclassMixin.identify
+against trying every registered class in turn, as the number of
+registered classes grows.  Run with:
+    python -m <package>.benchmarks.bench_signatures
+"""
+
+from typing import Any, List
+
+import random
+from timeit import timeit
+
+from ..patterns import RegistryMetaclassMixin
+
+CLASS_COUNTS = (10, 100, 1000, 10000)
+LOOKUPS = 2000
+
+
+def build_registry(count: int, rng: random.Random) -> Any:
+    """Create a registry metaclass with count signature-bearing classes."""
+    class BenchMetaClass(RegistryMetaclassMixin, type):
+        _REGISTRY = dict()
+        _SIGNATURE_ATTRIBUTE = 'signatures'
+
+        @classmethod
+        def _add_class(cls, name: str, new_cls: Any) -> None:
+            cls._register_class(name, new_cls)
+
+    for i in range(count):
+        offset = rng.choice((0, 0, 0, 4, 8, 512))
+        pattern = bytes(rng.getrandbits(8) for _ in range(rng.randint(4, 8)))
+        BenchMetaClass('Artifact%d'%i, tuple(), dict(signatures=((offset, pattern),)))
+    return BenchMetaClass
+
+
+def linear_identify(classes: List[Any], buffer: bytes) -> List[Any]:
+    """Baseline: try every class's signatures against buffer."""
+    return [
+        new_cls for new_cls in classes \
+        for offset, pattern in new_cls.signatures \
+        if buffer[offset:offset + len(pattern)] == pattern
+    ]
+
+
+def main() -> None:
+    rng = random.Random(0)
+    print('%8s %16s %16s'%('classes', 'identify (us)', 'linear (us)'))
+    for count in CLASS_COUNTS:
+        metaclass = build_registry(count, rng)
+        classes = list(metaclass.registry().values())
+        buffers = list()
+        for new_cls in rng.sample(classes, min(len(classes), 100)):
+            offset, pattern = new_cls.signatures[0]
+            buffer = bytearray(rng.getrandbits(8) for _ in range(1024))
+            buffer[offset:offset + len(pattern)] = pattern
+            buffers.append(bytes(buffer))
+        metaclass.signature_matcher()
+        identify_time = timeit(
+            lambda: [metaclass.identify(buffer) for buffer in buffers],
+            number=LOOKUPS // len(buffers)
+        )
+        linear_time = timeit(
+            lambda: [linear_identify(classes, buffer) for buffer in buffers],
+            number=max(1, LOOKUPS // len(buffers) // max(1, count // 100))
+        ) * max(1, count // 100)
+        print('%8d %16.2f %16.2f'%(
+            count,
+            identify_time / LOOKUPS * 1e6,
+            linear_time / LOOKUPS * 1e6
+        ))
+
+
+if __name__ == '__main__':
+    main()
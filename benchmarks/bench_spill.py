@@ -0,0 +1,80 @@
+## -*- coding: UTF-8 -*-
+## bench_spill.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+"""Benchmark peak memory and time of accumulating task state in a Container
+against a SpillContainer with a fixed memory limit, writing blocks of
+output and then reading every block back.  Run with:
+    python -m <package>.benchmarks.bench_spill [megabytes] [limit megabytes]
+"""
+
+from typing import Any, Callable, Tuple
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from ..patterns import Container
+from ..spill import SpillContainer
+
+BLOCK_SIZE = 1 << 16
+
+
+def accumulate(make_state: Callable[[], Any], blocks: int) -> Tuple[float, float, int]:
+    """Seconds to write and read blocks, and peak traced bytes."""
+    tracemalloc.start()
+    try:
+        state = make_state()
+        start = time.perf_counter()
+        for index in range(blocks):
+            state['block_%d'%index] = os.urandom(BLOCK_SIZE)
+        written = time.perf_counter()
+        total = sum(len(state['block_%d'%index]) for index in range(blocks))
+        read = time.perf_counter()
+        assert total == blocks * BLOCK_SIZE
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    if isinstance(state, SpillContainer):
+        state.close()
+    return written - start, read - written, peak
+
+
+def main() -> None:
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    blocks = megabytes * (1 << 20) // BLOCK_SIZE
+    with tempfile.TemporaryDirectory() as directory:
+        print('%-16s %10s %10s %12s'%('state', 'write (s)', 'read (s)', 'peak (MiB)'))
+        for name, make_state in (
+            ('Container', Container),
+            ('SpillContainer', lambda: SpillContainer(
+                memory_limit=limit << 20, directory=directory
+            ))
+        ):
+            write, read, peak = accumulate(make_state, blocks)
+            print('%-16s %10.2f %10.2f %12.1f'%(name, write, read, peak / (1 << 20)))
+
+
+if __name__ == '__main__':
+    main()
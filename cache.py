@@ -0,0 +1,384 @@
+## -*- coding: UTF-8 -*-
+## cache.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Dict, Iterable, Sequence
+
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from threading import Lock
+
+from .patterns import Container
+from .task import TaskStatus, TaskResult
+
+FINGERPRINTS = ('mtime', 'content')
+
+
+class ResultCache:
+    """Content-addressed cache of TaskResults (status, state and metrics).
+    Results are keyed on the task class, its configuration (see
+    CachedTaskMixin._cache_identity), its run arguments, an optional
+    cache_version of the task and a fingerprint of each declared input
+    file: its path, size and mtime ('mtime'), or the SHA-256 digest of its
+    contents ('content').  Results are kept pickled in an in-memory LRU of
+    max_entries and, if directory is given, in an on-disk store shared
+    across processes that evicts least recently used results once it
+    exceeds max_bytes.  Only results with a status in statuses (SUCCESS
+    by default) are cached.  Hit and miss counts are kept in stats.
+    """
+
+    def __init__(self,
+        max_entries: int = 1024,
+        directory: Optional[str] = None,
+        max_bytes: int = 1 << 30,
+        statuses: Iterable[TaskStatus] = (TaskStatus.SUCCESS,),
+        fingerprint: str = 'mtime'
+    ) -> None:
+        """
+        Args:
+            max_entries => maximum number of results in memory
+            directory   => directory of on-disk store (None for memory only)
+            max_bytes   => maximum size of on-disk store
+            statuses    => statuses of results to cache
+            fingerprint => how input files are fingerprinted (mtime or content)
+        """
+        if fingerprint not in FINGERPRINTS:
+            raise ValueError('Unknown fingerprint %s'%fingerprint)
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.statuses = frozenset(statuses)
+        self.fingerprint = fingerprint
+        self.stats = Container(
+            hits=0,
+            memory_hits=0,
+            disk_hits=0,
+            misses=0,
+            stores=0,
+            evictions=0
+        )
+        self._memory = OrderedDict()
+        self._lock = Lock()
+        self._disk_bytes = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def hit_rate(self) -> float:
+        """Getter for fraction of lookups that were hits"""
+        lookups = self.stats.hits + self.stats.misses
+        return self.stats.hits / lookups if lookups else 0.0
+
+    def key(self,
+        task: Any,
+        args: Sequence[Any],
+        kwargs: Dict[str, Any],
+        inputs: Iterable[str] = tuple()
+    ) -> Optional[str]:
+        """
+        Args:
+            task    => task being run
+            args    => positional arguments to task.run
+            kwargs  => keyword arguments to task.run
+            inputs  => paths of input files of the run
+        Returns:
+            Hex cache key of the run, None if the arguments or the task's
+            _cache_identity cannot be pickled (the run is then not
+            cacheable).
+        Preconditions:
+            N/A
+        """
+        digest = hashlib.sha256()
+        identity = getattr(task, '_cache_identity', None)
+        try:
+            digest.update(pickle.dumps((
+                type(task).__module__,
+                type(task).__qualname__,
+                getattr(task, 'cache_version', None),
+                None if identity is None else identity(),
+                tuple(args),
+                sorted(kwargs.items())
+            ), protocol=4))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None
+        for path in inputs:
+            digest.update(self._fingerprint(path))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[TaskResult]:
+        """
+        Args:
+            key => cache key
+        Returns:
+            Copy of cached result for key, None if not cached.
+        Preconditions:
+            N/A
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.stats.hits += 1
+                self.stats.memory_hits += 1
+                return pickle.loads(data)
+        data = self._read(key)
+        with self._lock:
+            if data is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            self.stats.disk_hits += 1
+            self._remember(key, data)
+        return pickle.loads(data)
+
+    def put(self, key: str, result: Optional[TaskResult]) -> bool:
+        """
+        Args:
+            key     => cache key
+            result  => result to cache
+        Returns:
+            True if result was cached, False if its status is not cached or
+            it cannot be pickled.
+        Preconditions:
+            N/A
+        """
+        if result is None or result.status not in self.statuses:
+            return False
+        try:
+            data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+        with self._lock:
+            self._remember(key, data)
+            self.stats.stores += 1
+        self._write(key, data)
+        return True
+
+    def clear(self) -> None:
+        """Remove every cached result from memory and disk"""
+        with self._lock:
+            self._memory.clear()
+        for path, _, _ in self._disk_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._disk_bytes = 0
+
+    def _remember(self, key: str, data: bytes) -> None:
+        """
+        Args:
+            key     => cache key
+            data    => pickled result
+        Procedure:
+            Add data to the in-memory LRU, evicting the least recently used
+            entries beyond max_entries.
+        Preconditions:
+            Caller holds self._lock
+        """
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        """Path of on-disk entry for key"""
+        return os.path.join(self.directory, key[:2], key + '.pickle')
+
+    def _read(self, key: str) -> Optional[bytes]:
+        """
+        Args:
+            key => cache key
+        Returns:
+            Pickled result stored on disk under key (marking it recently
+            used), None if not stored.
+        Preconditions:
+            N/A
+        """
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as entry_file:
+                data = entry_file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def _write(self, key: str, data: bytes) -> None:
+        """
+        Args:
+            key     => cache key
+            data    => pickled result
+        Procedure:
+            Atomically store data on disk under key, then evict least
+            recently used entries while the store exceeds max_bytes.
+        Preconditions:
+            N/A
+        """
+        if self.directory is None:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), prefix='.tmp', delete=False
+        ) as entry_file:
+            entry_file.write(data)
+        os.replace(entry_file.name, path)
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+        else:
+            self._disk_bytes += len(data)
+        if self._disk_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        """
+        Args:
+            N/A
+        Procedure:
+            Remove least recently used on-disk entries until the store is
+            within max_bytes (rescanning it, as other processes may share it).
+        Preconditions:
+            N/A
+        """
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.stats.evictions += 1
+        self._disk_bytes = total
+
+    def _disk_entries(self) -> Iterable[Any]:
+        """
+        Args:
+            N/A
+        Returns:
+            (path, size, mtime) of every on-disk entry.
+        Preconditions:
+            N/A
+        """
+        if self.directory is None:
+            return
+        for subdirectory in os.scandir(self.directory):
+            if not subdirectory.is_dir():
+                continue
+            for entry in os.scandir(subdirectory.path):
+                if entry.name.endswith('.pickle'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    yield entry.path, stat.st_size, stat.st_mtime_ns
+
+    def _fingerprint(self, path: str) -> bytes:
+        """
+        Args:
+            path    => path of input file
+        Returns:
+            Fingerprint of input file (see class docstring).  Missing files
+            are fingerprinted as missing.
+        Preconditions:
+            N/A
+        """
+        path = os.path.abspath(path)
+        try:
+            if self.fingerprint == 'content':
+                digest = hashlib.sha256()
+                with open(path, 'rb') as input_file:
+                    for block in iter(lambda: input_file.read(1 << 20), b''):
+                        digest.update(block)
+                return ('%s\0'%path).encode('utf-8') + digest.digest()
+            stat = os.stat(path)
+        except OSError:
+            return ('%s\0missing'%path).encode('utf-8')
+        return ('%s\0%d\0%d'%(path, stat.st_size, stat.st_mtime_ns)).encode('utf-8')
+
+
+class CachedTaskMixin:
+    """Mixin for BaseTask subclasses memoizing run in result_cache (see
+    ResultCache).  Subclasses declare the input files of a run by
+    overriding _cache_inputs, and can set cache_version to invalidate
+    results from older versions of the task.  Differently configured
+    instances never share results (see _cache_identity).  On a hit the cached result
+    is returned and the task is not run at all (no _preamble,
+    _process_task or _postamble).
+    """
+    result_cache: Optional[ResultCache] = None
+    cache_version: Any = None
+
+    def _cache_inputs(self,     #pylint: disable=W0613
+        *args: Any,
+        **kwargs: Any
+    ) -> Iterable[str]:
+        """
+        Args:
+            @BaseTask.run
+        Returns:
+            Paths of input files of a run with the given arguments.
+        Preconditions:
+            N/A
+        """
+        return tuple()
+
+    def _cache_identity(self) -> bytes:
+        """
+        Args:
+            N/A
+        Returns:
+            Pickle of the configuration of this instance, part of its
+            cache keys.  Defaults to the public attributes of the instance
+            (so attributes left by _preamble of an earlier run also count);
+            override to restrict it to the attributes that affect results.
+        Preconditions:
+            Public attributes are picklable (else runs are not cached)
+        """
+        return pickle.dumps(sorted(
+            (name, value) for name, value in vars(self).items()
+            if not name.startswith('_') and name != 'result'
+        ), protocol=4)
+
+    def run(self, *args: Any, **kwargs: Any) -> Optional[TaskResult]:
+        """@BaseTask.run"""
+        cache = self.result_cache
+        if cache is None:
+            return super().run(*args, **kwargs)
+        key = cache.key(self, args, kwargs, self._cache_inputs(*args, **kwargs))
+        if key is not None:
+            result = cache.get(key)
+            if result is not None:
+                self.result = result
+                return result
+        result = super().run(*args, **kwargs)
+        if key is not None:
+            cache.put(key, result)
+        return result
@@ -0,0 +1,204 @@
+## -*- coding: UTF-8 -*-
+## checkpoint.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Callable, Dict, Sequence
+
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+
+from .patterns import Container
+from .task import TaskStatus, TaskResult
+
+
+class CheckpointMixin:
+    """Mixin for BaseTask subclasses that persist their progress so a
+    failed run can be resumed.  While running, _process_task calls
+    checkpoint(cursor, state) as often as convenient; checkpoints are
+    throttled to one write per checkpoint_interval seconds, state is only
+    pickled when a checkpoint is written, and each write atomically
+    replaces the checkpoint file (temporary file plus os.replace), so a
+    crash never leaves a torn checkpoint.  If the run fails or raises, the
+    latest deferred checkpoint taken with a snapshot (see checkpoint) is
+    flushed; the checkpoint is removed once the run succeeds.  A later run
+    with the same arguments finds it in resume_cursor and resume_state and
+    continues from there.
+    Checkpointing is disabled unless checkpoint_directory is set.
+    """
+    checkpoint_directory: Optional[str] = None
+    checkpoint_interval: float = 5.0
+    checkpoint_fsync: bool = False
+
+    @property
+    def resume_cursor(self) -> Any:
+        """Getter for cursor of checkpoint being resumed (None if none)"""
+        checkpoint = getattr(self, '_checkpoint_loaded', None)
+        return None if checkpoint is None else checkpoint.cursor
+
+    @property
+    def resume_state(self) -> Optional[Container[str, Any]]:
+        """Getter for state of checkpoint being resumed (None if none)"""
+        checkpoint = getattr(self, '_checkpoint_loaded', None)
+        return None if checkpoint is None else checkpoint.state
+
+    @property
+    def checkpoint_path(self) -> Optional[str]:
+        """Getter for path of checkpoint file of current run"""
+        return getattr(self, '_checkpoint_path', None)
+
+    def _checkpoint_key(self, *args: Any, **kwargs: Any) -> Optional[str]:
+        """
+        Args:
+            @BaseTask.run
+        Returns:
+            Key identifying checkpoints of a run with the given arguments,
+            None if the run cannot be checkpointed.  Defaults to a hash of
+            the task class and pickled arguments.
+        Preconditions:
+            N/A
+        """
+        try:
+            data = pickle.dumps((
+                type(self).__module__,
+                type(self).__qualname__,
+                args,
+                sorted(kwargs.items())
+            ), protocol=4)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None
+        return hashlib.sha256(data).hexdigest()
+
+    def checkpoint(self,
+        cursor: Any,
+        state: Any = None,
+        force: bool = False,
+        snapshot: Optional[Callable[[], Any]] = None
+    ) -> bool:
+        """
+        Args:
+            cursor      => position to resume processing from
+            state       => partial state to resume with
+            force       => write even if checkpoint_interval has not elapsed
+            snapshot    => cheap callable returning state as of this call,
+                           unaffected by later changes to state (e.g. a new
+                           Container of the counters it holds)
+        Returns:
+            True if the checkpoint was written, False if it was deferred
+            or checkpointing is disabled.  state is only pickled when the
+            checkpoint is written, so deferred calls cost nothing.  A
+            deferred checkpoint is dropped unless snapshot is given, in
+            which case the result of snapshot is kept and flushed if the
+            run fails.
+        Preconditions:
+            cursor and state (or the result of snapshot) are picklable
+        """
+        if self.checkpoint_path is None:
+            return False
+        if not force and \
+            time.monotonic() - self._checkpoint_written < self.checkpoint_interval:
+            if snapshot is not None:
+                self._checkpoint_pending = Container(cursor=cursor, state=snapshot())
+            return False
+        self._checkpoint_pending = Container(cursor=cursor, state=state)
+        self._flush_checkpoint()
+        return True
+
+    def clear_checkpoint(self) -> None:
+        """Remove checkpoint of current run"""
+        self._checkpoint_pending = None
+        if self.checkpoint_path is not None:
+            try:
+                os.remove(self.checkpoint_path)
+            except FileNotFoundError:
+                pass
+
+    def run(self, *args: Any, **kwargs: Any) -> Optional[TaskResult]:
+        """@BaseTask.run"""
+        self._start_checkpointing(args, kwargs)
+        try:
+            result = super().run(*args, **kwargs)
+        except BaseException:
+            self._flush_checkpoint()
+            raise
+        if result is not None and result.status == TaskStatus.SUCCESS:
+            self.clear_checkpoint()
+        else:
+            self._flush_checkpoint()
+        return result
+
+    def _start_checkpointing(self, args: Sequence[Any], kwargs: Dict[str, Any]) -> None:
+        """
+        Args:
+            args    => positional arguments to run
+            kwargs  => keyword arguments to run
+        Procedure:
+            Locate the checkpoint file of the run and load any checkpoint
+            left by a previous run.
+        Preconditions:
+            N/A
+        """
+        self._checkpoint_path = None
+        self._checkpoint_loaded = None
+        self._checkpoint_pending = None
+        self._checkpoint_written = time.monotonic()
+        if self.checkpoint_directory is None:
+            return
+        key = self._checkpoint_key(*args, **kwargs)
+        if key is None:
+            return
+        self._checkpoint_path = os.path.join(
+            self.checkpoint_directory, key + '.checkpoint'
+        )
+        try:
+            with open(self._checkpoint_path, 'rb') as checkpoint_file:
+                self._checkpoint_loaded = pickle.load(checkpoint_file)
+        except FileNotFoundError:
+            pass
+        except Exception:   #pylint: disable=W0703
+            self._checkpoint_loaded = None
+
+    def _flush_checkpoint(self) -> None:
+        """
+        Args:
+            N/A
+        Procedure:
+            Atomically write the pending checkpoint, if any.
+        Preconditions:
+            N/A
+        """
+        checkpoint = getattr(self, '_checkpoint_pending', None)
+        if checkpoint is None or self.checkpoint_path is None:
+            return
+        os.makedirs(self.checkpoint_directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=self.checkpoint_directory, prefix='.checkpoint', delete=False
+        ) as checkpoint_file:
+            pickle.dump(checkpoint, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+            if self.checkpoint_fsync:
+                checkpoint_file.flush()
+                os.fsync(checkpoint_file.fileno())
+        os.replace(checkpoint_file.name, self.checkpoint_path)
+        self._checkpoint_pending = None
+        self._checkpoint_written = time.monotonic()
@@ -21,9 +21,13 @@
 ## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 ## SOFTWARE.
 
-from typing import Optional
+from typing import Optional, List
 
+import os
+import py_compile
 import sys
+import tempfile
+import zipfile
 from os import path
 
 LOGGING_DEFAULTS = dict(\
@@ -32,27 +36,43 @@ LOGGING_DEFAULTS = dict(\
     level=20    # logging.INFO
 )
 
+DEPENDENCY_BUNDLE_NAME = 'dependencies.zip'
+EXTENSION_SUFFIXES = ('.so', '.pyd', '.dll', '.dylib')
+
 def include_dependencies_in_path(dirpath: Optional[str] = None) -> None:
     """
     Args:
-        dirpath => path to dependency directory
+        dirpath => path to dependency directory or bundle
     Procedure:
         Initialize sys.path to include a directory of dependencies.  If dirpath
-        is None, includes the launch path of the running python program.  Raises
-        exception if unable to successfully append to sys.path, for example if
-        dirpath is None and sys.argv[0] is not a valid path.
+        is None, includes the launch path of the running python program.  If
+        dirpath is a directory containing a dependency bundle named
+        DEPENDENCY_BUNDLE_NAME (see build_dependency_bundle), or is itself a
+        bundle, the bundle is included instead, so imports resolve through the
+        bundle's index rather than by searching the directory.  Paths already
+        in sys.path are not added again.  Raises exception if unable to
+        successfully append to sys.path, for example if dirpath is None and
+        sys.argv[0] is not a valid path.
     Preconditions:
         N/A
     """
     try:
         if dirpath is None:
             dirpath = path.abspath(path.dirname(sys.argv[0]))
+        bundle = path.join(dirpath, DEPENDENCY_BUNDLE_NAME)
+        if path.isfile(bundle):
+            dirpath = bundle
+        normalized = path.normcase(path.abspath(dirpath))
     except Exception as exc:
         raise Exception(
             'Unable to append %s directory to sys.path (%s)'%(dirpath, str(exc))
         )
     else:
         try:
+            for entry in sys.path:
+                if isinstance(entry, str) and \
+                    path.normcase(path.abspath(entry or os.curdir)) == normalized:
+                    return
             sys.path.append(dirpath)
         except Exception as exc:
             raise Exception(
@@ -61,3 +81,66 @@ def include_dependencies_in_path(dirpath: Optional[str] = None) -> None:
                     str(exc)
                 )
             )
+
+def build_dependency_bundle(
+    dirpath: str,
+    bundle_path: Optional[str] = None,
+    optimize: int = -1
+) -> List[str]:
+    """
+    Args:
+        dirpath     => path to dependency directory (as would be passed to
+                       include_dependencies_in_path)
+        bundle_path => path of bundle to create (defaults to
+                       DEPENDENCY_BUNDLE_NAME in dirpath)
+        optimize    => optimization level to compile modules with (-1 for
+                       the level of the running interpreter)
+    Returns:
+        Names of the files in the bundle.
+    Procedure:
+        Create a zip bundle of the dependency directory that imports with
+        zipimport: every module is precompiled to bytecode (stored in place
+        of its source, so nothing is compiled at startup) and other files
+        such as package data and distribution metadata are stored as is.
+        Raises ValueError if the directory contains extension modules,
+        which cannot be imported from a zip file.
+    Preconditions:
+        The bundle is used with the Python version that built it
+    """
+    if bundle_path is None:
+        bundle_path = path.join(dirpath, DEPENDENCY_BUNDLE_NAME)
+    bundle_path = path.abspath(bundle_path)
+    files = list()
+    for root, dirnames, filenames in os.walk(dirpath):
+        dirnames[:] = sorted(name for name in dirnames if name != '__pycache__')
+        for filename in sorted(filenames):
+            filepath = path.join(root, filename)
+            if path.abspath(filepath) not in (bundle_path, bundle_path + '.tmp') and \
+                not filename.endswith(('.pyc', '.pyo')):
+                files.append(filepath)
+    extensions = [filepath for filepath in files if filepath.endswith(EXTENSION_SUFFIXES)]
+    if extensions:
+        raise ValueError(
+            'Extension modules cannot be loaded from a bundle: %s'%', '.join(extensions)
+        )
+    names = list()
+    with tempfile.TemporaryDirectory() as compiled_dir, \
+        zipfile.ZipFile(bundle_path + '.tmp', 'w', zipfile.ZIP_DEFLATED) as bundle:
+        compiled_path = path.join(compiled_dir, 'module.pyc')
+        for filepath in files:
+            name = path.relpath(filepath, dirpath).replace(os.sep, '/')
+            if name.endswith('.py'):
+                name += 'c'
+                py_compile.compile(
+                    filepath,
+                    cfile=compiled_path,
+                    dfile=path.join(bundle_path, name[:-1]),
+                    doraise=True,
+                    optimize=optimize
+                )
+                bundle.write(compiled_path, name)
+            else:
+                bundle.write(filepath, name)
+            names.append(name)
+    os.replace(bundle_path + '.tmp', bundle_path)
+    return names
@@ -0,0 +1,565 @@
+## -*- coding: UTF-8 -*-
+## containers.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Iterable, Iterator, List, Sequence, Tuple, Union
+
+import struct
+import sys
+from collections.abc import Mapping, MutableMapping, MutableSequence
+from operator import attrgetter
+
+from .patterns import Container
+
+
+class SlottedContainer(MutableMapping):
+    """Base class for fixed-schema containers created by
+    make_container_type.  Implements the same Dict API and attribute-like
+    access as Container, but stores each field in a slot instead of
+    a per-instance dict, so instances are several times smaller and
+    attribute reads are plain slot lookups.  A field that has not been
+    set (or was deleted) behaves like a missing key, and setting a key
+    that is not a field raises KeyError.  Instances are not dict
+    subclasses, so use dict(container) where a real dict is required.
+    """
+    __slots__ = ()
+    _fields: Tuple[str, ...] = tuple()
+    _field_set = frozenset()
+    _getters = dict()
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        if args:
+            if len(args) > 1:
+                raise TypeError(
+                    '%s expected at most 1 positional argument, got %d'%(
+                        type(self).__name__,
+                        len(args)
+                    )
+                )
+            self.update(args[0])
+        if kwargs:
+            self.update(kwargs)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._getters[key](self)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        getter = self._getters.get(key)
+        if getter is None:
+            return default
+        try:
+            return getter(self)
+        except AttributeError:
+            return default
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self._field_set:
+            raise KeyError('%s is not a field of %s'%(key, type(self).__name__))
+        setattr(self, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self._field_set:
+            raise KeyError(key)
+        try:
+            delattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._field_set and hasattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        for field in self._fields:
+            if hasattr(self, field):
+                yield field
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return '%s(%s)'%(
+            type(self).__name__,
+            ', '.join('%s=%r'%(key, value) for key, value in self.items())
+        )
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (type(self), (dict(self),))
+
+    def copy(self) -> 'SlottedContainer':
+        """Shallow copy of container (same type)"""
+        return type(self)(self)
+
+
+def _caller_module() -> str:
+    """
+    Args:
+        N/A
+    Returns:
+        Name of the module calling the function that called this function,
+        used as __module__ of dynamically created types.
+    Preconditions:
+        N/A
+    """
+    try:
+        caller = sys._getframe(2) #pylint: disable=W0212
+    except (AttributeError, ValueError):
+        return '__main__'
+    return caller.f_globals.get('__name__', '__main__')
+
+
+def make_container_type(
+    typename: str,
+    fields: Iterable[str],
+    module: Optional[str] = None
+) -> Any:
+    """
+    Args:
+        typename    => name of container type to create
+        fields      => names of fields in the container schema
+        module      => module to create type in (defaults to caller's module)
+    Returns:
+        New SlottedContainer subclass storing exactly fields.  The type must
+        be assigned to typename at module level in module to be picklable.
+    Preconditions:
+        fields are unique valid identifiers that do not shadow
+        SlottedContainer attributes (such as keys or items)
+    """
+    fields = tuple(fields)
+    for field in fields:
+        if not field.isidentifier() or field.startswith('_') or \
+            hasattr(SlottedContainer, field):
+            raise ValueError('Invalid field name %r'%field)
+    if len(set(fields)) != len(fields):
+        raise ValueError('Duplicate field names in %r'%(fields,))
+    if module is None:
+        module = _caller_module()
+    return type(typename, (SlottedContainer,), dict(
+        __slots__=fields,
+        __module__=module,
+        _fields=fields,
+        _field_set=frozenset(fields),
+        _getters={field: attrgetter(field) for field in fields}
+    ))
+
+
+class StructContainerView(Mapping):
+    """Base class for read-only containers created by make_view_type that
+    decode fields of a fixed-layout binary structure directly from an
+    underlying buffer (bytes, bytearray, mmap or memoryview) on first
+    access.  The buffer is never copied, and a field is only decoded when
+    read (then optionally cached).  Implements the read-only Dict API
+    (keys, items, iteration, dict(view)) and attribute-like access of
+    Container.  Note that an mmap cannot be closed while views over it
+    are alive.
+    """
+    __slots__ = ('_buffer', '_offset', '_cache')
+    _fields: Tuple[str, ...] = tuple()
+    _field_set = frozenset()
+    _size = 0
+
+    def __init__(self, buffer: Any, offset: int = 0) -> None:
+        buffer = memoryview(buffer).cast('B')
+        if offset < 0 or len(buffer) - offset < self._size:
+            raise ValueError('%s requires %d bytes at offset %d, buffer has %d'%(
+                type(self).__name__,
+                self._size,
+                offset,
+                len(buffer)
+            ))
+        self._buffer = buffer
+        self._offset = offset
+        self._cache = None
+
+    @classmethod
+    def struct_size(cls) -> int:
+        """Getter for size in bytes of the structure"""
+        return cls._size
+
+    @classmethod
+    def iter_from(cls,
+        buffer: Any,
+        offset: int = 0,
+        count: Optional[int] = None
+    ) -> Iterator['StructContainerView']:
+        """
+        Args:
+            buffer  => buffer containing consecutive structures
+            offset  => offset of first structure in buffer
+            count   => number of structures (defaults to as many as fit)
+        Returns:
+            Iterator of views over consecutive structures in buffer.
+        Preconditions:
+            N/A
+        """
+        buffer = memoryview(buffer).cast('B')
+        if count is None:
+            count = (len(buffer) - offset) // cls._size
+        for index in range(count):
+            yield cls(buffer, offset + index * cls._size)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._field_set:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._field_set
+
+    def __repr__(self) -> str:
+        return '%s(offset=%d)'%(type(self).__name__, self._offset)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (type(self), (self.raw().tobytes(),))
+
+    def raw(self) -> memoryview:
+        """Zero-copy view of the bytes of this structure"""
+        return self._buffer[self._offset:self._offset + self._size]
+
+    def to_container(self) -> Container:
+        """Decode every field into a new Container"""
+        return Container(self.items())
+
+
+def _field_property(
+    field: str,
+    offset: int,
+    fmt: Union[str, int],
+    cache: bool
+) -> property:
+    """
+    Args:
+        field   => name of field
+        offset  => offset of field in structure
+        fmt     => struct format of field, or length of raw bytes field
+        cache   => whether to cache decoded value in the view
+    Returns:
+        Property decoding field from the view's buffer.
+    Preconditions:
+        N/A
+    """
+    if isinstance(fmt, int):
+        def decode(self: StructContainerView) -> Any:
+            start = self._offset + offset    #pylint: disable=W0212
+            return self._buffer[start:start + fmt] #pylint: disable=W0212
+    else:
+        field_struct = struct.Struct(fmt)
+        unpack_from = field_struct.unpack_from
+        if len(field_struct.unpack(bytes(field_struct.size))) == 1:
+            def decode(self: StructContainerView) -> Any: #pylint: disable=W0212
+                return unpack_from(self._buffer, self._offset + offset)[0]
+        else:
+            def decode(self: StructContainerView) -> Any: #pylint: disable=W0212
+                return unpack_from(self._buffer, self._offset + offset)
+    if not cache:
+        return property(decode, doc='Decoded value of %s'%field)
+    def cached_decode(self: StructContainerView) -> Any:
+        values = self._cache                    #pylint: disable=W0212
+        if values is None:
+            values = self._cache = dict()       #pylint: disable=W0212
+        elif field in values:
+            return values[field]
+        value = values[field] = decode(self)
+        return value
+    return property(cached_decode, doc='Cached decoded value of %s'%field)
+
+
+def make_view_type(
+    typename: str,
+    layout: Sequence[Tuple[Optional[str], Union[str, int]]],
+    byteorder: str = '<',
+    cache: Union[bool, Iterable[str]] = False,
+    module: Optional[str] = None
+) -> Any:
+    """
+    Args:
+        typename    => name of view type to create
+        layout      => sequence of (field, format) pairs in structure order,
+                       where format is a struct format (e.g. 'I' or '16s')
+                       or an int length for a zero-copy raw bytes field, and
+                       a field of None is padding
+        byteorder   => struct byte order character applied to every field
+        cache       => True to cache every decoded field, or names of the
+                       fields to cache
+        module      => module to create type in (defaults to caller's module)
+    Returns:
+        New StructContainerView subclass decoding layout.
+    Preconditions:
+        Field names are unique valid identifiers that do not shadow
+        StructContainerView attributes
+    """
+    if cache is True:
+        cached = None
+    else:
+        cached = frozenset(cache or tuple())
+    fields = list()
+    attrs = dict(__slots__=tuple())
+    offset = 0
+    for field, fmt in layout:
+        if isinstance(fmt, int):
+            length = fmt
+        else:
+            fmt = byteorder + fmt
+            length = struct.calcsize(fmt)
+        if field is not None:
+            if not field.isidentifier() or field.startswith('_') or \
+                hasattr(StructContainerView, field) or field in attrs:
+                raise ValueError('Invalid field name %r'%field)
+            attrs[field] = _field_property(
+                field,
+                offset,
+                fmt,
+                cached is None or field in cached
+            )
+            fields.append(field)
+        offset += length
+    if module is None:
+        module = _caller_module()
+    attrs.update(
+        __module__=module,
+        _fields=tuple(fields),
+        _field_set=frozenset(fields),
+        _size=offset
+    )
+    return type(typename, (StructContainerView,), attrs)
+
+
+def wrap_nested(value: Any) -> Any:
+    """
+    Args:
+        value   => value from nested data
+    Returns:
+        LazyContainer over value if it is a dict, LazySequence over value
+        if it is a list or tuple, else value itself.  Nothing is copied.
+    Preconditions:
+        N/A
+    """
+    if isinstance(value, dict):
+        return LazyContainer(value)
+    if isinstance(value, (list, tuple)):
+        return LazySequence(value)
+    return value
+
+
+def unwrap_nested(value: Any) -> Any:
+    """
+    Args:
+        value   => possibly wrapped value
+    Returns:
+        Underlying data of a LazyContainer or LazySequence, else value.
+    Preconditions:
+        N/A
+    """
+    if isinstance(value, (LazyContainer, LazySequence)):
+        return value._data  #pylint: disable=W0212
+    return value
+
+
+def to_container(value: Any) -> Any:
+    """
+    Args:
+        value   => nested dicts and lists (possibly wrapped)
+    Returns:
+        Eager deep copy of value with every dict converted to a Container
+        and every list or tuple to a list.
+    Preconditions:
+        N/A
+    """
+    value = unwrap_nested(value)
+    if isinstance(value, dict):
+        return Container((key, to_container(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [to_container(item) for item in value]
+    return value
+
+
+class LazyContainer(MutableMapping):
+    """Container-compatible view of nested dicts and lists, such as parsed
+    JSON, that converts lazily instead of with an up-front deep copy.
+    Wrapping is O(1): the view holds a reference to the dict.  Reading a
+    key that holds a dict or list returns a new LazyContainer or
+    LazySequence over it, so only the path actually accessed is ever
+    wrapped, and deeply nested data reads like nested Containers
+    (data.event.host.name).  Writes go through to the underlying data,
+    and wrapped values are stored unwrapped, so the dict never contains
+    views.  Use unwrap_nested to get the dict back, and to_container for
+    an eager deep conversion.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data: Optional[dict] = None, **kwargs: Any) -> None:
+        """
+        Args:
+            data    => dict to wrap (not copied; a new dict if None)
+            kwargs  => keys to set in data
+        """
+        if data is None:
+            data = dict()
+        elif isinstance(data, LazyContainer):
+            data = data._data
+        elif not isinstance(data, dict):
+            raise TypeError('LazyContainer wraps a dict, not %s'%type(data).__name__)
+        object.__setattr__(self, '_data', data)
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def __getitem__(self, key: Any) -> Any:
+        return wrap_nested(self._data[key])
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return wrap_nested(self._data.get(key, default))
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._data[key] = unwrap_nested(value)
+
+    def __delitem__(self, key: Any) -> None:
+        del self._data[key]
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other: Any) -> bool:
+        other = unwrap_nested(other)
+        if isinstance(other, dict):
+            return self._data == other
+        return super().__eq__(other)
+
+    __hash__ = None     # type: ignore
+
+    def __getattr__(self, key: str) -> Any:
+        """Attribute access implementation
+        (passthrough to __getitem__)
+        """
+        if key in LazyContainer.__slots__:
+            raise AttributeError(key)
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __setattr__(self, key: str, value: Any) -> None:
+        """Attribute set implementation
+        (passthrough to __setitem__)
+        """
+        self[key] = value
+
+    def __delattr__(self, key: str) -> None:
+        """Attribute deletion implementation
+        (passthrough to __delitem__)
+        """
+        try:
+            del self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __repr__(self) -> str:
+        return '%s(%r)'%(type(self).__name__, self._data)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (type(self), (self._data,))
+
+    def copy(self) -> 'LazyContainer':
+        """Shallow copy of container (copies the top-level dict only)"""
+        return type(self)(dict(self._data))
+
+    def to_container(self) -> Container:
+        """Eager deep conversion into nested Containers"""
+        return to_container(self._data)
+
+
+class LazySequence(MutableSequence):
+    """Sequence counterpart of LazyContainer over a list (or, read-only,
+    a tuple): items that are dicts or lists are wrapped when read, and
+    wrapped values are stored unwrapped.  Slicing copies the slice (not
+    its items) into a new LazySequence.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data: Optional[Union[list, tuple]] = None) -> None:
+        """
+        Args:
+            data    => list or tuple to wrap (not copied; a new list if None)
+        """
+        if data is None:
+            data = list()
+        elif isinstance(data, LazySequence):
+            data = data._data
+        elif not isinstance(data, (list, tuple)):
+            raise TypeError('LazySequence wraps a list, not %s'%type(data).__name__)
+        self._data = data
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return type(self)(self._data[index])
+        return wrap_nested(self._data[index])
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        if isinstance(index, slice):
+            self._data[index] = [unwrap_nested(item) for item in value]
+        else:
+            self._data[index] = unwrap_nested(value)
+
+    def __delitem__(self, index: Any) -> None:
+        del self._data[index]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[Any]:
+        for item in self._data:
+            yield wrap_nested(item)
+
+    def insert(self, index: int, value: Any) -> None:
+        self._data.insert(index, unwrap_nested(value))
+
+    def __eq__(self, other: Any) -> bool:
+        other = unwrap_nested(other)
+        if not isinstance(other, (list, tuple)):
+            return NotImplemented
+        return len(self._data) == len(other) and \
+            all(mine == theirs for mine, theirs in zip(self._data, other))
+
+    __hash__ = None     # type: ignore
+
+    def __repr__(self) -> str:
+        return '%s(%r)'%(type(self).__name__, self._data)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (type(self), (self._data,))
+
+    def to_list(self) -> List[Any]:
+        """Eager deep conversion into a list of nested Containers"""
+        return to_container(self._data)
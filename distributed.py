@@ -0,0 +1,539 @@
+## -*- coding: UTF-8 -*-
+## distributed.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Dict, Iterable, Iterator, List, Tuple
+
+import collections
+import itertools
+import os
+import pickle
+import socket
+import sys
+from concurrent.futures import Future, as_completed
+from multiprocessing import Process
+from multiprocessing.connection import (
+    Client,
+    Connection,
+    Listener,
+    answer_challenge,
+    deliver_challenge
+)
+from threading import Condition, Event, Lock, Thread
+
+from .patterns import Container
+from .task import TaskStatus, TaskResult, BaseTask
+from .executor import _run_task
+from . import serialization
+
+Address = Tuple[str, int]
+
+
+def _set_nodelay(connection: Connection) -> None:
+    """Disable Nagle's algorithm on connection, as tasks and results are
+    sent as several small writes that would otherwise be delayed"""
+    try:
+        sock = socket.fromfd(connection.fileno(), socket.AF_INET, socket.SOCK_STREAM)
+    except OSError:
+        return
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+
+class _Entry:
+    """Submitted task and its future."""
+    __slots__ = ('id', 'task', 'args', 'kwargs', 'attempts', 'future')
+
+    def __init__(self,
+        entry_id: int,
+        task: BaseTask,
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any]
+    ) -> None:
+        self.id = entry_id
+        self.task = task
+        self.args = args
+        self.kwargs = kwargs
+        self.attempts = 0
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+
+
+class _WorkerLink:
+    """Broker side of a worker connection."""
+
+    def __init__(self, connection: Connection, name: str) -> None:
+        self.connection = connection
+        self.name = name
+        self.inflight = dict()
+        self.lost = False
+        self.send_lock = Lock()
+
+
+class TaskBroker:
+    """Coordinator that distributes tasks to worker nodes (see run_worker)
+    over multiprocessing.connection sockets and collects their results.
+    Tasks are queued by submit and sent to connected workers, each of
+    which has up to prefetch tasks in flight.  Tasks, arguments and results
+    cross the network with serialization (so they must be picklable and
+    importable on the workers), and connections are authenticated with
+    authkey (random by default, see authkey).
+
+    A worker whose connection closes, or that sends nothing (not even a
+    heartbeat) for heartbeat_timeout seconds, is considered lost and its
+    in-flight tasks are requeued.  A task that has been lost with
+    max_attempts workers (e.g. because it crashes them) fails instead.
+    Tasks that raise on a worker yield failure results as in TaskExecutor.
+    """
+
+    def __init__(self,
+        address: Address = ('127.0.0.1', 0),
+        authkey: Optional[bytes] = None,
+        prefetch: int = 2,
+        heartbeat_timeout: float = 10.0,
+        max_attempts: int = 3
+    ) -> None:
+        """
+        Args:
+            address             => (host, port) to listen on (port 0 for any)
+            authkey             => key workers authenticate with
+            prefetch            => tasks in flight per worker
+            heartbeat_timeout   => seconds of silence before a worker is lost
+            max_attempts        => times a task is sent before it fails
+        """
+        self.authkey = os.urandom(32) if authkey is None else authkey
+        self.prefetch = max(1, prefetch)
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self._listener = Listener(address)
+        self._condition = Condition()
+        self._queue = collections.deque()
+        self._workers = list()
+        self._ids = itertools.count()
+        self._closed = False
+        self._stats = Container(
+            submitted=0, completed=0, failed=0, requeued=0, lost_workers=0
+        )
+        self._accepter = Thread(
+            target=self._accept,
+            name='TaskBroker-accept',
+            daemon=True
+        )
+        self._accepter.start()
+
+    @property
+    def address(self) -> Address:
+        """Getter for address workers connect to"""
+        return self._listener.address
+
+    @property
+    def stats(self) -> Container:
+        """Getter for snapshot of broker statistics: workers and queued
+        and in-flight tasks, and counts of tasks submitted, completed,
+        failed and requeued and of workers lost"""
+        with self._condition:
+            stats = Container(self._stats)
+            stats.workers = len(self._workers)
+            stats.queued = len(self._queue)
+            stats.inflight = sum(len(worker.inflight) for worker in self._workers)
+            return stats
+
+    def __enter__(self) -> 'TaskBroker':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown()
+
+    def submit(self, task: BaseTask, *args: Any, **kwargs: Any) -> 'Future[TaskResult]':
+        """
+        Args:
+            task    => task to run on a worker
+            args    => positional arguments to task.run
+            kwargs  => keyword arguments to task.run
+        Returns:
+            Future of the task's result.
+        Preconditions:
+            Broker is not shut down
+        """
+        entry = _Entry(next(self._ids), task, args, kwargs)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('cannot submit after shutdown')
+            self._stats.submitted += 1
+            self._queue.append(entry)
+            self._condition.notify_all()
+        return entry.future
+
+    def run(self,
+        tasks: Iterable[BaseTask],
+        *args: Any,
+        **kwargs: Any
+    ) -> Iterator[Tuple[int, Optional[TaskResult]]]:
+        """
+        Args:
+            @TaskExecutor.run
+        Returns:
+            @TaskExecutor.run
+        Preconditions:
+            N/A
+        """
+        futures = {
+            self.submit(task, *args, **kwargs): index for index, task in enumerate(tasks)
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def wait_for_workers(self, count: int, timeout: Optional[float] = None) -> bool:
+        """
+        Args:
+            count   => number of workers to wait for
+            timeout => maximum seconds to wait
+        Returns:
+            True if at least count workers are connected.
+        Preconditions:
+            N/A
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: len(self._workers) >= count, timeout)
+
+    def shutdown(self) -> None:
+        """Stop accepting tasks and workers, tell workers to exit, and fail
+        queued and in-flight tasks"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+            self._condition.notify_all()
+        self._listener.close()
+        for worker in workers:
+            try:
+                with worker.send_lock:
+                    serialization.send(worker.connection, ('stop',))
+            except (OSError, ValueError):
+                pass
+        with self._condition:
+            entries = list(self._queue)
+            self._queue.clear()
+            for worker in workers:
+                entries.extend(worker.inflight.values())
+                worker.inflight.clear()
+        for entry in entries:
+            self._resolve(entry, TaskResult(
+                TaskStatus.FAILURE, Container(error='Broker shut down')
+            ))
+
+    def _accept(self) -> None:
+        """Accept connections until shut down, handing each to _handshake"""
+        while True:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                if self._closed:
+                    return
+                continue
+            Thread(target=self._handshake, args=(connection,), daemon=True,
+                name='TaskBroker-handshake').start()
+
+    def _handshake(self, connection: Connection) -> None:
+        """
+        Args:
+            connection  => newly accepted connection
+        Procedure:
+            Authenticate connection with authkey and register it as a worker
+            once it says hello.  Connections that fail authentication, close,
+            or stay silent for heartbeat_timeout seconds are dropped.  Runs
+            in its own thread so a misbehaving client cannot stall _accept.
+        Preconditions:
+            N/A
+        """
+        try:
+            deliver_challenge(connection, self.authkey)
+            answer_challenge(connection, self.authkey)
+            _set_nodelay(connection)
+            if not connection.poll(self.heartbeat_timeout):
+                raise EOFError('no hello from worker')
+            hello = serialization.recv(connection)
+            name = str(hello[1])
+        except Exception:   #pylint: disable=W0703
+            connection.close()
+            return
+        worker = _WorkerLink(connection, name)
+        with self._condition:
+            if self._closed:
+                connection.close()
+                return
+            self._workers.append(worker)
+            self._condition.notify_all()
+        Thread(target=self._send_tasks, args=(worker,), daemon=True,
+            name='TaskBroker-send-%s'%worker.name).start()
+        Thread(target=self._receive_results, args=(worker,), daemon=True,
+            name='TaskBroker-receive-%s'%worker.name).start()
+
+    def _send_tasks(self, worker: _WorkerLink) -> None:
+        """
+        Args:
+            worker  => connected worker
+        Procedure:
+            Send queued tasks to worker while it has fewer than prefetch
+            in flight, until the worker is lost or the broker shut down.
+        Preconditions:
+            N/A
+        """
+        while True:
+            with self._condition:
+                while not (worker.lost or self._closed) and \
+                    (not self._queue or len(worker.inflight) >= self.prefetch):
+                    self._condition.wait()
+                if worker.lost or self._closed:
+                    return
+                entry = self._queue.popleft()
+                entry.attempts += 1
+                worker.inflight[entry.id] = entry
+            try:
+                with worker.send_lock:
+                    serialization.send(worker.connection, ('task', entry.id))
+                    serialization.send(
+                        worker.connection, (entry.task, entry.args, entry.kwargs)
+                    )
+            except (pickle.PicklingError, TypeError, AttributeError) as exc:
+                # the id message was sent, so the worker waits for a task
+                # message; send it a task that fails with the same error
+                with worker.send_lock:
+                    serialization.send(worker.connection, (None, (), {}))
+                with self._condition:
+                    worker.inflight.pop(entry.id, None)
+                    self._condition.notify_all()
+                self._resolve(entry, TaskResult.from_exception(exc))
+            except (OSError, ValueError):
+                self._lose(worker)
+                return
+
+    def _receive_results(self, worker: _WorkerLink) -> None:
+        """
+        Args:
+            worker  => connected worker
+        Procedure:
+            Resolve the futures of results received from worker until its
+            connection closes or it is silent for heartbeat_timeout.
+        Preconditions:
+            N/A
+        """
+        connection = worker.connection
+        while True:
+            try:
+                if not connection.poll(self.heartbeat_timeout):
+                    break
+                message = serialization.recv(connection)
+            except (EOFError, OSError):
+                break
+            if message[0] != 'result':
+                continue
+            with self._condition:
+                entry = worker.inflight.pop(message[1], None)
+                self._condition.notify_all()
+            if entry is not None:
+                self._resolve(entry, message[2])
+        self._lose(worker)
+
+    def _lose(self, worker: _WorkerLink) -> None:
+        """
+        Args:
+            worker  => worker whose connection failed
+        Procedure:
+            Drop worker and requeue (or fail) its in-flight tasks.
+        Preconditions:
+            N/A
+        """
+        failed = list()
+        with self._condition:
+            if worker.lost:
+                return
+            worker.lost = True
+            if worker in self._workers:
+                self._workers.remove(worker)
+            if not self._closed:
+                self._stats.lost_workers += 1
+            inflight = sorted(
+                worker.inflight.values(), key=lambda entry: entry.id, reverse=True
+            )
+            for entry in inflight:
+                if self._closed or entry.attempts >= self.max_attempts:
+                    failed.append(entry)
+                else:
+                    self._stats.requeued += 1
+                    self._queue.appendleft(entry)
+            worker.inflight.clear()
+            self._condition.notify_all()
+        worker.connection.close()
+        for entry in failed:
+            self._resolve(entry, TaskResult(TaskStatus.FAILURE, Container(
+                error='Task lost with %d workers'%entry.attempts,
+                attempts=entry.attempts
+            )))
+
+    def _resolve(self, entry: _Entry, result: Optional[TaskResult]) -> None:
+        """Set the result of entry's future (once)"""
+        with self._condition:
+            if entry.future.done():
+                return
+            if result is not None and result.status == TaskStatus.FAILURE:
+                self._stats.failed += 1
+            else:
+                self._stats.completed += 1
+        entry.future.set_result(result)
+
+
+def run_worker(
+    address: Address,
+    authkey: bytes,
+    heartbeat_interval: float = 1.0
+) -> None:
+    """
+    Args:
+        address             => address of TaskBroker
+        authkey             => TaskBroker.authkey
+        heartbeat_interval  => seconds between heartbeats to the broker
+    Procedure:
+        Connect to the broker and run the tasks it sends, sending back
+        their results, until the broker stops or the connection closes.
+    Preconditions:
+        heartbeat_interval is well below the broker's heartbeat_timeout
+    """
+    connection = Client(address, authkey=authkey)
+    _set_nodelay(connection)
+    send_lock = Lock()
+    stopped = Event()
+
+    def heartbeat() -> None:
+        while not stopped.wait(heartbeat_interval):
+            try:
+                with send_lock:
+                    serialization.send(connection, ('heartbeat',))
+            except (OSError, ValueError):
+                return
+
+    with send_lock:
+        serialization.send(
+            connection, ('ready', '%s:%d'%(socket.gethostname(), os.getpid()))
+        )
+    Thread(target=heartbeat, name='TaskWorker-heartbeat', daemon=True).start()
+    try:
+        while True:
+            try:
+                message = serialization.recv(connection)
+            except (EOFError, OSError):
+                return
+            if message[0] != 'task':
+                return
+            try:
+                task, args, kwargs = serialization.recv(connection)
+                if task is None:
+                    continue
+                result = _run_task(task, args, kwargs)
+            except (EOFError, OSError):
+                return
+            except Exception as exc:    #pylint: disable=W0703
+                result = TaskResult.from_exception(exc)
+            try:
+                with send_lock:
+                    serialization.send(connection, ('result', message[1], result))
+            except (pickle.PicklingError, TypeError, AttributeError) as exc:
+                with send_lock:
+                    serialization.send(
+                        connection, ('result', message[1], TaskResult.from_exception(exc))
+                    )
+    finally:
+        stopped.set()
+        connection.close()
+
+
+class LocalCluster:
+    """Local test harness simulating a multi-node cluster: a TaskBroker
+    and worker processes (nodes) running run_worker on this machine.
+    """
+
+    def __init__(self,
+        workers: int = 2,
+        mp_context: Optional[Any] = None,
+        **broker_kwargs: Any
+    ) -> None:
+        """
+        Args:
+            workers         => number of worker processes to start
+            mp_context      => multiprocessing context of worker processes
+            broker_kwargs   => keyword arguments to TaskBroker
+        """
+        self.broker = TaskBroker(**broker_kwargs)
+        self.mp_context = mp_context
+        self.processes: List[Process] = list()
+        for _ in range(workers):
+            self.add_worker()
+        self.broker.wait_for_workers(workers, timeout=30)
+
+    def add_worker(self, heartbeat_interval: float = 1.0) -> Process:
+        """Start another worker process"""
+        factory = self.mp_context.Process if self.mp_context is not None else Process
+        process = factory(
+            target=run_worker,
+            args=(self.broker.address, self.broker.authkey, heartbeat_interval),
+            daemon=True
+        )
+        process.start()
+        self.processes.append(process)
+        return process
+
+    def kill_worker(self, index: int = 0) -> None:
+        """Kill a worker process, simulating a lost node"""
+        self.processes[index].kill()
+        self.processes[index].join()
+
+    def close(self) -> None:
+        """Shut down the broker and wait for worker processes"""
+        self.broker.shutdown()
+        for process in self.processes:
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def __enter__(self) -> 'LocalCluster':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run a worker: python -m <package>.distributed HOST:PORT, with the
+    broker's authkey (hex) in the TASK_BROKER_AUTHKEY environment variable"""
+    argv = sys.argv[1:] if argv is None else argv
+    host, port = argv[0].rsplit(':', 1)
+    run_worker((host, int(port)), bytes.fromhex(os.environ['TASK_BROKER_AUTHKEY']))
+
+
+if __name__ == '__main__':
+    main()
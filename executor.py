@@ -0,0 +1,314 @@
+## -*- coding: UTF-8 -*-
+## executor.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Counter, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import collections
+import os
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    FIRST_COMPLETED,
+    wait
+)
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+from .task import TaskStatus, TaskResult, BaseTask
+
+ChunkItem = Tuple[int, Optional[BaseTask], Sequence[Any]]
+
+
+def _run_task(
+    task: BaseTask,
+    args: Sequence[Any],
+    kwargs: Dict[str, Any]
+) -> Optional[TaskResult]:
+    """
+    Args:
+        task    => task to run
+        args    => positional arguments to task.run
+        kwargs  => keyword arguments to task.run
+    Returns:
+        Result of running task, or a failure result if it raised.
+    Preconditions:
+        N/A
+    """
+    try:
+        return task.run(*args, **kwargs)
+    except Exception as exc:    #pylint: disable=W0703
+        return TaskResult.from_exception(exc)
+
+
+def _run_chunk(
+    task_cls: Optional[Any],
+    chunk: List[ChunkItem],
+    kwargs: Dict[str, Any]
+) -> List[Tuple[int, Optional[TaskResult]]]:
+    """
+    Args:
+        task_cls    => class to instantiate for items without a task
+        chunk       => list of (index, task, args) items to run
+        kwargs      => keyword arguments to every task.run
+    Returns:
+        List of (index, result) pairs for every item in chunk.
+    Preconditions:
+        task_cls is not None if any item has no task
+    """
+    results = list()
+    for index, task, args in chunk:
+        if task is None:
+            task = task_cls()
+        results.append((index, _run_task(task, args, kwargs)))
+    return results
+
+
+class TaskExecutor:
+    """Runs many tasks concurrently on a thread or process pool and yields
+    their results as they complete, along with aggregated TaskStatus counts
+    (see summary).  A task that raises yields a TaskStatus.FAILURE result
+    (see TaskResult.from_exception) instead of stopping the batch.
+
+    In process mode tasks and results are pickled, so they must be
+    picklable, and tasks run on copies (task.result is not updated in the
+    calling process).  To keep inter-process overhead low, tasks are sent
+    in chunks of chunksize, a task class is sent once per chunk rather than
+    once per input, and only results are sent back.  A chunk whose results
+    cannot be returned (e.g. unpicklable results or a crashed worker) yields
+    failure results for each of its tasks.  A crashed worker breaks the
+    whole process pool, so every chunk in flight at the time fails and the
+    pool is replaced before the remaining chunks are submitted.
+    """
+
+    def __init__(self,
+        max_workers: Optional[int] = None,
+        use_processes: bool = False,
+        chunksize: int = 1,
+        mp_context: Optional[Any] = None
+    ) -> None:
+        """
+        Args:
+            max_workers     => maximum number of workers in the pool
+            use_processes   => run tasks in a process pool instead of threads
+            chunksize       => number of tasks sent to a worker at once
+            mp_context      => multiprocessing context for process pools
+        """
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.chunksize = max(1, chunksize)
+        self.mp_context = mp_context
+        self._pool = None
+        self._summary = collections.Counter()
+
+    @property
+    def summary(self) -> Counter[Optional[TaskStatus]]:
+        """Getter for counts of result statuses of the current (or last) run"""
+        return collections.Counter(self._summary)
+
+    def __enter__(self) -> 'TaskExecutor':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown()
+
+    def shutdown(self, wait_for_tasks: bool = True) -> None:
+        """
+        Args:
+            wait_for_tasks  => whether to wait for running tasks to finish
+        Procedure:
+            Shut down the worker pool (a new one is created if the executor
+            is used again).
+        Preconditions:
+            N/A
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait_for_tasks)
+            self._pool = None
+
+    def run(self,
+        tasks: Iterable[BaseTask],
+        *args: Any,
+        **kwargs: Any
+    ) -> Iterator[Tuple[int, Optional[TaskResult]]]:
+        """
+        Args:
+            tasks   => tasks to run
+            args    => positional arguments to every task.run
+            kwargs  => keyword arguments to every task.run
+        Returns:
+            Iterator of (index, result) pairs in completion order, where
+            index is the position of the task in tasks.
+        Preconditions:
+            N/A
+        """
+        return self._execute(
+            None,
+            ((index, task, args) for index, task in enumerate(tasks)),
+            kwargs
+        )
+
+    def map(self,
+        task_cls: Any,
+        inputs: Iterable[Any],
+        **kwargs: Any
+    ) -> Iterator[Tuple[int, Optional[TaskResult]]]:
+        """
+        Args:
+            task_cls    => BaseTask subclass to instantiate for each input
+            inputs      => inputs passed as the only positional argument to run
+            kwargs      => keyword arguments to every task.run
+        Returns:
+            Iterator of (index, result) pairs in completion order, where
+            index is the position of the input in inputs.
+        Preconditions:
+            task_cls can be instantiated without arguments
+        """
+        return self._execute(
+            task_cls,
+            ((index, None, (item,)) for index, item in enumerate(inputs)),
+            kwargs
+        )
+
+    def starmap(self,
+        task_cls: Any,
+        inputs: Iterable[Sequence[Any]],
+        **kwargs: Any
+    ) -> Iterator[Tuple[int, Optional[TaskResult]]]:
+        """
+        Args:
+            task_cls    => BaseTask subclass to instantiate for each input
+            inputs      => sequences of positional arguments to run
+            kwargs      => keyword arguments to every task.run
+        Returns:
+            @map
+        Preconditions:
+            task_cls can be instantiated without arguments
+        """
+        return self._execute(
+            task_cls,
+            ((index, None, tuple(item)) for index, item in enumerate(inputs)),
+            kwargs
+        )
+
+    def _get_pool(self) -> Executor:
+        """
+        Args:
+            N/A
+        Returns:
+            Worker pool, created on first use.
+        Preconditions:
+            N/A
+        """
+        if self._pool is None:
+            if self.use_processes:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=self.mp_context
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _replace_pool(self, pool: Executor) -> Executor:
+        """
+        Args:
+            pool    => broken worker pool
+        Returns:
+            Current worker pool, after shutting down and replacing pool if
+            it is still current.
+        Preconditions:
+            N/A
+        """
+        if self._pool is pool:
+            pool.shutdown(wait=False)
+            self._pool = None
+        return self._get_pool()
+
+    def _execute(self,
+        task_cls: Optional[Any],
+        items: Iterator[ChunkItem],
+        kwargs: Dict[str, Any]
+    ) -> Iterator[Tuple[int, Optional[TaskResult]]]:
+        """
+        Args:
+            task_cls    => class to instantiate for items without a task
+            items       => (index, task, args) items to run
+            kwargs      => keyword arguments to every task.run
+        Returns:
+            Iterator of (index, result) pairs in completion order.  At most
+            two chunks per worker are in flight at once, so inputs are
+            consumed lazily.
+        Preconditions:
+            N/A
+        """
+        self._summary = collections.Counter()
+        pool = self._get_pool()
+        max_in_flight = 2 * (self.max_workers or (os.cpu_count() or 1) + 4)
+        pending = dict()
+        try:
+            while True:
+                while len(pending) < max_in_flight:
+                    chunk = list(islice(items, self.chunksize))
+                    if not chunk:
+                        break
+                    try:
+                        future = pool.submit(_run_chunk, task_cls, chunk, kwargs)
+                    except BrokenProcessPool:
+                        pool = self._replace_pool(pool)
+                        future = pool.submit(_run_chunk, task_cls, chunk, kwargs)
+                    pending[future] = (chunk, pool)
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk, chunk_pool = pending.pop(future)
+                    if isinstance(future.exception(), BrokenProcessPool):
+                        pool = self._replace_pool(chunk_pool)
+                    for index, result in self._chunk_results(future, chunk):
+                        self._summary[None if result is None else result.status] += 1
+                        yield index, result
+        finally:
+            for future in pending:
+                future.cancel()
+
+    @staticmethod
+    def _chunk_results(
+        future: Future,
+        chunk: List[ChunkItem]
+    ) -> List[Tuple[int, Optional[TaskResult]]]:
+        """
+        Args:
+            future  => completed future of chunk
+            chunk   => items submitted in future
+        Returns:
+            Results of chunk, or failure results for every item in chunk if
+            the chunk could not be run or its results returned.
+        Preconditions:
+            future is done
+        """
+        try:
+            return future.result()
+        except Exception as exc:    #pylint: disable=W0703
+            return [(index, TaskResult.from_exception(exc)) for index, _, _ in chunk]
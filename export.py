@@ -0,0 +1,455 @@
+## -*- coding: UTF-8 -*-
+## export.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import (
+    Optional, Any, Callable, IO, Iterable, Iterator, List, Mapping, Sequence, Union
+)
+
+import csv
+import json
+from collections.abc import Iterable as IterableABC, Mapping as MappingABC
+from contextlib import contextmanager
+from itertools import chain, islice
+
+from .containers import unwrap_nested
+from .patterns import Container
+
+SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+NATIVE_TYPES = frozenset((dict, list, tuple, Container))
+CHUNK_ITEMS = 1024
+CHUNK_NODES = 1 << 12
+CHUNK_DEPTH = 64
+BUFFER_SIZE = 1 << 16
+_NOTHING = object()
+
+Destination = Union[str, IO[str]]
+
+
+@contextmanager
+def _open(destination: Destination, **kwargs: Any) -> Iterator[IO[str]]:
+    """
+    Args:
+        destination => path or open text stream
+        kwargs      => arguments to open (if destination is a path)
+    Returns:
+        Context manager yielding a text stream, which is closed on exit
+        only if it was opened here.
+    Preconditions:
+        N/A
+    """
+    if isinstance(destination, str):
+        with open(destination, 'w', encoding='utf-8', **kwargs) as stream:
+            yield stream
+    else:
+        yield destination
+
+
+def _is_array(value: Any) -> bool:
+    """Whether value is encoded as a JSON array"""
+    return isinstance(value, IterableABC) and \
+        not isinstance(value, (str, bytes, bytearray, memoryview, MappingABC))
+
+
+def _native_budget(value: Any, budget: int) -> int:
+    """
+    Args:
+        value   => dict, list, tuple or Container
+        budget  => number of members and items value may have in total
+    Returns:
+        budget less the number of members and items of value and its
+        descendants, or a negative number if that exceeds budget, value
+        is nested more than CHUNK_DEPTH levels deep (the C encoder
+        recurses), or value contains anything other than scalars and
+        these types (which the C encoder would not encode on its own).
+    Preconditions:
+        N/A
+    """
+    stack = [(value, 0)]
+    while stack:
+        value, depth = stack.pop()
+        budget -= len(value)
+        if budget < 0 or depth > CHUNK_DEPTH:
+            return -1
+        for item in value.values() if isinstance(value, dict) else value:
+            kind = type(item)
+            if kind in NATIVE_TYPES:
+                stack.append((item, depth + 1))
+            elif kind not in SCALAR_TYPES:
+                return -1
+    return budget
+
+
+def _encode_key(key: Any, encode: Callable[[Any], str]) -> str:
+    """
+    Args:
+        key     => mapping key
+        encode  => JSON encoder
+    Returns:
+        key encoded as a JSON string (as json.dumps converts keys).
+    Preconditions:
+        N/A
+    """
+    if not isinstance(key, str):
+        if type(key) not in SCALAR_TYPES:
+            raise TypeError(
+                'keys must be str, int, float, bool or None, not %s'%type(key).__name__
+            )
+        key = encode(key)
+    return encode(key)
+
+
+def _cost(value: Any, budget: int) -> int:
+    """
+    Args:
+        value   => value to encode
+        budget  => @_native_budget
+    Returns:
+        budget less the cost of encoding value with the C encoder (see
+        _native_budget), negative if it cannot or should not be.
+    Preconditions:
+        N/A
+    """
+    kind = type(value)
+    if kind in SCALAR_TYPES:
+        return budget - 1
+    if kind in NATIVE_TYPES:
+        return _native_budget(value, budget - 1)
+    return -1
+
+
+def _mapping_parts(
+    mapping: Mapping[Any, Any],
+    encode: Callable[[Any], str]
+) -> Iterator[Any]:
+    """
+    Args:
+        mapping => mapping to encode as a JSON object
+        encode  => JSON encoder
+    Returns:
+        Iterator of encoded text (str) and (key text, value) pairs of
+        members still to be encoded.  Runs of members whose values are
+        scalars or native containers are encoded in one call per
+        CHUNK_NODES items.
+    Preconditions:
+        N/A
+    """
+    separator = ''
+    run: List[Any] = list()
+    budget = CHUNK_NODES
+    for key, value in mapping.items():
+        remaining = _cost(value, budget)
+        if remaining < 0 and run:
+            yield separator + encode(dict(run))[1:-1]
+            separator = ','
+            run.clear()
+            budget = CHUNK_NODES
+            remaining = _cost(value, budget)
+        if remaining < 0:
+            yield (separator + _encode_key(key, encode) + ':', value)
+            separator = ','
+        else:
+            run.append((key, value))
+            budget = remaining
+    if run:
+        yield separator + encode(dict(run))[1:-1]
+
+
+def _array_parts(values: Iterable[Any], encode: Callable[[Any], str]) -> Iterator[Any]:
+    """
+    Args:
+        values  => iterable to encode as a JSON array
+        encode  => JSON encoder
+    Returns:
+        Iterator of encoded text (str) and (separator, value) pairs of
+        items still to be encoded.  Runs of items that are scalars or
+        native containers are encoded in one call per CHUNK_NODES items.
+    Preconditions:
+        N/A
+    """
+    separator = ''
+    run: List[Any] = list()
+    budget = CHUNK_NODES
+    for value in values:
+        remaining = _cost(value, budget)
+        if remaining < 0 and run:
+            yield separator + encode(run)[1:-1]
+            separator = ','
+            run.clear()
+            budget = CHUNK_NODES
+            remaining = _cost(value, budget)
+        if remaining < 0:
+            yield (separator, value)
+            separator = ','
+        else:
+            run.append(value)
+            budget = remaining
+    if run:
+        yield separator + encode(run)[1:-1]
+
+
+def iter_json(
+    obj: Any,
+    default: Optional[Callable[[Any], Any]] = None,
+    buffer_size: int = BUFFER_SIZE
+) -> Iterator[str]:
+    """
+    Args:
+        obj         => Container (or any mapping), iterable or scalar to encode
+        default     => function returning an encodable version of values that
+                       are not (as for json.dumps)
+        buffer_size => approximate length of each chunk of text
+    Returns:
+        Iterator of chunks of the compact JSON encoding of obj.  Mappings
+        (Container, LazyContainer, SpillContainer...) become objects and
+        other iterables (including generators) become arrays, and both are
+        walked with an explicit stack, so neither the encoded text nor a
+        converted copy of obj is ever held in memory and nesting depth is
+        not limited by the recursion limit.  Runs of scalars and small
+        native containers (dict, list, tuple, Container) of up to
+        CHUNK_NODES items are handed to the json module's C encoder.
+    Preconditions:
+        N/A
+    """
+    encode = json.JSONEncoder(
+        ensure_ascii=False,
+        separators=(',', ':'),
+        check_circular=False
+    ).encode
+    buffer: List[str] = list()
+    buffered = 0
+    stack: List[Any] = list()
+    value = obj
+    converted = False
+    while True:
+        if value is not _NOTHING:
+            value = unwrap_nested(value)
+            if type(value) in SCALAR_TYPES:
+                part = encode(value)
+            elif isinstance(value, MappingABC):
+                part = '{'
+                stack.append((_mapping_parts(value, encode), '}'))
+            elif _is_array(value):
+                part = '['
+                stack.append((_array_parts(value, encode), ']'))
+            elif isinstance(value, (str, int, float)):
+                part = encode(value)
+            elif default is not None and not converted:
+                value = default(value)
+                converted = True
+                continue
+            else:
+                raise TypeError(
+                    'Object of type %s is not JSON serializable'%type(value).__name__
+                )
+            converted = False
+            buffer.append(part)
+            buffered += len(part)
+        if buffered >= buffer_size:
+            yield ''.join(buffer)
+            buffer.clear()
+            buffered = 0
+        if not stack:
+            break
+        parts, closing = stack[-1]
+        item = next(parts, _NOTHING)
+        if item is _NOTHING:
+            stack.pop()
+            part = closing
+            value = _NOTHING
+        elif isinstance(item, str):
+            part = item
+            value = _NOTHING
+        else:
+            part, value = item
+        buffer.append(part)
+        buffered += len(part)
+    if buffer:
+        yield ''.join(buffer)
+
+
+def write_json(
+    obj: Any,
+    destination: Destination,
+    default: Optional[Callable[[Any], Any]] = None
+) -> int:
+    """
+    Args:
+        obj         => Container, iterable of Containers or other value to write
+        destination => path or text stream to write to
+        default     => @iter_json
+    Returns:
+        Number of characters written.  The JSON encoding of obj is written
+        incrementally (see iter_json), so memory use is bounded by the
+        buffer and run sizes rather than by the size of obj.
+    Preconditions:
+        N/A
+    """
+    written = 0
+    with _open(destination) as stream:
+        for chunk in iter_json(obj, default):
+            stream.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def _jsonable(default: Optional[Callable[[Any], Any]]) -> Callable[[Any], Any]:
+    """
+    Args:
+        default => @iter_json
+    Returns:
+        Default function for json.JSONEncoder that converts mappings and
+        iterables json does not support natively, then falls back to default.
+    Preconditions:
+        N/A
+    """
+    def convert(value: Any) -> Any:
+        unwrapped = unwrap_nested(value)
+        if unwrapped is not value:
+            return unwrapped
+        if isinstance(value, MappingABC):
+            return dict(value.items())
+        if _is_array(value):
+            return list(value)
+        if default is not None:
+            return default(value)
+        raise TypeError(
+            'Object of type %s is not JSON serializable'%type(value).__name__
+        )
+    return convert
+
+
+def write_jsonl(
+    records: Union[Mapping[str, Any], Iterable[Mapping[str, Any]]],
+    destination: Destination,
+    default: Optional[Callable[[Any], Any]] = None
+) -> int:
+    """
+    Args:
+        records     => Container or iterable of Containers (e.g. a generator
+                       or ContainerTable.to_containers()) to write
+        destination => path or text stream to write to
+        default     => @iter_json
+    Returns:
+        Number of records written, one compact JSON object per line.
+        Records are encoded and written one batch at a time, so only one
+        batch of records is held in memory.
+    Preconditions:
+        N/A
+    """
+    if isinstance(records, MappingABC):
+        records = (records,)
+    encode = json.JSONEncoder(
+        ensure_ascii=False,
+        separators=(',', ':'),
+        check_circular=False,
+        default=_jsonable(default)
+    ).encode
+    count = 0
+    records = iter(records)
+    with _open(destination) as stream:
+        while True:
+            batch = [
+                encode(unwrap_nested(record)) for record in islice(records, CHUNK_ITEMS)
+            ]
+            if not batch:
+                break
+            batch.append('')
+            stream.write('\n'.join(batch))
+            count += len(batch) - 1
+    return count
+
+
+def flatten(
+    record: Mapping[str, Any],
+    separator: str = '.',
+    prefix: str = ''
+) -> Iterator[Any]:
+    """
+    Args:
+        record      => (possibly nested) Container to flatten
+        separator   => string joining keys of nested mappings
+        prefix      => prefix of keys of record
+    Returns:
+        Iterator of (key, value) pairs of the leaves of record, where
+        nested mappings contribute their members under joined keys (e.g.
+        host.name) and arrays are encoded as JSON text.
+    Preconditions:
+        N/A
+    """
+    for key, value in unwrap_nested(record).items():
+        key = prefix + str(key)
+        value = unwrap_nested(value)
+        if isinstance(value, MappingABC):
+            yield from flatten(value, separator, key + separator)
+        elif _is_array(value):
+            yield key, ''.join(iter_json(value, str))
+        else:
+            yield key, value
+
+
+def write_csv(
+    records: Union[Mapping[str, Any], Iterable[Mapping[str, Any]]],
+    destination: Destination,
+    fields: Optional[Sequence[str]] = None,
+    separator: str = '.',
+    extrasaction: str = 'ignore',
+    **kwargs: Any
+) -> int:
+    """
+    Args:
+        records         => Container or iterable of Containers to write
+        destination     => path or text stream (opened with newline='')
+                           to write to
+        fields          => column names (defaults to the flattened keys of
+                           the first record)
+        separator       => @flatten
+        extrasaction    => what to do with keys not in fields, 'ignore' or
+                           'raise' (as for csv.DictWriter)
+        kwargs          => formatting parameters for csv.writer
+    Returns:
+        Number of rows written (after the header row).  Records are
+        flattened (see flatten) and written one batch at a time, so only
+        one batch of rows is held in memory.
+    Preconditions:
+        N/A
+    """
+    if isinstance(records, MappingABC):
+        records = (records,)
+    rows = (dict(flatten(record, separator)) for record in records)
+    count = 0
+    with _open(destination, newline='') as stream:
+        if fields is None:
+            first = next(rows, None)
+            if first is None:
+                return 0
+            fields = list(first)
+            rows = chain((first,), rows)
+        writer = csv.DictWriter(stream, fields, extrasaction=extrasaction, **kwargs)
+        writer.writeheader()
+        while True:
+            batch = list(islice(rows, CHUNK_ITEMS))
+            if not batch:
+                break
+            writer.writerows(batch)
+            count += len(batch)
+    return count
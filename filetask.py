@@ -0,0 +1,189 @@
+## -*- coding: UTF-8 -*-
+## filetask.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Iterator, Tuple
+
+import mmap
+import os
+
+from .task import TaskResult, BaseTask
+
+_MADV_SEQUENTIAL = getattr(mmap, 'MADV_SEQUENTIAL', None)
+_MADV_DONTNEED = getattr(mmap, 'MADV_DONTNEED', None)
+DROP_BEHIND_BYTES = 1 << 24
+
+
+class MappedFileTask(BaseTask):
+    """Task over a single input file that is memory-mapped read-only in
+    _preamble instead of being read into memory, so files larger than RAM
+    can be processed and pages are only loaded when touched.
+    _process_task accesses the file through window (zero-copy memoryview
+    slices) and chunks (sequential iteration).  The mapping is released
+    by _postamble, and by run even if the task raises; views into the file
+    must not be kept past the end of the run.
+
+    Subclasses that extend _preamble or _postamble must call the parent
+    implementation.
+    """
+
+    def __init__(self,
+        result: Optional[TaskResult] = None,
+        drop_behind: bool = False
+    ) -> None:
+        """
+        Args:
+            result      => @BaseTask.__init__
+            drop_behind => release pages of chunks already iterated (see
+                           chunks) to keep resident memory flat on very
+                           large files
+        """
+        super().__init__(result)
+        self.drop_behind = drop_behind
+        self.path = None
+        self.size = 0
+        self._file = None
+        self._map = None
+        self._view = memoryview(b'')
+
+    @property
+    def view(self) -> memoryview:
+        """Getter for memoryview of the whole mapped file"""
+        return self._view
+
+    def _preamble(self,                 #pylint: disable=W0613
+        path: str,
+        *args: Any,
+        **kwargs: Any
+    ) -> None:
+        """
+        Args:
+            path    => path of input file
+        Procedure:
+            Open and memory-map the input file.
+        Preconditions:
+            N/A
+        """
+        self._close()
+        self.path = path
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        if self.size == 0:
+            return
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+    def _postamble(self) -> None:
+        """@BaseTask._postamble"""
+        self._close()
+
+    def run(self, *args: Any, **kwargs: Any) -> Optional[TaskResult]:
+        """@BaseTask.run"""
+        try:
+            return super().run(*args, **kwargs)
+        finally:
+            self._close()
+
+    def window(self, offset: int, length: int) -> memoryview:
+        """
+        Args:
+            offset  => offset of window in file
+            length  => length of window
+        Returns:
+            Zero-copy view of length bytes of the file starting at offset,
+            truncated at the end of the file.
+        Preconditions:
+            offset >= 0 and length >= 0
+        """
+        return self._view[offset:offset + length]
+
+    def chunks(self,
+        chunk_size: int,
+        start: int = 0,
+        end: Optional[int] = None,
+        overlap: int = 0
+    ) -> Iterator[Tuple[int, memoryview]]:
+        """
+        Args:
+            chunk_size  => number of bytes per chunk
+            start       => offset to start from
+            end         => offset to stop at (defaults to end of file)
+            overlap     => number of bytes each chunk extends into the next
+                           (e.g. for signatures spanning chunk boundaries)
+        Returns:
+            Iterator of (offset, view) pairs of consecutive chunks of the
+            file.  The kernel is advised of sequential access, and with
+            drop_behind the pages of each chunk are released once the
+            next chunk is requested (in batches of DROP_BEHIND_BYTES).
+        Preconditions:
+            chunk_size > 0 and overlap >= 0
+        """
+        end = self.size if end is None else min(end, self.size)
+        if self._map is not None and _MADV_SEQUENTIAL is not None:
+            self._map.madvise(_MADV_SEQUENTIAL)
+        dropped = start
+        for offset in range(start, end, chunk_size):
+            yield offset, self._view[offset:min(offset + chunk_size + overlap, end)]
+            if self.drop_behind and offset + chunk_size - dropped >= DROP_BEHIND_BYTES:
+                self._drop(dropped, offset + chunk_size - dropped)
+                dropped = offset + chunk_size
+
+    def _drop(self, offset: int, length: int) -> None:
+        """
+        Args:
+            offset  => offset of range to release
+            length  => length of range to release
+        Procedure:
+            Advise the kernel that the whole pages within the range are no
+            longer needed (they are re-read from the file if touched again).
+        Preconditions:
+            N/A
+        """
+        if self._map is None or _MADV_DONTNEED is None:
+            return
+        first = -(-offset // mmap.PAGESIZE) * mmap.PAGESIZE
+        last = (offset + length) // mmap.PAGESIZE * mmap.PAGESIZE
+        if last > first:
+            self._map.madvise(_MADV_DONTNEED, first, last - first)
+
+    def _close(self) -> None:
+        """
+        Args:
+            N/A
+        Procedure:
+            Release the mapping and close the input file.  If views into
+            the mapping are still held elsewhere, the mapping is released
+            once they are.
+        Preconditions:
+            N/A
+        """
+        self._view.release()
+        self._view = memoryview(b'')
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
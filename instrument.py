@@ -0,0 +1,313 @@
+## -*- coding: UTF-8 -*-
+## instrument.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Callable, Dict, Iterable, Sequence, TYPE_CHECKING
+
+from bisect import bisect_left
+from threading import Lock
+from time import perf_counter, thread_time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .patterns import Container
+
+if TYPE_CHECKING:
+    import cProfile
+    import pstats
+
+# cProfile, pstats and tracemalloc are imported when first needed, as they
+# are only used when profiling or tracing and dominate the import time of
+# this module (and so of task)
+
+PHASES = ('preamble', 'process_task', 'postamble')
+HISTOGRAM_BOUNDS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+Observer = Callable[[Any, Container], None]
+
+
+class TaskStats:
+    """Observer aggregating the metrics of many task runs per task class:
+    run and error counts, and per-phase total/min/max wall and CPU time
+    with a histogram of wall times (counts of runs at or below each bound
+    in HISTOGRAM_BOUNDS, and above the last bound).
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._stats = dict()
+
+    def __call__(self, task: Any, metrics: Container) -> None:
+        with self._lock:
+            stats = self._stats.get(metrics.task)
+            if stats is None:
+                stats = self._stats[metrics.task] = Container(
+                    runs=0,
+                    errors=0,
+                    phases=Container()
+                )
+            stats.runs += 1
+            if metrics.error is not None:
+                stats.errors += 1
+            for phase, phase_metrics in metrics.phases.items():
+                phase_stats = stats.phases.get(phase)
+                if phase_stats is None:
+                    phase_stats = stats.phases[phase] = Container(
+                        count=0,
+                        wall_total=0.0,
+                        wall_min=None,
+                        wall_max=None,
+                        cpu_total=0.0,
+                        histogram=[0] * (len(HISTOGRAM_BOUNDS) + 1)
+                    )
+                wall = phase_metrics.wall
+                phase_stats.count += 1
+                phase_stats.wall_total += wall
+                phase_stats.cpu_total += phase_metrics.cpu
+                phase_stats.wall_min = wall if phase_stats.wall_min is None \
+                    else min(phase_stats.wall_min, wall)
+                phase_stats.wall_max = wall if phase_stats.wall_max is None \
+                    else max(phase_stats.wall_max, wall)
+                phase_stats.histogram[bisect_left(HISTOGRAM_BOUNDS, wall)] += 1
+
+    def get(self, task_cls: Any) -> Optional[Container]:
+        """
+        Args:
+            task_cls    => task class (or its qualified name)
+        Returns:
+            Copy of aggregated stats of task_cls, None if it never ran.
+        Preconditions:
+            N/A
+        """
+        if not isinstance(task_cls, str):
+            task_cls = _qualified_name(task_cls)
+        return self.snapshot().get(task_cls)
+
+    def snapshot(self) -> Dict[str, Container]:
+        """Copy of aggregated stats of every task class by qualified name"""
+        with self._lock:
+            return {
+                name: Container(
+                    runs=stats.runs,
+                    errors=stats.errors,
+                    phases=Container(
+                        (phase, Container(
+                            phase_stats,
+                            histogram=list(phase_stats.histogram)
+                        )) for phase, phase_stats in stats.phases.items()
+                    )
+                ) for name, stats in self._stats.items()
+            }
+
+    def reset(self) -> None:
+        """Discard all aggregated stats"""
+        with self._lock:
+            self._stats = dict()
+
+
+STATS = TaskStats()
+
+
+class Instrumentation:
+    """Instrumentation of BaseTask.run.  When enabled, each run records
+    wall and CPU (thread) time of each phase (_preamble, _process_task and
+    _postamble) and the process's peak RSS onto result.metrics, passes
+    the metrics to each observer (by default the global TaskStats STATS),
+    and optionally profiles the run with cProfile (metrics.profile, see
+    profile_stats) and/or traces peak Python memory of each phase with
+    tracemalloc (phase peak_memory, in bytes).
+
+    Instrumentation is set per task (BaseTask.instrumentation) or globally
+    with configure.  When neither is set or enabled, run only pays for
+    checking them.
+    """
+
+    def __init__(self,
+        enabled: bool = True,
+        profile: bool = False,
+        trace_memory: bool = False,
+        observers: Optional[Iterable[Observer]] = None
+    ) -> None:
+        """
+        Args:
+            enabled         => whether to instrument runs
+            profile         => whether to profile runs with cProfile
+            trace_memory    => whether to trace memory with tracemalloc
+            observers       => callables taking (task, metrics) after each
+                               run (defaults to [STATS])
+        """
+        self.enabled = enabled
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.observers = [STATS] if observers is None else list(observers)
+
+    def add_observer(self, observer: Observer) -> None:
+        """Add observer called with (task, metrics) after each run"""
+        self.observers.append(observer)
+
+    def run(self, task: Any, args: Sequence[Any], kwargs: Dict[str, Any]) -> Any:
+        """
+        Args:
+            task    => task to run
+            args    => positional arguments to task._preamble
+            kwargs  => keyword arguments to task._preamble
+        Returns:
+            Result of task, with result.metrics set if task has a result.
+            Exceptions raised by a phase are recorded in metrics.error and
+            re-raised after the observers are notified.
+        Preconditions:
+            N/A
+        """
+        metrics = Container(
+            task=_qualified_name(type(task)),
+            phases=Container(),
+            wall=0.0,
+            cpu=0.0,
+            max_rss=None,
+            error=None,
+            profile=None
+        )
+        profiler = None
+        if self.profile:
+            import cProfile     #pylint: disable=C0415
+            profiler = cProfile.Profile()
+        started_tracing = False
+        if self.trace_memory:
+            import tracemalloc  #pylint: disable=C0415
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+        try:    #pylint: disable=W0212
+            self._run_phase(metrics, 'preamble', task._preamble, args, kwargs, profiler)
+            self._run_phase(metrics, 'process_task', task._process_task, (), {}, profiler)
+            self._run_phase(metrics, 'postamble', task._postamble, (), {}, profiler)
+        except Exception as exc:
+            metrics.error = '%s: %s'%(type(exc).__name__, exc)
+            raise
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            if profiler is not None:
+                profiler.create_stats()
+                metrics.profile = profiler.stats
+            if resource is not None:
+                metrics.max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if task.result is not None:
+                task.result.metrics = metrics
+            for observer in self.observers:
+                observer(task, metrics)
+        return task.result
+
+    def _run_phase(self,
+        metrics: Container,
+        phase: str,
+        func: Callable[..., Any],
+        args: Sequence[Any],
+        kwargs: Dict[str, Any],
+        profiler: Optional['cProfile.Profile']
+    ) -> None:
+        """
+        Args:
+            metrics     => metrics of the current run
+            phase       => name of phase
+            func        => phase method of task
+            args        => positional arguments to func
+            kwargs      => keyword arguments to func
+            profiler    => profiler to enable during func, if any
+        Procedure:
+            Call func, recording its wall and CPU time (and peak memory if
+            tracing) in metrics.phases[phase] even if it raises.
+        Preconditions:
+            N/A
+        """
+        if self.trace_memory:
+            import tracemalloc  #pylint: disable=C0415
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        wall = perf_counter()
+        cpu = thread_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            func(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            phase_metrics = metrics.phases[phase] = Container(
+                wall=perf_counter() - wall,
+                cpu=thread_time() - cpu,
+                peak_memory=None
+            )
+            if self.trace_memory:
+                phase_metrics.peak_memory = tracemalloc.get_traced_memory()[1] - baseline
+            metrics.wall += phase_metrics.wall
+            metrics.cpu += phase_metrics.cpu
+
+
+_DEFAULT = None
+
+
+def configure(instrumentation: Optional[Instrumentation]) -> None:
+    """
+    Args:
+        instrumentation => instrumentation of every task without its own
+                           (None to disable)
+    Procedure:
+        Set the global default instrumentation.
+    Preconditions:
+        N/A
+    """
+    global _DEFAULT     #pylint: disable=W0603
+    _DEFAULT = instrumentation
+
+
+def get_default() -> Optional[Instrumentation]:
+    """Getter for the global default instrumentation"""
+    return _DEFAULT
+
+
+def profile_stats(metrics: Container) -> Optional['pstats.Stats']:
+    """
+    Args:
+        metrics => metrics of a run profiled with cProfile
+    Returns:
+        pstats.Stats of the run (e.g. for print_stats), None if the run
+        was not profiled.
+    Preconditions:
+        N/A
+    """
+    if metrics.profile is None:
+        return None
+    import pstats   #pylint: disable=C0415
+    class _Profile:     #pylint: disable=R0903
+        stats = metrics.profile
+        def create_stats(self) -> None:
+            """Stats are already created"""
+    return pstats.Stats(_Profile())
+
+
+def _qualified_name(cls: Any) -> str:
+    """Module-qualified name of cls"""
+    return '%s.%s'%(cls.__module__, cls.__qualname__)
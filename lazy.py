@@ -0,0 +1,87 @@
+## -*- coding: UTF-8 -*-
+## lazy.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+# This module is imported by the package's __init__ on every startup, so it
+# avoids importing typing and collections (which cost more than the rest of
+# the import): annotations use builtin generics and the ABCs of
+# _collections_abc (already loaded by os), and are not evaluated at runtime
+from __future__ import annotations
+
+import importlib
+import sys
+from _collections_abc import Callable, Iterable, Mapping
+
+
+def attach(
+    package_name: str,
+    submodules: Iterable[str] = tuple(),
+    attributes: Mapping[str, Iterable[str]] | None = None
+) -> tuple[Callable[[str], object], Callable[[], list[str]], list[str]]:
+    """
+    Args:
+        package_name    => __name__ of the package
+        submodules      => names of submodules to expose as attributes
+        attributes      => mapping of submodule name to names of its
+                           attributes to expose as package attributes
+    Returns:
+        (__getattr__, __dir__, __all__) for the package's __init__, so that
+        submodules are only imported when they, or one of their exposed
+        attributes, are first accessed.  For example:
+            __getattr__, __dir__, __all__ = lazy.attach(
+                __name__,
+                submodules=['parsers'],
+                attributes=dict(parsers=['MFTParser'])
+            )
+        Loaded attributes are cached in the package namespace, so later
+        accesses do not go through __getattr__.  __all__ only lists the
+        exposed attributes, so a star import does not import every
+        submodule.
+    Preconditions:
+        N/A
+    """
+    submodules = set(submodules)
+    attribute_modules = dict()
+    for submodule, names in (attributes or dict()).items():
+        for name in names:
+            attribute_modules[name] = submodule
+    exported = sorted(attribute_modules)
+
+    def __getattr__(name: str) -> object:
+        if name in submodules:
+            return importlib.import_module('%s.%s'%(package_name, name))
+        submodule = attribute_modules.get(name)
+        if submodule is None:
+            raise AttributeError('module %r has no attribute %r'%(package_name, name))
+        value = getattr(
+            importlib.import_module('%s.%s'%(package_name, submodule)),
+            name
+        )
+        setattr(sys.modules[package_name], name, value)
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted(
+            set(vars(sys.modules[package_name])) | submodules | set(exported)
+        )
+
+    return __getattr__, __dir__, exported
@@ -0,0 +1,302 @@
+## -*- coding: UTF-8 -*-
+## log.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, List, TextIO, Union
+
+import atexit
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import queue as queue_module
+import sys
+import time
+from threading import Lock, Thread
+
+from .config import LOGGING_DEFAULTS
+
+_STOP = None
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord(dict()))) \
+    | {'message', 'asctime'}
+
+
+class JSONLinesFormatter(logging.Formatter):
+    """Formats records as compact single-line JSON objects with the
+    record's time, level, logger name and message, the formatted exception
+    and stack (if any), and any extra attributes passed to the logging
+    call (e.g. logger.info('parsed', extra=dict(records=10))), which should
+    be JSON serializable (others are logged as their repr).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = dict(
+            time=self.formatTime(record, self.datefmt),
+            level=record.levelname,
+            logger=record.name,
+            message=record.getMessage()
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        return json.dumps(entry, separators=(',', ':'), default=repr)
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        """Time of record with milliseconds (see logging.Formatter.formatTime)"""
+        return '%s.%03d'%(super().formatTime(record, datefmt), record.msecs)
+
+
+class BatchingStreamHandler(logging.StreamHandler):
+    """StreamHandler that buffers formatted records and writes them to the
+    stream in one call once capacity records are buffered or flush is
+    called (by LogWriter, every flush_interval seconds).
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None, capacity: int = 512) -> None:
+        super().__init__(stream)
+        self.capacity = capacity
+        self.buffer = list()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.buffer.append(self.format(record) + self.terminator)
+            if len(self.buffer) >= self.capacity:
+                self.flush()
+        except Exception:   #pylint: disable=W0703
+            self.handleError(record)
+
+    def flush(self) -> None:
+        self.acquire()
+        try:
+            if self.buffer:
+                self.stream.write(''.join(self.buffer))
+                self.buffer.clear()
+            if hasattr(self.stream, 'flush'):
+                self.stream.flush()
+        finally:
+            self.release()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that only merges a record's message and arguments and
+    renders its exception before enqueuing it (so it can be pickled and
+    arguments changed later do not affect it), leaving formatting to the
+    LogWriter.
+    """
+    _exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                formatter = self._exception_formatter
+                record.exc_text = formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class LogWriter:
+    """Background writer that takes records from a queue (fed by the
+    queue handlers installed by configure_logging and
+    configure_worker_logging) and passes them to its handlers in a single
+    thread, flushing the handlers at most flush_interval seconds after the
+    first unflushed record.
+    """
+
+    def __init__(self,
+        queue: Any,
+        handlers: List[logging.Handler],
+        flush_interval: float = 0.5
+    ) -> None:
+        """
+        Args:
+            queue           => queue records are received on
+            handlers        => handlers to pass records to
+            flush_interval  => maximum seconds records stay buffered
+        """
+        self.queue = queue
+        self.handlers = handlers
+        self.flush_interval = flush_interval
+        self.queue_handler = None
+        self.logger = None
+        self._owned_streams = list()
+        self._thread = None
+        self._lock = Lock()
+
+    def start(self) -> 'LogWriter':
+        """Start the writer thread"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name='LogWriter', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Write every queued record, stop the writer thread, and remove
+        the queue handler installed by configure_logging (if any)"""
+        with self._lock:
+            if self.logger is not None:
+                self.logger.removeHandler(self.queue_handler)
+                self.logger = None
+            if self._thread is None:
+                return
+            self.queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        for handler in self.handlers:
+            handler.close()
+        for stream in self._owned_streams:
+            stream.close()
+        self._owned_streams = list()
+
+    def __enter__(self) -> 'LogWriter':
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        """
+        Args:
+            N/A
+        Procedure:
+            Handle queued records until stopped, flushing the handlers when
+            flush_interval has passed since the first unflushed record or
+            the queue is stopped.
+        Preconditions:
+            N/A
+        """
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                record = self.queue.get(timeout=timeout)
+            except queue_module.Empty:
+                self._flush()
+                deadline = None
+                continue
+            if record is _STOP:
+                self._flush()
+                return
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self) -> None:
+        """Flush every handler"""
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except Exception:   #pylint: disable=W0703
+                pass
+
+
+def configure_logging(
+    stream: Optional[TextIO] = None,
+    filename: Optional[str] = None,
+    structured: bool = False,
+    level: Optional[Union[int, str]] = None,
+    logger: Optional[str] = None,
+    capacity: int = 512,
+    flush_interval: float = 0.5,
+    multiprocess: bool = False,
+    mp_context: Optional[Any] = None
+) -> LogWriter:
+    """
+    Args:
+        stream          => stream to write to (defaults to sys.stderr)
+        filename        => file to append to instead of stream
+        structured      => write JSON lines (see JSONLinesFormatter) instead
+                           of text formatted with LOGGING_DEFAULTS
+        level           => logger level (defaults to LOGGING_DEFAULTS level)
+        logger          => name of logger to configure (defaults to root)
+        capacity        => number of records buffered before a write
+        flush_interval  => maximum seconds records stay buffered
+        multiprocess    => use a multiprocessing queue, so worker processes
+                           can log to it (see configure_worker_logging)
+        mp_context      => multiprocessing context of the queue
+    Returns:
+        Started LogWriter.  Logging calls on the configured logger only
+        merge the message and enqueue the record; formatting and batched
+        writes happen on the writer's thread.  The writer is stopped (and
+        queued records written) at exit, or by calling stop.
+    Preconditions:
+        N/A
+    """
+    owned_streams = list()
+    if filename is not None:
+        stream = open(filename, 'a', encoding='utf-8')
+        owned_streams.append(stream)
+    elif stream is None:
+        stream = sys.stderr
+    handler = BatchingStreamHandler(stream, capacity)
+    if structured:
+        handler.setFormatter(JSONLinesFormatter(datefmt=LOGGING_DEFAULTS['datefmt']))
+    else:
+        handler.setFormatter(logging.Formatter(
+            LOGGING_DEFAULTS['format'],
+            LOGGING_DEFAULTS['datefmt']
+        ))
+    if multiprocess:
+        queue = (mp_context or multiprocessing).Queue()
+    else:
+        queue = queue_module.SimpleQueue()
+    writer = LogWriter(queue, [handler], flush_interval)
+    writer._owned_streams = owned_streams  #pylint: disable=W0212
+    writer.logger = logging.getLogger(logger)
+    writer.queue_handler = _QueueHandler(queue)
+    writer.logger.addHandler(writer.queue_handler)
+    writer.logger.setLevel(LOGGING_DEFAULTS['level'] if level is None else level)
+    atexit.register(writer.stop)
+    return writer.start()
+
+
+def configure_worker_logging(queue: Any, level: Optional[Union[int, str]] = None) -> None:
+    """
+    Args:
+        queue   => LogWriter.queue of a writer configured with multiprocess
+        level   => root logger level (defaults to LOGGING_DEFAULTS level)
+    Procedure:
+        Send every record logged in this (worker) process to queue instead of
+        the handlers it was configured with, e.g. as the initializer of a
+        ProcessPoolExecutor:
+            ProcessPoolExecutor(
+                initializer=configure_worker_logging,
+                initargs=(writer.queue,)
+            )
+    Preconditions:
+        N/A
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(queue))
+    root.setLevel(LOGGING_DEFAULTS['level'] if level is None else level)
@@ -0,0 +1,452 @@
+## -*- coding: UTF-8 -*-
+## manifest.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Iterable, Tuple
+
+import hashlib
+import json
+import os
+import pkgutil
+import sys
+import tempfile
+from importlib import import_module, metadata, reload, util
+from threading import RLock
+
+from .patterns import Container
+
+
+class RegistryManifest:
+    """On-disk manifest of the classes added to a registry (see
+    RegistryMetaclassMixin), mapping each registered name to the module
+    and qualified name that define it plus the values of the registry's
+    indexed attributes.  A registry using a manifest (see
+    RegistryMetaclassMixin.use_manifest) imports a module only when one
+    of its classes is first retrieved.  Each module's path, mtime, size
+    and SHA-256 digest are recorded, and entries of a module whose file
+    has changed are never served: the module is imported and its entries
+    recorded again instead.  Changes to entries are serialized by a lock,
+    so classes can be retrieved from several threads.
+    """
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self.entries = dict()
+        self.sources = dict()
+        self.modified = False
+        self._metadata_index = None
+        self._lock = RLock()
+
+    @classmethod
+    def load(cls, path: str) -> 'RegistryManifest':
+        """
+        Args:
+            path    => path to manifest file
+        Returns:
+            Manifest loaded from path, or an empty manifest (that will be
+            saved to path) if path does not exist or is not a valid manifest.
+        Preconditions:
+            N/A
+        """
+        manifest = cls(path)
+        try:
+            with open(path, 'r') as manifest_file:
+                data = json.load(manifest_file)
+            if data.get('version') != cls.VERSION:
+                raise ValueError('Unsupported manifest version')
+            manifest.entries = {
+                name: Container(entry) for name, entry in data['entries'].items()
+            }
+            manifest.sources = {
+                module: Container(source) for module, source in data['sources'].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            manifest.entries = dict()
+            manifest.sources = dict()
+            manifest.modified = True
+        return manifest
+
+    def save(self, path: Optional[str] = None) -> None:
+        """
+        Args:
+            path    => path to save manifest to (defaults to self.path)
+        Procedure:
+            Atomically replace the manifest file with the current entries.
+        Preconditions:
+            path or self.path is not None
+        """
+        with self._lock:
+            if path is None:
+                path = self.path
+            directory = os.path.dirname(os.path.abspath(path))
+            with tempfile.NamedTemporaryFile(
+                'w', dir=directory, prefix='.manifest', delete=False
+            ) as manifest_file:
+                json.dump(dict(
+                    version=self.VERSION,
+                    entries=self.entries,
+                    sources=self.sources
+                ), manifest_file, sort_keys=True)
+            os.replace(manifest_file.name, path)
+            self.modified = False
+
+    def is_fresh(self, module_name: str) -> bool:
+        """
+        Args:
+            module_name => name of module to check
+        Returns:
+            True if the module's entries were recorded from its current
+            source file, False otherwise.  Only hashes the file if its
+            mtime or size changed since it was recorded.
+        Preconditions:
+            N/A
+        """
+        source = self.sources.get(module_name)
+        if source is None:
+            return False
+        if source.path is None:
+            return source.version is not None and \
+                source.version == _distribution_version(source.distribution)
+        try:
+            stat = os.stat(source.path)
+        except OSError:
+            return False
+        if stat.st_mtime_ns == source.mtime and stat.st_size == source.size:
+            return True
+        if _file_digest(source.path) != source.digest:
+            return False
+        source.mtime = stat.st_mtime_ns
+        source.size = stat.st_size
+        self.modified = True
+        return True
+
+    def record_module(self, metaclass: Any, module_name: str) -> None:
+        """
+        Args:
+            metaclass   => registry metaclass to record classes of
+            module_name => name of module to record
+        Procedure:
+            Import the module (reloading it if it was imported from a
+            source that has since changed) and replace its entries with
+            the classes it added to the registry of metaclass.
+        Preconditions:
+            N/A
+        """
+        with self._lock:
+            stale = module_name in self.sources and module_name in sys.modules
+            self.forget_module(module_name)
+            module = import_module(module_name)
+            if stale:
+                module = reload(module)
+            origin = getattr(module, '__file__', None)
+            if origin is not None:
+                stat = os.stat(origin)
+                self.sources[module_name] = Container(
+                    path=origin,
+                    mtime=stat.st_mtime_ns,
+                    size=stat.st_size,
+                    digest=_file_digest(origin)
+                )
+            for name, new_cls in metaclass.registry().items():
+                if new_cls.__module__ == module_name and \
+                    _resolve_qualname(module, new_cls.__qualname__) is new_cls:
+                    self._record_class(metaclass, name, new_cls)
+            self.modified = True
+
+    def forget_module(self, module_name: str) -> None:
+        """
+        Args:
+            module_name => name of module to forget
+        Procedure:
+            Remove the module and all of its entries from the manifest.
+        Preconditions:
+            N/A
+        """
+        with self._lock:
+            if self.sources.pop(module_name, None) is not None:
+                self.modified = True
+            for name in [
+                name for name, entry in self.entries.items() \
+                if entry.module == module_name
+            ]:
+                del self.entries[name]
+                self.modified = True
+            self._metadata_index = None
+
+    def discover_package(self, metaclass: Any, package: str) -> None:
+        """
+        Args:
+            metaclass   => registry metaclass to record classes of
+            package     => name of package to discover classes in
+        Procedure:
+            Walk the modules of package (and its subpackages) without
+            importing them, import and record every module that is not
+            fresh, and forget modules that no longer exist.
+        Preconditions:
+            N/A
+        """
+        with self._lock:
+            spec = util.find_spec(package)
+            if spec is None:
+                raise ImportError('No package named %s'%package)
+            discovered = set()
+            if spec.origin is not None:
+                discovered.add(package)
+                if not self.is_fresh(package):
+                    self.record_module(metaclass, package)
+            search_locations = spec.submodule_search_locations or []
+            for module_name in _walk_modules(search_locations, package):
+                discovered.add(module_name)
+                if not self.is_fresh(module_name):
+                    self.record_module(metaclass, module_name)
+            prefix = package + '.'
+            for module_name in list(self.sources):
+                if (module_name == package or module_name.startswith(prefix)) and \
+                    module_name not in discovered:
+                    self.forget_module(module_name)
+
+    def discover_entry_points(self, metaclass: Any, group: str) -> None:
+        """
+        Args:
+            metaclass   => registry metaclass to record classes of
+            group       => entry point group naming registered classes
+        Procedure:
+            Record each entry point in group under its name, importing it
+            only if it is new or its distribution version changed.
+        Preconditions:
+            Each entry point in group refers to a class added to the
+            registry of metaclass under the entry point's name.
+        """
+        with self._lock:
+            discovered = set()
+            for entry_point in _entry_points(group):
+                discovered.add(entry_point.name)
+                module_name, _, qualname = entry_point.value.partition(':')
+                entry = self.entries.get(entry_point.name)
+                if entry is not None and entry.module == module_name and \
+                    entry.qualname == qualname and self.is_fresh(module_name):
+                    continue
+                distribution = getattr(getattr(entry_point, 'dist', None), 'name', None)
+                self.forget_module(module_name)
+                new_cls = entry_point.load()
+                self.sources[module_name] = Container(
+                    path=None,
+                    distribution=distribution,
+                    version=_distribution_version(distribution)
+                )
+                self._record_class(metaclass, entry_point.name, new_cls)
+                self.entries[entry_point.name].update(
+                    module=module_name,
+                    qualname=qualname,
+                    group=group
+                )
+                self.modified = True
+            for name in [
+                name for name, entry in self.entries.items() \
+                if entry.group == group and name not in discovered
+            ]:
+                del self.entries[name]
+                self.modified = True
+                self._metadata_index = None
+
+    def resolve(self, metaclass: Any, name: str) -> None:
+        """
+        Args:
+            metaclass   => registry metaclass the manifest belongs to
+            name        => name of class to resolve
+        Procedure:
+            Import the module defining class name, which adds the class
+            to the registry of metaclass.  If the module changed since it
+            was recorded, its entries are recorded again first, and if it
+            can no longer be imported (e.g. it was deleted) its entries
+            are forgotten.  Recording is serialized, so threads resolving
+            classes of a changed module concurrently record it once.
+        Preconditions:
+            N/A
+        """
+        entry = self.entries.get(name)
+        if entry is not None and self.is_fresh(entry.module):
+            import_module(entry.module)
+            return
+        with self._lock:
+            if name in metaclass.registry():
+                return
+            entry = self.entries.get(name)
+            if entry is None:
+                return
+            if self.is_fresh(entry.module):
+                import_module(entry.module)
+                return
+            try:
+                self.record_module(metaclass, entry.module)
+            except ImportError:
+                self.forget_module(entry.module)
+            if self.path is not None:
+                self.save()
+
+    def names_by(self, attribute: str, value: Any) -> Tuple[str, ...]:
+        """
+        Args:
+            attribute   => name of indexed class attribute
+            value       => value of attribute to look up
+        Returns:
+            Names of recorded classes whose attribute is, or contains, value.
+        Preconditions:
+            N/A
+        """
+        index = self._metadata_index
+        if index is None:
+            with self._lock:
+                index = dict()
+                for name, entry in self.entries.items():
+                    for entry_attribute, entry_value in entry.metadata.items():
+                        if not isinstance(entry_value, list):
+                            entry_value = [entry_value]
+                        for key in entry_value:
+                            try:
+                                index.setdefault((entry_attribute, key), list()) \
+                                    .append(name)
+                            except TypeError:
+                                continue
+                self._metadata_index = index
+        try:
+            return tuple(index.get((attribute, value), tuple()))
+        except TypeError:
+            return tuple()
+
+    def _record_class(self, metaclass: Any, name: str, new_cls: Any) -> None:
+        """
+        Args:
+            metaclass   => registry metaclass new_cls belongs to
+            name        => name new_cls is registered under
+            new_cls     => class to record
+        Procedure:
+            Record the location and JSON-serializable indexed attribute
+            values of new_cls under name.
+        Preconditions:
+            N/A
+        """
+        class_metadata = dict()
+        for attribute in metaclass._INDEXED_ATTRIBUTES:      #pylint: disable=W0212
+            keys = metaclass._index_keys(new_cls, attribute) #pylint: disable=W0212
+            try:
+                json.dumps(keys)
+            except (TypeError, ValueError):
+                continue
+            class_metadata[attribute] = list(keys)
+        self.entries[name] = Container(
+            module=new_cls.__module__,
+            qualname=new_cls.__qualname__,
+            group=None,
+            metadata=class_metadata
+        )
+        self._metadata_index = None
+
+
+def _resolve_qualname(module: Any, qualname: str) -> Optional[Any]:
+    """
+    Args:
+        module      => module to resolve qualname in
+        qualname    => qualified name of object in module
+    Returns:
+        Object named qualname in module, None if it does not exist.
+    Preconditions:
+        N/A
+    """
+    obj = module
+    for attribute in qualname.split('.'):
+        obj = getattr(obj, attribute, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def _walk_modules(paths: Iterable[str], prefix: str) -> Iterable[str]:
+    """
+    Args:
+        paths   => package search locations
+        prefix  => name of package
+    Returns:
+        Names of all modules and subpackages found in paths, recursively,
+        without importing any of them.
+    Preconditions:
+        N/A
+    """
+    for module_info in pkgutil.iter_modules(list(paths), prefix + '.'):
+        yield module_info.name
+        if module_info.ispkg:
+            yield from _walk_modules(
+                [os.path.join(
+                    module_info.module_finder.path,
+                    module_info.name.rpartition('.')[2]
+                )],
+                module_info.name
+            )
+
+
+def _entry_points(group: str) -> Iterable[Any]:
+    """
+    Args:
+        group   => entry point group
+    Returns:
+        Installed entry points in group.
+    Preconditions:
+        N/A
+    """
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        return entry_points.select(group=group)
+    return entry_points.get(group, tuple())
+
+
+def _distribution_version(distribution: Optional[str]) -> Optional[str]:
+    """
+    Args:
+        distribution    => name of installed distribution
+    Returns:
+        Installed version of distribution, or None if not installed.
+    Preconditions:
+        N/A
+    """
+    if distribution is None:
+        return None
+    try:
+        return metadata.version(distribution)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _file_digest(path: str) -> str:
+    """
+    Args:
+        path    => path to file
+    Returns:
+        Hex SHA-256 digest of file contents.
+    Preconditions:
+        N/A
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source_file:
+        for block in iter(lambda: source_file.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
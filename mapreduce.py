@@ -0,0 +1,234 @@
+## -*- coding: UTF-8 -*-
+## mapreduce.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, BinaryIO, Iterable, List, Sequence, Tuple, Union
+
+import os
+from functools import partial
+
+from .patterns import Container
+from .task import TaskStatus, TaskResult, BaseTask
+from .executor import TaskExecutor
+
+ByteRange = Tuple[int, int]
+
+
+def split_range(size: int, chunk_size: int, alignment: int = 1) -> List[ByteRange]:
+    """
+    Args:
+        size        => total number of bytes to split
+        chunk_size  => number of bytes per range
+        alignment   => ranges start at multiples of alignment (e.g. the
+                       sector or cluster size of a disk image)
+    Returns:
+        List of (offset, length) ranges covering size bytes.
+    Preconditions:
+        chunk_size > 0 and alignment > 0
+    """
+    chunk_size = max(alignment, chunk_size - chunk_size % alignment)
+    return [
+        (offset, min(chunk_size, size - offset))
+        for offset in range(0, size, chunk_size)
+    ]
+
+
+def split_records(
+    source: Union[str, BinaryIO],
+    chunk_size: int,
+    delimiter: bytes = b'\n',
+    block_size: int = 1 << 16
+) -> List[ByteRange]:
+    """
+    Args:
+        source      => path or seekable binary file to split
+        chunk_size  => approximate number of bytes per range
+        delimiter   => byte string terminating each record
+        block_size  => number of bytes read at a time when searching for
+                       a delimiter
+    Returns:
+        List of (offset, length) ranges covering source, where every range
+        but the last ends just after a delimiter so no record spans two
+        ranges.
+    Preconditions:
+        chunk_size > 0
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as source_file:
+            return split_records(source_file, chunk_size, delimiter, block_size)
+    size = source.seek(0, os.SEEK_END)
+    boundaries = [0]
+    while boundaries[-1] + chunk_size < size:
+        position = boundaries[-1] + chunk_size
+        source.seek(position)
+        carry = b''
+        boundary = size
+        while True:
+            block = source.read(block_size)
+            if not block:
+                break
+            found = (carry + block).find(delimiter)
+            if found != -1:
+                boundary = position - len(carry) + found + len(delimiter)
+                break
+            carry = block[-(len(delimiter) - 1):] if len(delimiter) > 1 else b''
+            position += len(block)
+        if boundary >= size:
+            break
+        boundaries.append(boundary)
+    boundaries.append(size)
+    return [
+        (start, end - start)
+        for start, end in zip(boundaries, boundaries[1:])
+        if end > start
+    ]
+
+
+class _ChunkTask(BaseTask):
+    """Runs SplittableTask._process_chunk of parent for one chunk in a
+    TaskExecutor worker.
+    """
+
+    def __init__(self,
+        parent: 'SplittableTask',
+        result: Optional[TaskResult] = None
+    ) -> None:
+        super().__init__(result)
+        self.parent = parent
+
+    def _preamble(self, chunk: Any) -> None:
+        """@BaseTask._preamble"""
+        self.chunk = chunk
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        result = self.parent._process_chunk(self.chunk)  #pylint: disable=W0212
+        if not isinstance(result, TaskResult):
+            result = TaskResult(TaskStatus.SUCCESS, result)
+        self.result = result
+
+
+class SplittableTask(BaseTask):
+    """Task whose input splits into independent chunks (for example byte
+    ranges of a disk image, see split_range and split_records) that are
+    processed in parallel and merged into a single result.  Subclasses
+    implement _split, returning the chunks of the input prepared by
+    _preamble, _process_chunk, processing one chunk into a state container
+    (or TaskResult), and _reduce, merging the states of the chunks in split
+    order.
+
+    Chunks are processed on a TaskExecutor, in worker processes by default,
+    so the task (as left by _preamble), chunks and states must be
+    picklable and _preamble should prepare only what the chunks need
+    (e.g. a path rather than an open file).  The status of the result is
+    aggregated over the chunks (see TaskStatus.aggregate): if some chunks
+    fail the result is PARTIAL_SUCCESS, and failed_chunks in its state
+    lists each failed chunk with its error.
+    """
+
+    def __init__(self,
+        result: Optional[TaskResult] = None,
+        max_workers: Optional[int] = None,
+        use_processes: bool = True,
+        mp_context: Optional[Any] = None
+    ) -> None:
+        """
+        Args:
+            result          => @BaseTask.__init__
+            max_workers     => maximum number of chunks processed at once
+            use_processes   => process chunks in worker processes
+            mp_context      => multiprocessing context for worker processes
+        """
+        super().__init__(result)
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.mp_context = mp_context
+
+    def _split(self) -> Iterable[Any]:
+        """
+        Args:
+            N/A
+        Returns:
+            Independent chunks of the input, in order.
+        Preconditions:
+            N/A
+        """
+        raise NotImplementedError(
+            '_split not implemented for type %s'%type(self).__name__
+        )
+
+    def _process_chunk(self, chunk: Any) -> Union[Container[str, Any], TaskResult]:
+        """
+        Args:
+            chunk   => chunk of the input (see _split)
+        Returns:
+            State of processing chunk, or a TaskResult to report a status
+            other than SUCCESS.
+        Preconditions:
+            Runs in a worker, on a copy of the task in process mode
+        """
+        raise NotImplementedError(
+            '_process_chunk not implemented for type %s'%type(self).__name__
+        )
+
+    def _reduce(self, states: Sequence[Container[str, Any]]) -> Container[str, Any]:
+        """
+        Args:
+            states  => states of the chunks that did not fail, in split order
+        Returns:
+            Merged state of the task.
+        Preconditions:
+            N/A
+        """
+        raise NotImplementedError(
+            '_reduce not implemented for type %s'%type(self).__name__
+        )
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        chunks = list(self._split())
+        results = [None] * len(chunks)
+        with TaskExecutor(
+            max_workers=self.max_workers,
+            use_processes=self.use_processes,
+            mp_context=self.mp_context
+        ) as executor:
+            for index, result in executor.map(partial(_ChunkTask, self), chunks):
+                results[index] = result
+        statuses = list()
+        states = list()
+        failed = list()
+        for chunk, result in zip(chunks, results):
+            status = TaskStatus.FAILURE if result is None else result.status
+            statuses.append(status)
+            if status == TaskStatus.FAILURE:
+                failed.append(Container(
+                    chunk=chunk,
+                    error=None if result is None or result.state is None \
+                        else result.state.get('error')
+                ))
+            elif result.state is not None:
+                states.append(result.state)
+        state = self._reduce(states)
+        if failed:
+            state.failed_chunks = failed
+        self.result = TaskResult(TaskStatus.aggregate(statuses), state)
@@ -21,24 +21,56 @@
 ## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 ## SOFTWARE.
 
-from typing import Optional, Any, Dict, TypeVar
+from typing import Optional, Any, Dict, Mapping, Tuple, TypeVar
 T = TypeVar('T')
 S = TypeVar('S')
 
+from threading import RLock
+from types import MappingProxyType
+
+from .signatures import SignatureMatcher, Buffer
+
+_EMPTY_MAPPING = MappingProxyType(dict())
+
 
 class RegistryMetaclassMixin:
     """Registry mixin class implementing registry pattern
     with Python metaprogramming. Intended to be used as
     mixin with type.
+
+    Classes added through _register_class are also indexed by each
+    class attribute named in _INDEXED_ATTRIBUTES, so they can be looked
+    up with retrieve_by without scanning the registry.  Registration
+    is serialized by _REGISTRY_LOCK and is copy-on-write (each write
+    publishes new mappings), so reads never take the lock and always
+    observe a consistent snapshot.  Indexes always belong to the class
+    they are built on and are never inherited.
+
+    If _SIGNATURE_ATTRIBUTE names a class attribute, classes added through
+    _register_class may declare byte signatures in that attribute, either
+    as bytes (matched at offset 0) or as (offset, bytes) pairs where an
+    offset of None matches anywhere.  The registry compiles them into a
+    single SignatureMatcher, and identify returns the candidate classes
+    for a buffer in one pass.
+
+    A registry can also be backed by a RegistryManifest (see use_manifest),
+    in which case classes recorded in the manifest are imported on their
+    first retrieve rather than at startup.
     """
     _REGISTRY = None
+    _REGISTRY_LOCK = RLock()
+    _INDEXED_ATTRIBUTES: Tuple[str, ...] = tuple()
+    _INDEXES = None
+    _SIGNATURE_ATTRIBUTE: Optional[str] = None
+    _SIGNATURE_MATCHER = None
+    _MANIFEST = None
 
     @classmethod
-    def registry(cls) -> Dict[str, Any]:
-        """Getter for copy of static _REGISTRY"""
+    def registry(cls) -> Mapping[str, Any]:
+        """Getter for read-only view of static _REGISTRY"""
         if cls._REGISTRY is None:
-            return dict()
-        return dict(cls._REGISTRY)
+            return _EMPTY_MAPPING
+        return MappingProxyType(cls._REGISTRY)
 
     @classmethod
     def retrieve(cls, name: str) -> Optional[Any]:
@@ -50,7 +82,194 @@ class RegistryMetaclassMixin:
         Preconditions:
             N/A
         """
-        return cls.registry().get(name)
+        registry = cls._REGISTRY
+        if registry is not None and name in registry:
+            return registry[name]
+        if cls._MANIFEST is None:
+            return None
+        cls._MANIFEST.resolve(cls, name)
+        registry = cls._REGISTRY
+        if registry is None:
+            return None
+        return registry.get(name)
+
+    @classmethod
+    def use_manifest(cls,
+        manifest: Any,
+        package: Optional[str] = None,
+        group: Optional[str] = None
+    ) -> None:
+        """
+        Args:
+            manifest    => RegistryManifest to back the registry with
+            package     => name of package to discover classes in
+            group       => name of entry point group to discover classes in
+        Procedure:
+            Discover classes in package and/or group (importing only modules
+            that changed since they were recorded), save the manifest if it
+            changed, and use it to import classes on first retrieve.
+        Preconditions:
+            N/A
+        """
+        if package is not None:
+            manifest.discover_package(cls, package)
+        if group is not None:
+            manifest.discover_entry_points(cls, group)
+        if manifest.modified and manifest.path is not None:
+            manifest.save()
+        cls._MANIFEST = manifest
+
+    @classmethod
+    def retrieve_by(cls, attribute: str, value: Any) -> Tuple[Any, ...]:
+        """
+        Args:
+            attribute   => name of indexed class attribute
+            value       => value of attribute to look up
+        Returns:
+            Tuple of registered classes (in registration order) whose
+            attribute is, or contains, value.
+        Preconditions:
+            attribute is in _INDEXED_ATTRIBUTES
+        """
+        if attribute not in cls._INDEXED_ATTRIBUTES:
+            raise KeyError('%s is not an indexed attribute of %s'%(
+                attribute,
+                cls.__name__
+            ))
+        if cls._MANIFEST is not None:
+            for name in cls._MANIFEST.names_by(attribute, value):
+                cls.retrieve(name)
+        indexes = vars(cls).get('_INDEXES')
+        if indexes is None or attribute not in indexes:
+            return tuple()
+        return indexes[attribute].get(value, tuple())
+
+    @classmethod
+    def signature_matcher(cls) -> SignatureMatcher:
+        """
+        Args:
+            N/A
+        Returns:
+            Matcher compiled from the signatures of all registered classes,
+            built on first use after each registration.
+        Preconditions:
+            N/A
+        """
+        matcher = vars(cls).get('_SIGNATURE_MATCHER')
+        if matcher is None:
+            with cls._REGISTRY_LOCK:
+                matcher = vars(cls).get('_SIGNATURE_MATCHER')
+                if matcher is None:
+                    matcher = SignatureMatcher()
+                    registry = cls._REGISTRY or _EMPTY_MAPPING
+                    for new_cls in registry.values():
+                        for offset, pattern in cls._signatures(new_cls):
+                            matcher.add(pattern, new_cls, offset)
+                    matcher.compile()
+                    cls._SIGNATURE_MATCHER = matcher
+        return matcher
+
+    @classmethod
+    def identify(cls, buffer: Buffer) -> Tuple[Any, ...]:
+        """
+        Args:
+            buffer  => buffer or file header to identify
+        Returns:
+            Tuple of registered classes with a signature matching buffer,
+            classes with the longest matching signature first.  To read
+            only as much of a file as needed, see signature_matcher().window.
+        Preconditions:
+            N/A
+        """
+        if cls._SIGNATURE_ATTRIBUTE is None:
+            return tuple()
+        return cls.signature_matcher().match(buffer)
+
+    @classmethod
+    def _signatures(cls, new_cls: Any) -> Tuple[Tuple[Optional[int], bytes], ...]:
+        """
+        Args:
+            new_cls => class to get declared signatures of
+        Returns:
+            Signatures declared by new_cls as (offset, pattern) pairs.
+        Preconditions:
+            N/A
+        """
+        if cls._SIGNATURE_ATTRIBUTE is None:
+            return tuple()
+        signatures = getattr(new_cls, cls._SIGNATURE_ATTRIBUTE, None)
+        if signatures is None:
+            return tuple()
+        if isinstance(signatures, (bytes, bytearray, memoryview)):
+            signatures = (signatures,)
+        normalized = list()
+        for signature in signatures:
+            if isinstance(signature, (bytes, bytearray, memoryview)):
+                normalized.append((0, bytes(signature)))
+            else:
+                offset, pattern = signature
+                normalized.append((offset, bytes(pattern)))
+        return tuple(normalized)
+
+    @staticmethod
+    def _index_keys(new_cls: Any, attribute: str) -> Tuple[Any, ...]:
+        """
+        Args:
+            new_cls     => class to compute index keys for
+            attribute   => name of indexed class attribute
+        Returns:
+            Keys new_cls should be indexed under for attribute. Attributes
+            that are lists, tuples or sets are indexed under each element,
+            and missing or None attributes are not indexed.
+        Preconditions:
+            N/A
+        """
+        value = getattr(new_cls, attribute, None)
+        if value is None:
+            return tuple()
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return tuple(value)
+        return (value,)
+
+    @classmethod
+    def _register_class(cls, name: str, new_cls: Any) -> None:
+        """
+        Args:
+            name    => name of new class
+            new_cls => new class to add to registry
+        Procedure:
+            Add new_cls to the registry under name and to every index
+            in _INDEXED_ATTRIBUTES, replacing any class previously
+            registered under name, and invalidate the compiled signature
+            matcher.  Intended to be called from _add_class once all checks
+            have passed.
+        Preconditions:
+            Index keys of new_cls are hashable
+        """
+        with cls._REGISTRY_LOCK:
+            registry = dict() if cls._REGISTRY is None else dict(cls._REGISTRY)
+            previous_cls = registry.get(name)
+            registry[name] = new_cls
+            indexes = dict(vars(cls).get('_INDEXES') or _EMPTY_MAPPING)
+            for attribute in cls._INDEXED_ATTRIBUTES:
+                index = dict(indexes.get(attribute, _EMPTY_MAPPING))
+                if previous_cls is not None:
+                    for key in cls._index_keys(previous_cls, attribute):
+                        remaining = tuple(
+                            indexed_cls for indexed_cls in index.get(key, tuple()) \
+                            if indexed_cls is not previous_cls
+                        )
+                        if remaining:
+                            index[key] = remaining
+                        else:
+                            index.pop(key, None)
+                for key in cls._index_keys(new_cls, attribute):
+                    if new_cls not in index.get(key, tuple()):
+                        index[key] = index.get(key, tuple()) + (new_cls,)
+                indexes[attribute] = index
+            cls._INDEXES = indexes
+            cls._SIGNATURE_MATCHER = None
+            cls._REGISTRY = registry
 
     @classmethod
     def _create_class(cls, name: str, bases: tuple, attrs: Dict[str, Any]) -> Any:
@@ -74,7 +293,8 @@ class RegistryMetaclassMixin:
             name    => name of new class
             new_cls => new class to add to registry
         Procedure:
-            Apply checks to new class and add to registry if all checks passed.
+            Apply checks to new class and add to registry if all checks passed
+            (see _register_class).
             NOTE:
                 By default this function is a NOOP.
         Preconditions:
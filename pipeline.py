@@ -0,0 +1,331 @@
+## -*- coding: UTF-8 -*-
+## pipeline.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Callable, Dict, List, Sequence, Tuple
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from enum import Enum
+from time import perf_counter
+
+from .patterns import Container
+from .task import TaskStatus, TaskResult, BaseTask
+
+Route = Callable[[Container], Tuple[Sequence[Any], Dict[str, Any]]]
+
+
+class FailurePolicy(Enum):
+    """Enum representing how a TaskPipeline handles a failed stage:
+        1) HALT: start no further stages (running stages finish)
+        2) SKIP_DOWNSTREAM: skip stages that depend (directly or
+           transitively) on the failed stage, but run independent branches
+        3) CONTINUE: run every stage, passing failed results downstream
+    """
+    HALT = 0
+    SKIP_DOWNSTREAM = 1
+    CONTINUE = 2
+
+
+class PipelineStage:
+    """Stage of a TaskPipeline: a task factory (usually a BaseTask
+    subclass), the names of the stages it depends on, and how their
+    results are routed into the task's run arguments.
+    """
+
+    def __init__(self,
+        name: str,
+        task_factory: Callable[[], BaseTask],
+        depends_on: Sequence[str],
+        route: Optional[Route]
+    ) -> None:
+        self.name = name
+        self.task_factory = task_factory
+        self.depends_on = tuple(depends_on)
+        self.route = route
+        self.dependents = list()
+
+    def arguments(self,
+        results: Dict[str, TaskResult],
+        args: Sequence[Any],
+        kwargs: Dict[str, Any]
+    ) -> Tuple[Sequence[Any], Dict[str, Any]]:
+        """
+        Args:
+            results => results of completed stages by name
+            args    => positional arguments the pipeline was run with
+            kwargs  => keyword arguments the pipeline was run with
+        Returns:
+            (args, kwargs) to run this stage's task with.  Stages without
+            dependencies get the pipeline's arguments, other stages get
+            the results of their dependencies in order, unless a route
+            function maps a Container of those results to (args, kwargs).
+        Preconditions:
+            All dependencies of this stage have results
+        """
+        if not self.depends_on:
+            return args, kwargs
+        upstream = Container(
+            (dependency, results[dependency]) for dependency in self.depends_on
+        )
+        if self.route is not None:
+            return self.route(upstream)
+        return tuple(upstream.values()), dict()
+
+
+class TaskPipeline(BaseTask):
+    """Task running a DAG of stages (see add_stage), where each stage's
+    task is run with the TaskResults of the stages it depends on, so
+    TaskResult.state is passed from one task to the next.  Stages whose
+    dependencies have completed run concurrently on a thread pool.  Failed
+    stages (FAILURE, or also PARTIAL_SUCCESS if partial_is_failure) are
+    handled according to a FailurePolicy, and skipped stages get a FAILURE
+    result with state.skipped set.
+
+    The pipeline's result state maps each stage name to its TaskResult,
+    and its status is the aggregate of the stage statuses.  After a run,
+    timings holds per-stage timings and critical_path() the chain of
+    stages that determined the total run time.
+    """
+
+    def __init__(self,
+        max_workers: Optional[int] = None,
+        policy: FailurePolicy = FailurePolicy.SKIP_DOWNSTREAM,
+        partial_is_failure: bool = False,
+        result: Optional[TaskResult] = None
+    ) -> None:
+        super().__init__(result)
+        self.max_workers = max_workers
+        self.policy = policy
+        self.partial_is_failure = partial_is_failure
+        self.stages = dict()
+        self.timings = dict()
+        self._args = tuple()
+        self._kwargs = dict()
+
+    def add_stage(self,
+        name: str,
+        task_factory: Callable[[], BaseTask],
+        depends_on: Sequence[str] = tuple(),
+        route: Optional[Route] = None
+    ) -> 'TaskPipeline':
+        """
+        Args:
+            name            => unique name of stage
+            task_factory    => callable returning the stage's task
+            depends_on      => names of stages whose results this stage takes
+            route           => function mapping a Container of dependency
+                               results (by stage name) to (args, kwargs) for
+                               the task's run method
+        Returns:
+            This pipeline, so calls can be chained.
+        Preconditions:
+            Stages in depends_on have already been added (so the stages
+            always form a DAG)
+        """
+        if name in self.stages:
+            raise ValueError('Stage %s already exists'%name)
+        for dependency in depends_on:
+            if dependency not in self.stages:
+                raise ValueError(
+                    'Stage %s depends on unknown stage %s'%(name, dependency)
+                )
+        stage = PipelineStage(name, task_factory, depends_on, route)
+        for dependency in depends_on:
+            self.stages[dependency].dependents.append(name)
+        self.stages[name] = stage
+        return self
+
+    def critical_path(self) -> List[str]:
+        """
+        Args:
+            N/A
+        Returns:
+            Names of the stages on the critical path of the last run, from
+            first to last: starting from the stage that finished last,
+            each step goes to the dependency that finished last (the one
+            the stage waited on).
+        Preconditions:
+            N/A
+        """
+        finished = {
+            name: timing for name, timing in self.timings.items() \
+            if timing.end is not None
+        }
+        if not finished:
+            return list()
+        name = max(finished, key=lambda stage_name: finished[stage_name].end)
+        path = [name]
+        while True:
+            dependencies = [
+                dependency for dependency in self.stages[name].depends_on \
+                if dependency in finished
+            ]
+            if not dependencies:
+                break
+            name = max(dependencies, key=lambda stage_name: finished[stage_name].end)
+            path.append(name)
+        path.reverse()
+        return path
+
+    def _preamble(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Args:
+            args    => positional arguments to stages without dependencies
+            kwargs  => keyword arguments to stages without dependencies
+        Procedure:
+            @BaseTask._preamble
+        Preconditions:
+            N/A
+        """
+        self._args = args
+        self._kwargs = kwargs
+        self.timings = dict()
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        started = perf_counter()
+        results = dict()
+        remaining = {
+            name: len(stage.depends_on) for name, stage in self.stages.items()
+        }
+        ready = [name for name, count in remaining.items() if count == 0]
+        pending = dict()
+        halted = False
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while ready or pending:
+                for name in ready:
+                    stage = self.stages[name]
+                    timing = self.timings[name] = Container(
+                        ready=perf_counter() - started,
+                        start=None,
+                        end=None,
+                        duration=None
+                    )
+                    failed = [
+                        dependency for dependency in stage.depends_on \
+                        if self._is_failure(results[dependency])
+                    ]
+                    if halted or (failed and self.policy != FailurePolicy.CONTINUE):
+                        results[name] = self._skipped(failed)
+                        ready.extend(self._complete(name, remaining))
+                        continue
+                    try:
+                        args, kwargs = stage.arguments(results, self._args, self._kwargs)
+                    except Exception as exc:    #pylint: disable=W0703
+                        results[name] = TaskResult.from_exception(exc)
+                        halted = halted or self.policy == FailurePolicy.HALT
+                        ready.extend(self._complete(name, remaining))
+                        continue
+                    pending[pool.submit(
+                        self._run_stage, stage, timing, started, args, kwargs
+                    )] = name
+                ready = list()
+                if not pending:
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    results[name] = future.result()
+                    if self._is_failure(results[name]) and \
+                        self.policy == FailurePolicy.HALT:
+                        halted = True
+                    ready.extend(self._complete(name, remaining))
+        self.result = TaskResult(
+            TaskStatus.aggregate(
+                TaskStatus.SUCCESS if result is None or result.status is None \
+                else result.status for result in results.values()
+            ),
+            Container((name, results[name]) for name in self.stages)
+        )
+
+    def _complete(self, name: str, remaining: Dict[str, int]) -> List[str]:
+        """
+        Args:
+            name        => name of stage that completed (or was skipped)
+            remaining   => number of incomplete dependencies of each stage
+        Returns:
+            Names of dependents of stage name that are now ready.
+        Preconditions:
+            N/A
+        """
+        ready = list()
+        for dependent in self.stages[name].dependents:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0:
+                ready.append(dependent)
+        return ready
+
+    def _is_failure(self, result: Optional[TaskResult]) -> bool:
+        """
+        Args:
+            result  => result of a stage
+        Returns:
+            Whether result counts as failed under this pipeline's settings.
+        Preconditions:
+            N/A
+        """
+        if result is None:
+            return False
+        if result.status == TaskStatus.FAILURE:
+            return True
+        return self.partial_is_failure and result.status == TaskStatus.PARTIAL_SUCCESS
+
+    @staticmethod
+    def _skipped(failed: List[str]) -> TaskResult:
+        """
+        Args:
+            failed  => names of failed dependencies of skipped stage
+        Returns:
+            Failure result for a skipped stage.
+        Preconditions:
+            N/A
+        """
+        return TaskResult(TaskStatus.FAILURE, Container(skipped=True, failed=failed))
+
+    @staticmethod
+    def _run_stage(
+        stage: PipelineStage,
+        timing: Container,
+        started: float,
+        args: Sequence[Any],
+        kwargs: Dict[str, Any]
+    ) -> Optional[TaskResult]:
+        """
+        Args:
+            stage   => stage to run
+            timing  => timing record of stage
+            started => perf_counter value at start of pipeline run
+            args    => positional arguments to stage task's run
+            kwargs  => keyword arguments to stage task's run
+        Returns:
+            Result of stage task, or a failure result if it raised.
+        Preconditions:
+            N/A
+        """
+        timing.start = perf_counter() - started
+        try:
+            return stage.task_factory().run(*args, **kwargs)
+        except Exception as exc:    #pylint: disable=W0703
+            return TaskResult.from_exception(exc)
+        finally:
+            timing.end = perf_counter() - started
+            timing.duration = timing.end - timing.start
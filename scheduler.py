@@ -0,0 +1,503 @@
+## -*- coding: UTF-8 -*-
+## scheduler.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any
+
+import heapq
+import itertools
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Condition, Thread
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .patterns import Container
+from .task import TaskStatus, TaskResult, BaseTask
+from .executor import _run_task
+
+
+def _address_space() -> Optional[int]:
+    """Size in bytes of this process's virtual address space (None if unknown)"""
+    try:
+        with open('/proc/self/statm', 'rb') as statm:
+            return int(statm.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _run_task_limited(
+    task: BaseTask,
+    args: Any,
+    kwargs: Any,
+    memory: int
+) -> Optional[TaskResult]:
+    """
+    Args:
+        task    => task to run
+        args    => positional arguments to task.run
+        kwargs  => keyword arguments to task.run
+        memory  => bytes the task may allocate
+    Returns:
+        Result of running task (see _run_task) with the address space of
+        the (worker) process capped at its current size plus memory, so
+        allocating more raises MemoryError.  The cap is lifted afterwards.
+    Preconditions:
+        Called in a worker process
+    """
+    current = _address_space()
+    if resource is None or current is None or memory <= 0:
+        return _run_task(task, args, kwargs)
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = current + memory
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    try:
+        return _run_task(task, args, kwargs)
+    finally:
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+class _Entry:
+    """Scheduling state of a submitted task."""
+    __slots__ = (
+        'task', 'args', 'kwargs', 'priority', 'cpu', 'memory',
+        'deadline', 'submitted', 'started', 'attempts', 'future', 'sequence'
+    )
+
+    def __init__(self, **fields: Any) -> None:
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    def __lt__(self, other: '_Entry') -> bool:
+        return (-self.priority, self.sequence) < (-other.priority, other.sequence)
+
+
+class ResourceScheduler:
+    """Runs BaseTasks on a thread (or process) pool, admitting them in
+    priority order only while their estimated costs fit within the CPU and
+    memory budgets.  A task declares its costs and priority with the
+    attributes priority (higher runs first, default 0), cpu_cost (cores,
+    default 1.0) and memory_cost (bytes, default 0), which submit can
+    override.  Admission is strictly by priority: a task that does not fit
+    yet blocks lower priority tasks, so large tasks are not starved.
+
+    submit returns a Future resolving to the task's TaskResult, which is
+    TaskStatus.FAILURE (with error and reason in its state) if:
+        1) the task's cost exceeds a budget on its own (reason over_budget)
+        2) the task has not finished by its deadline (reason deadline);
+           a task already running cannot be interrupted, so its resources
+           stay reserved until it actually finishes, and its result is
+           discarded
+        3) the task raised MemoryError more than max_retries times (reason
+           memory); each MemoryError reschedules it with its memory
+           estimate doubled (up to the memory budget)
+        4) in process mode, a worker process died while running the task
+           more than max_retries times (reason crashed); a crash breaks
+           the pool, so every task running at the time is rescheduled and
+           the pool is replaced
+    Other exceptions become failure results as in TaskExecutor.  With
+    enforce_memory in process mode, a task's memory_cost is a hard limit
+    on the address space its worker may grow by (POSIX only), so
+    exceeding it raises MemoryError (case 3).  Queue depth, utilization
+    and wait times are available from metrics.
+    """
+
+    def __init__(self,
+        cpu_budget: Optional[float] = None,
+        memory_budget: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        use_processes: bool = False,
+        max_retries: int = 1,
+        mp_context: Optional[Any] = None,
+        enforce_memory: bool = False
+    ) -> None:
+        """
+        Args:
+            cpu_budget      => total cpu_cost of running tasks (defaults to
+                               the number of CPUs)
+            memory_budget   => total memory_cost of running tasks (None for
+                               no limit)
+            max_workers     => maximum number of running tasks (defaults to
+                               4 per CPU for threads, 1 per CPU for processes)
+            use_processes   => run tasks in a process pool instead of threads
+            max_retries     => times a task is rescheduled after MemoryError
+                               or a worker crash
+            mp_context      => multiprocessing context for process pools
+            enforce_memory  => in process mode, limit each task's worker to
+                               memory_cost bytes of extra address space
+        """
+        cpus = os.cpu_count() or 1
+        self.cpu_budget = float(cpus if cpu_budget is None else cpu_budget)
+        self.memory_budget = memory_budget
+        if max_workers is None:
+            max_workers = cpus if use_processes else 4 * cpus
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.use_processes = use_processes
+        self.mp_context = mp_context
+        self.enforce_memory = enforce_memory and use_processes
+        self._pool = self._make_pool()
+        self._condition = Condition()
+        self._queue = list()
+        self._running = set()
+        self._sequence = itertools.count()
+        self._cpu_used = 0.0
+        self._memory_used = 0
+        self._counts = Container(
+            submitted=0, completed=0, failed=0, rescheduled=0, expired=0, rejected=0
+        )
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._started = 0
+        self._busy_since = time.monotonic()
+        self._cpu_seconds = 0.0
+        self._created = time.monotonic()
+        self._shutdown = False
+        self._dispatcher = Thread(
+            target=self._dispatch,
+            name='ResourceScheduler',
+            daemon=True
+        )
+        self._dispatcher.start()
+
+    def __enter__(self) -> 'ResourceScheduler':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown()
+
+    def submit(self,
+        task: BaseTask,
+        *args: Any,
+        priority: Optional[int] = None,
+        cpu: Optional[float] = None,
+        memory: Optional[int] = None,
+        deadline: Optional[float] = None,
+        **kwargs: Any
+    ) -> 'Future[TaskResult]':
+        """
+        Args:
+            task        => task to run
+            args        => positional arguments to task.run
+            priority    => priority (defaults to task.priority)
+            cpu         => estimated cores used (defaults to task.cpu_cost)
+            memory      => estimated bytes used (defaults to task.memory_cost)
+            deadline    => seconds from now by which the task must finish
+            kwargs      => keyword arguments to task.run
+        Returns:
+            Future of the task's result (see class docstring).
+        Preconditions:
+            Scheduler is not shut down
+        """
+        if self._shutdown:
+            raise RuntimeError('cannot submit after shutdown')
+        now = time.monotonic()
+        entry = _Entry(
+            task=task,
+            args=args,
+            kwargs=kwargs,
+            priority=getattr(task, 'priority', 0) if priority is None else priority,
+            cpu=float(getattr(task, 'cpu_cost', 1.0) if cpu is None else cpu),
+            memory=int(getattr(task, 'memory_cost', 0) if memory is None else memory),
+            deadline=None if deadline is None else now + deadline,
+            submitted=now,
+            started=None,
+            attempts=0,
+            future=Future(),
+            sequence=next(self._sequence)
+        )
+        entry.future.set_running_or_notify_cancel()
+        with self._condition:
+            self._counts.submitted += 1
+            if entry.cpu > self.cpu_budget or \
+                (self.memory_budget is not None and entry.memory > self.memory_budget):
+                self._counts.rejected += 1
+                self._fail(entry, 'over_budget', 'Task cost exceeds scheduler budget')
+            else:
+                heapq.heappush(self._queue, entry)
+                self._condition.notify_all()
+        return entry.future
+
+    @property
+    def metrics(self) -> Container:
+        """Getter for snapshot of scheduler metrics:
+            queue_depth         => tasks waiting to be admitted
+            running             => tasks running (including expired tasks
+                                   that have not finished)
+            cpu_used            => cpu_cost of running tasks
+            memory_used         => memory_cost of running tasks
+            cpu_utilization     => cpu_used / cpu_budget
+            memory_utilization  => memory_used / memory_budget (None if
+                                   unlimited)
+            mean_cpu_utilization=> time average of cpu_utilization since
+                                   the scheduler was created
+            wait_mean, wait_max => seconds from submission to start
+            and counts of tasks submitted, completed, failed, rescheduled,
+            expired and rejected
+        """
+        with self._condition:
+            now = time.monotonic()
+            cpu_seconds = self._cpu_seconds + self._cpu_used * (now - self._busy_since)
+            elapsed = now - self._created
+            metrics = Container(
+                queue_depth=len(self._queue),
+                running=len(self._running),
+                cpu_used=self._cpu_used,
+                memory_used=self._memory_used,
+                cpu_utilization=self._cpu_used / self.cpu_budget,
+                memory_utilization=None if not self.memory_budget \
+                    else self._memory_used / self.memory_budget,
+                mean_cpu_utilization=cpu_seconds / self.cpu_budget / elapsed \
+                    if elapsed else 0.0,
+                wait_mean=self._wait_total / self._started if self._started else 0.0,
+                wait_max=self._wait_max
+            )
+            metrics.update(self._counts)
+            return metrics
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Args:
+            wait    => whether to wait for queued and running tasks
+        Procedure:
+            Stop accepting tasks and shut down the pool.  Without wait,
+            queued tasks are cancelled (their futures fail).
+        Preconditions:
+            N/A
+        """
+        with self._condition:
+            self._shutdown = True
+            if not wait:
+                while self._queue:
+                    entry = heapq.heappop(self._queue)
+                    self._fail(entry, 'cancelled', 'Scheduler shut down')
+            self._condition.notify_all()
+        if wait:
+            with self._condition:
+                while self._queue or self._running:
+                    self._condition.wait()
+        self._dispatcher.join()
+        self._pool.shutdown(wait=wait)
+
+    def _make_pool(self) -> Any:
+        """New worker pool of max_workers threads or processes"""
+        if self.use_processes:
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=self.mp_context
+            )
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def _dispatch(self) -> None:
+        """
+        Args:
+            N/A
+        Procedure:
+            Until shut down and idle, expire tasks past their deadline and
+            admit queued tasks in priority order while they fit.
+        Preconditions:
+            N/A
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                while self._queue and self._fits(self._queue[0]):
+                    self._start(heapq.heappop(self._queue), now)
+                if self._shutdown and not self._queue and not self._running:
+                    return
+                deadlines = [
+                    entry.deadline
+                    for entry in itertools.chain(self._queue, self._running)
+                    if entry.deadline is not None and not entry.future.done()
+                ]
+                self._condition.wait(
+                    timeout=max(0.0, min(deadlines) - now) if deadlines else None
+                )
+
+    def _fits(self, entry: _Entry) -> bool:
+        """Whether entry can start within the budgets now"""
+        return len(self._running) < self.max_workers \
+            and self._cpu_used + entry.cpu <= self.cpu_budget + 1e-9 \
+            and (self.memory_budget is None or
+                 self._memory_used + entry.memory <= self.memory_budget)
+
+    def _expire(self, now: float) -> None:
+        """
+        Args:
+            now => current monotonic time
+        Procedure:
+            Fail queued and running tasks past their deadline (queued tasks
+            are dropped from the queue).
+        Preconditions:
+            Caller holds self._condition
+        """
+        expired = [
+            entry for entry in itertools.chain(self._queue, self._running)
+            if entry.deadline is not None and entry.deadline <= now \
+                and not entry.future.done()
+        ]
+        if not expired:
+            return
+        for entry in expired:
+            self._counts.expired += 1
+            self._fail(entry, 'deadline', 'Task did not finish by its deadline')
+        self._queue = [entry for entry in self._queue if not entry.future.done()]
+        heapq.heapify(self._queue)
+
+    def _start(self, entry: _Entry, now: float) -> None:
+        """
+        Args:
+            entry   => task to start
+            now     => current monotonic time
+        Procedure:
+            Reserve the task's resources and run it on the pool.
+        Preconditions:
+            Caller holds self._condition and entry fits
+        """
+        self._account(now)
+        self._cpu_used += entry.cpu
+        self._memory_used += entry.memory
+        self._running.add(entry)
+        entry.attempts += 1
+        if entry.started is None:
+            entry.started = now
+            wait = now - entry.submitted
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._started += 1
+        if self.enforce_memory:
+            call = (_run_task_limited, entry.task, entry.args, entry.kwargs, entry.memory)
+        else:
+            call = (_run_task, entry.task, entry.args, entry.kwargs)
+        try:
+            try:
+                future = self._pool.submit(*call)
+            except BrokenProcessPool:
+                self._pool.shutdown(wait=False)
+                self._pool = self._make_pool()
+                future = self._pool.submit(*call)
+        except Exception as exc:    #pylint: disable=W0703
+            self._release(entry, now)
+            self._fail(entry, 'error', 'Task could not be started: %s'%exc)
+            return
+        future.add_done_callback(lambda future: self._finish(entry, future))
+
+    def _release(self, entry: _Entry, now: float) -> None:
+        """
+        Args:
+            entry   => task that stopped running
+            now     => current monotonic time
+        Procedure:
+            Release the resources reserved for entry.
+        Preconditions:
+            Caller holds self._condition
+        """
+        self._account(now)
+        self._running.discard(entry)
+        self._cpu_used -= entry.cpu
+        self._memory_used -= entry.memory
+
+    def _finish(self, entry: _Entry, future: Future) -> None:
+        """
+        Args:
+            entry   => task that finished
+            future  => pool future of the run
+        Procedure:
+            Release the task's resources and resolve its future, or
+            reschedule it after a MemoryError or worker crash.
+        Preconditions:
+            N/A
+        """
+        crashed = False
+        try:
+            result = future.result()
+        except BrokenProcessPool as exc:
+            crashed = True
+            result = TaskResult.from_exception(exc)
+        except Exception as exc:    #pylint: disable=W0703
+            result = TaskResult.from_exception(exc)
+        with self._condition:
+            self._release(entry, time.monotonic())
+            if not entry.future.done():
+                if crashed:
+                    if entry.attempts <= self.max_retries:
+                        self._counts.rescheduled += 1
+                        heapq.heappush(self._queue, entry)
+                    else:
+                        self._fail(entry, 'crashed',
+                            'Worker died after %d attempts'%entry.attempts
+                        )
+                elif self._is_memory_error(result):
+                    if entry.attempts <= self.max_retries:
+                        self._counts.rescheduled += 1
+                        entry.memory = max(entry.memory, 1) * 2
+                        if self.memory_budget is not None:
+                            entry.memory = min(entry.memory, self.memory_budget)
+                        heapq.heappush(self._queue, entry)
+                    else:
+                        self._fail(entry, 'memory',
+                            'Task exceeded memory after %d attempts'%entry.attempts
+                        )
+                else:
+                    if result is not None and result.status == TaskStatus.FAILURE:
+                        self._counts.failed += 1
+                    else:
+                        self._counts.completed += 1
+                    entry.future.set_result(result)
+            self._condition.notify_all()
+
+    def _account(self, now: float) -> None:
+        """Accumulate CPU reservation time up to now"""
+        self._cpu_seconds += self._cpu_used * (now - self._busy_since)
+        self._busy_since = now
+
+    @staticmethod
+    def _is_memory_error(result: Optional[TaskResult]) -> bool:
+        """Whether result is the failure result of a MemoryError"""
+        return result is not None and result.status == TaskStatus.FAILURE \
+            and result.state is not None \
+            and result.state.get('error_type') == 'MemoryError'
+
+    def _fail(self, entry: _Entry, reason: str, error: str) -> None:
+        """
+        Args:
+            entry   => task to fail
+            reason  => short reason code
+            error   => error message
+        Procedure:
+            Resolve the task's future with a failure result.
+        Preconditions:
+            Caller holds self._condition
+        """
+        self._counts.failed += 1
+        entry.future.set_result(TaskResult(
+            TaskStatus.FAILURE,
+            Container(error=error, reason=reason, attempts=entry.attempts)
+        ))
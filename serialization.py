@@ -0,0 +1,232 @@
+## -*- coding: UTF-8 -*-
+## serialization.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Any, Iterable, List, Tuple
+
+import io
+import pickle
+import struct
+
+from .patterns import Container
+from .task import TaskResult
+
+OUT_OF_BAND_THRESHOLD = 1 << 16
+
+_BUFFER_TYPES = {bytes: 'b', bytearray: 'a', memoryview: 'v'}
+_HEADER = struct.Struct('<I')
+
+
+def _reconstruct(cls: type, buffer: Any) -> Any:
+    """
+    Args:
+        cls     => bytes or bytearray
+        buffer  => buffer supplied to loads for an out-of-band payload
+    Returns:
+        buffer itself if it is already an instance of cls spanning the
+        whole payload (no copy), else a copy of it as cls.
+    Preconditions:
+        N/A
+    """
+    with memoryview(buffer) as view:
+        if type(view.obj) is cls and view.nbytes == len(view.obj):
+            return view.obj
+    return cls(buffer)
+
+
+class _Pickler(pickle.Pickler):
+    """Protocol 5 pickler that sends large bytes, bytearray and contiguous
+    memoryview objects out of band and reduces TaskResult and Container
+    to their contents.  Persistent ids bypass the pickle memo, so payloads
+    are memoized here: a payload referenced again is pickled as a
+    reference to its first occurrence, which keeps it shared and sends its
+    bytes once.
+    """
+
+    def __init__(self,
+        file: Any,
+        threshold: int,
+        buffers: List[pickle.PickleBuffer]
+    ) -> None:
+        super().__init__(file, protocol=5, buffer_callback=buffers.append)
+        self.threshold = threshold
+        self._payloads = dict()
+
+    def persistent_id(self, obj: Any) -> Any:
+        """
+        Args:
+            obj => object being pickled
+        Returns:
+            (type code, PickleBuffer[, format, shape]) for large buffers,
+            which pickle out of band through buffer_callback, ('r', index)
+            for a payload already pickled as the index-th persistent id,
+            else None (obj is pickled normally).  Unlike reducer_override, this
+            is consulted for exact bytes and bytearray objects.  Small or
+            non-contiguous memoryviews (which plain pickle rejects) are
+            copied in band.
+        Preconditions:
+            N/A
+        """
+        code = _BUFFER_TYPES.get(type(obj))
+        if code is None:
+            return None
+        payload = self._payloads.get(id(obj))
+        if payload is not None:
+            return 'r', payload[1]
+        if code == 'v':
+            if obj.contiguous and obj.nbytes >= self.threshold:
+                buffer = pickle.PickleBuffer(obj)
+            else:
+                buffer = obj.tobytes()
+            pid = code, buffer, obj.format, obj.shape
+        elif len(obj) < self.threshold:
+            return None
+        else:
+            pid = code, pickle.PickleBuffer(obj)
+        # obj is kept alive so its id cannot be reused during the dump
+        self._payloads[id(obj)] = (obj, len(self._payloads))
+        return pid
+
+    def reducer_override(self, obj: Any) -> Any:
+        """
+        Args:
+            obj => object being pickled
+        Returns:
+            Compact reduction of TaskResult (its three fields rather than
+            its instance dict) and Container (its items), else
+            NotImplemented.
+        Preconditions:
+            N/A
+        """
+        cls = type(obj)
+        if cls is Container:
+            return Container, tuple(), None, None, iter(obj.items())
+        if cls is TaskResult:
+            return TaskResult, (obj.status, obj.state, obj.metrics)
+        return NotImplemented
+
+
+class _Unpickler(pickle.Unpickler):
+    """Unpickler for the output of _Pickler."""
+
+    def __init__(self, file: Any, buffers: Iterable[Any]) -> None:
+        super().__init__(file, buffers=buffers)
+        self._payloads = list()
+
+    def persistent_load(self, pid: Any) -> Any:
+        """
+        Args:
+            pid => persistent id produced by _Pickler.persistent_id
+        Returns:
+            Payload rebuilt from its out-of-band buffer, or the payload
+            rebuilt earlier for a reference to it.
+        Preconditions:
+            N/A
+        """
+        code, buffer = pid[0], pid[1]
+        if code == 'r':
+            return self._payloads[buffer]
+        if code == 'b':
+            payload = _reconstruct(bytes, buffer)
+        elif code == 'a':
+            payload = _reconstruct(bytearray, buffer)
+        else:
+            payload = memoryview(buffer)
+            if payload.format != pid[2] or payload.shape != pid[3]:
+                payload = payload.cast('B').cast(pid[2], pid[3])
+        self._payloads.append(payload)
+        return payload
+
+
+def dumps(
+    obj: Any,
+    threshold: int = OUT_OF_BAND_THRESHOLD
+) -> Tuple[bytes, List[pickle.PickleBuffer]]:
+    """
+    Args:
+        obj         => object to serialize (e.g. a TaskResult)
+        threshold   => minimum size in bytes of buffers sent out of band
+    Returns:
+        Pickled object graph and the list of out-of-band buffers it
+        references.  The buffers are views of the payloads in obj (not
+        copies), so obj must not be modified until they are consumed.
+        Objects supporting pickle protocol 5 (e.g. numpy arrays) are also
+        sent out of band.
+    Preconditions:
+        N/A
+    """
+    buffers = list()
+    data = io.BytesIO()
+    _Pickler(data, threshold, buffers).dump(obj)
+    return data.getvalue(), buffers
+
+
+def loads(data: bytes, buffers: Iterable[Any] = tuple()) -> Any:
+    """
+    Args:
+        data    => pickled object graph from dumps
+        buffers => out-of-band buffers from dumps, in order (any objects
+                   supporting the buffer protocol)
+    Returns:
+        Deserialized object.  Payloads are rebuilt from buffers without
+        copying when buffers already have the payload's type (e.g. bytes
+        payloads received as bytes).
+    Preconditions:
+        N/A
+    """
+    return _Unpickler(io.BytesIO(data), buffers=buffers).load()
+
+
+def send(connection: Any, obj: Any, threshold: int = OUT_OF_BAND_THRESHOLD) -> None:
+    """
+    Args:
+        connection  => multiprocessing connection to send obj on
+        obj         => object to send
+        threshold   => @dumps
+    Procedure:
+        Send the pickled object graph as one message followed by one
+        message per out-of-band buffer, which is written to the connection
+        directly from the payload's memory.
+    Preconditions:
+        N/A
+    """
+    data, buffers = dumps(obj, threshold)
+    connection.send_bytes(_HEADER.pack(len(buffers)) + data)
+    for buffer in buffers:
+        connection.send_bytes(buffer)
+        buffer.release()
+
+
+def recv(connection: Any) -> Any:
+    """
+    Args:
+        connection  => multiprocessing connection to receive from
+    Returns:
+        Object sent on connection with send.  Buffers are received as
+        bytes, so bytes payloads are not copied again after receipt.
+    Preconditions:
+        N/A
+    """
+    message = connection.recv_bytes()
+    count, = _HEADER.unpack_from(message)
+    buffers = [connection.recv_bytes() for _ in range(count)]
+    return loads(memoryview(message)[_HEADER.size:], buffers)
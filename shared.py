@@ -0,0 +1,396 @@
+## -*- coding: UTF-8 -*-
+## shared.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Iterator, Mapping, Tuple
+
+import hashlib
+import os
+import pickle
+import struct
+import weakref
+from collections.abc import Mapping as MappingABC
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from .patterns import Container
+
+_HEADER = struct.Struct('<4sIQQQ')
+_MAGIC = b'SCTR'
+_VERSION = 2
+_SLOT = struct.Struct('<QQ')
+_ENTRY = struct.Struct('<II')
+
+
+def _encode_key(key: Any) -> bytes:
+    """
+    Args:
+        key => mapping key
+    Returns:
+        Canonical encoding of key: tagged UTF-8 for str, tagged raw bytes
+        for bytes, tagged decimal for int, else tagged pickle.
+    Preconditions:
+        key is picklable
+    """
+    cls = type(key)
+    if cls is str:
+        return b's' + key.encode('utf-8', 'surrogatepass')
+    if cls is bytes:
+        return b'b' + key
+    if cls is int:
+        return b'i' + str(key).encode('ascii')
+    return b'p' + pickle.dumps(key, protocol=4)
+
+
+def _decode_key(data: memoryview) -> Any:
+    """
+    Args:
+        data    => key encoded with _encode_key
+    Returns:
+        Decoded key.
+    Preconditions:
+        N/A
+    """
+    tag = data[0]
+    if tag == 0x73:
+        return str(data[1:], 'utf-8', 'surrogatepass')
+    if tag == 0x62:
+        return bytes(data[1:])
+    if tag == 0x69:
+        return int(str(data[1:], 'ascii'))
+    return pickle.loads(data[1:])
+
+
+def _hash_key(data: bytes) -> int:
+    """Process-independent 64-bit hash of an encoded key"""
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def _tracker_id() -> int:
+    """
+    Args:
+        N/A
+    Returns:
+        Identifier of the resource tracker of this process (the inode of
+        the pipe to it, which processes sharing the tracker all inherit),
+        or 0 if there is none.
+    Preconditions:
+        N/A
+    """
+    if os.name == 'nt':
+        return 0
+    try:
+        return os.fstat(resource_tracker.getfd()).st_ino
+    except (OSError, TypeError):
+        return 0
+
+
+def _attach_untracked(name: str) -> SharedMemory:
+    """
+    Args:
+        name    => name of shared memory segment
+    Returns:
+        Segment attached without a registration of its own with the
+        resource tracker (which would otherwise unlink it when the
+        attaching process exits before Python 3.13).  Before 3.13 the
+        attach registers the segment, which is undone only if the
+        resource tracker is not the one of the creating process: that
+        tracker holds a single entry per segment, so unregistering would
+        drop the creator's registration.
+    Preconditions:
+        N/A
+    """
+    try:
+        return SharedMemory(name=name, track=False)    #pylint: disable=E1123
+    except TypeError:
+        pass
+    shm = SharedMemory(name=name)
+    if os.name != 'nt':
+        try:
+            creator_tracker = _HEADER.unpack_from(shm.buf)[4]
+        except struct.error:
+            creator_tracker = 0
+        if creator_tracker != _tracker_id():    #pylint: disable=W0212
+            resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def _release(shm: SharedMemory, view: memoryview, owner_pid: Optional[int]) -> None:
+    """
+    Args:
+        shm         => attached segment
+        view        => read-only view of segment
+        owner_pid   => pid of process that created the segment (None if
+                       attached)
+    Procedure:
+        Detach from the segment, and unlink it if called in the process
+        that created it (not in processes forked from it).
+    Preconditions:
+        N/A
+    """
+    view.release()
+    try:
+        shm.close()
+    except BufferError:
+        pass
+    if owner_pid is not None and owner_pid == os.getpid():
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedContainer(MappingABC):
+    """Read-only Container backed by a multiprocessing.shared_memory
+    segment, for large lookup data (hash sets, timezone tables, known-file
+    lists) built once and shared by every worker process instead of being
+    copied into each.  Supports the Container access API: key, attribute
+    and get access, iteration in insertion order, len and in.
+
+    create builds the segment from a mapping; attach (or unpickling a
+    SharedContainer, e.g. passing it to a worker) maps an existing segment
+    read-only with no copying.  The segment holds an open-addressing hash
+    table of keys (str, bytes, int, or any picklable key) whose values are
+    pickled individually, so a lookup only decodes the value it returns.
+
+    Each process detaches when its SharedContainer is closed or garbage
+    collected, or at exit.  The creating process also unlinks the segment
+    then, and the resource tracker unlinks it if the creating process dies
+    without cleaning up.  Attaching processes never unlink the segment:
+    those sharing the creator's resource tracker (its children) leave its
+    registration in place, and others are not registered.
+    """
+    __slots__ = ('_shm', '_view', '_count', '_slots', '_finalizer', '__weakref__')
+
+    def __init__(self, shm: SharedMemory, owner: bool = False) -> None:
+        """
+        Args:
+            shm     => segment containing a table written by create
+            owner   => whether this process created (and should unlink)
+                       the segment
+        """
+        view = shm.buf.toreadonly()
+        magic, version, count, slots, _ = _HEADER.unpack_from(view)
+        if magic != _MAGIC or version != _VERSION:
+            view.release()
+            shm.close()
+            raise ValueError('Segment %s is not a SharedContainer'%shm.name)
+        object.__setattr__(self, '_shm', shm)
+        object.__setattr__(self, '_view', view)
+        object.__setattr__(self, '_count', count)
+        object.__setattr__(self, '_slots', slots)
+        object.__setattr__(self, '_finalizer', weakref.finalize(
+            self, _release, shm, view, os.getpid() if owner else None
+        ))
+
+    @classmethod
+    def create(cls,
+        mapping: Mapping[Any, Any],
+        name: Optional[str] = None
+    ) -> 'SharedContainer':
+        """
+        Args:
+            mapping => data to share
+            name    => name of segment (random if None)
+        Returns:
+            SharedContainer owning a new segment containing mapping.
+        Preconditions:
+            Keys and values of mapping are picklable
+        """
+        entries = [
+            (_encode_key(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            for key, value in mapping.items()
+        ]
+        slots = 1
+        while slots < 2 * len(entries):
+            slots <<= 1
+        table_offset = _HEADER.size
+        offset = table_offset + slots * _SLOT.size
+        size = offset + sum(
+            _ENTRY.size + len(key) + len(value) for key, value in entries
+        )
+        shm = SharedMemory(name=name, create=True, size=max(size, 1))
+        try:
+            buffer = shm.buf
+            _HEADER.pack_into(
+                buffer, 0, _MAGIC, _VERSION, len(entries), slots, _tracker_id()
+            )
+            mask = slots - 1
+            for key, value in entries:
+                index = _hash_key(key) & mask
+                while _SLOT.unpack_from(buffer, table_offset + index * _SLOT.size)[1]:
+                    index = (index + 1) & mask
+                _SLOT.pack_into(
+                    buffer, table_offset + index * _SLOT.size, _hash_key(key), offset
+                )
+                _ENTRY.pack_into(buffer, offset, len(key), len(value))
+                offset += _ENTRY.size
+                buffer[offset:offset + len(key)] = key
+                offset += len(key)
+                buffer[offset:offset + len(value)] = value
+                offset += len(value)
+            del buffer
+            return cls(shm, owner=True)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+
+    @classmethod
+    def attach(cls, name: str) -> 'SharedContainer':
+        """
+        Args:
+            name    => name of segment created by create
+        Returns:
+            SharedContainer mapping the segment read-only.
+        Preconditions:
+            N/A
+        """
+        return cls(_attach_untracked(name))
+
+    @property
+    def shm_name(self) -> str:
+        """Getter for name of shared memory segment"""
+        return self._shm.name
+
+    @property
+    def closed(self) -> bool:
+        """Getter for whether this process has detached from the segment"""
+        return not self._finalizer.alive
+
+    def close(self) -> None:
+        """Detach from (and if the creator, unlink) the segment"""
+        self._finalizer()
+
+    def __enter__(self) -> 'SharedContainer':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return type(self).attach, (self.shm_name,)
+
+    def _lookup(self, key: Any) -> Optional[int]:
+        """
+        Args:
+            key => key to find
+        Returns:
+            Offset of entry for key, None if not found.
+        Preconditions:
+            N/A
+        """
+        if self.closed:
+            raise ValueError('SharedContainer is closed')
+        encoded = _encode_key(key)
+        target = _hash_key(encoded)
+        view = self._view
+        mask = self._slots - 1
+        index = target & mask
+        while True:
+            slot_hash, offset = _SLOT.unpack_from(view, _HEADER.size + index * _SLOT.size)
+            if not offset:
+                return None
+            if slot_hash == target:
+                key_length, _ = _ENTRY.unpack_from(view, offset)
+                start = offset + _ENTRY.size
+                if view[start:start + key_length] == encoded:
+                    return offset
+            index = (index + 1) & mask
+
+    def _value(self, offset: int) -> Any:
+        """Decode value of entry at offset"""
+        key_length, value_length = _ENTRY.unpack_from(self._view, offset)
+        start = offset + _ENTRY.size + key_length
+        return pickle.loads(self._view[start:start + value_length])
+
+    def __getitem__(self, key: Any) -> Any:
+        try:
+            offset = self._lookup(key)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            offset = None
+        if offset is None:
+            raise KeyError(key)
+        return self._value(offset)
+
+    def __contains__(self, key: Any) -> bool:
+        try:
+            return self._lookup(key) is not None
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+
+    def __getattr__(self, key: str) -> Any:
+        """Attribute access implementation
+        (passthrough to __getitem__)
+        """
+        if key in SharedContainer.__slots__:
+            raise AttributeError(key)
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __setattr__(self, key: str, value: Any) -> None:
+        raise AttributeError('SharedContainer is read-only')
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Any]:
+        for _, key, _ in self._entries():
+            yield key
+
+    def _entries(self) -> Iterator[Tuple[int, Any, int]]:
+        """
+        Args:
+            N/A
+        Returns:
+            Iterator of (offset, key, value length) of every entry in
+            insertion order.
+        Preconditions:
+            N/A
+        """
+        if self.closed:
+            raise ValueError('SharedContainer is closed')
+        view = self._view
+        offset = _HEADER.size + self._slots * _SLOT.size
+        for _ in range(self._count):
+            key_length, value_length = _ENTRY.unpack_from(view, offset)
+            start = offset + _ENTRY.size
+            yield offset, _decode_key(view[start:start + key_length]), value_length
+            offset = start + key_length + value_length
+
+    def to_container(self) -> Container:
+        """
+        Args:
+            N/A
+        Returns:
+            Copy of the mapping as a (process-local) Container.
+        Preconditions:
+            N/A
+        """
+        return Container(
+            (key, self._value(offset)) for offset, key, _ in self._entries()
+        )
+
+    def __repr__(self) -> str:
+        return '%s(%r, %d items)'%(type(self).__name__, self.shm_name, len(self))
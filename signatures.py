@@ -0,0 +1,187 @@
+## -*- coding: UTF-8 -*-
+## signatures.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Tuple, Union
+
+from collections import deque
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class SignatureMatcher:
+    """Multi-pattern byte signature matcher.  Signatures are added with
+    a value and an optional offset, and match finds the values of every
+    signature present in a buffer in a single pass.  A signature with an
+    offset only matches if it starts at exactly that offset, and is
+    stored in a trie rooted at that offset, so matching costs one trie
+    walk per distinct offset.  Signatures with offset None match anywhere
+    and are stored in an Aho-Corasick automaton that scans the buffer once.
+    Neither depends on the number of signatures.
+    """
+
+    def __init__(self) -> None:
+        self._anchored = dict()
+        self._goto = [dict()]
+        self._fail = [0]
+        self._output = [list()]
+        self._merged_output = [list()]
+        self._count = 0
+        self._window = 0
+        self._compiled = True
+
+    @property
+    def window(self) -> Optional[int]:
+        """Getter for number of leading bytes of a buffer that need to be
+        scanned to find every match (None if any signature is unanchored)
+        """
+        return self._window
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, pattern: Buffer, value: Any, offset: Optional[int] = 0) -> None:
+        """
+        Args:
+            pattern => byte signature to match
+            value   => value to return from match when pattern matches
+            offset  => offset pattern must start at (None for anywhere)
+        Procedure:
+            Add pattern to the trie for offset, or to the automaton if offset
+            is None (invalidating its failure links, which are rebuilt by
+            compile or lazily on the next match).
+        Preconditions:
+            pattern is not empty
+            offset is None or >= 0
+        """
+        pattern = bytes(pattern)
+        if not pattern:
+            raise ValueError('Signature pattern must not be empty')
+        if offset is not None and offset < 0:
+            raise ValueError('Signature offset must be non-negative')
+        output = (len(pattern), self._count, value)
+        self._count += 1
+        if offset is None:
+            self._add_unanchored(pattern, output)
+            self._window = None
+            self._compiled = False
+            return
+        node = self._anchored.setdefault(offset, (dict(), list()))
+        for byte in pattern:
+            node = node[0].setdefault(byte, (dict(), list()))
+        node[1].append(output)
+        if self._window is not None:
+            self._window = max(self._window, offset + len(pattern))
+
+    def _add_unanchored(self, pattern: bytes, output: Tuple[int, int, Any]) -> None:
+        """
+        Args:
+            pattern => byte signature to match anywhere
+            output  => (length, order, value) to emit when pattern matches
+        Procedure:
+            Add pattern to the goto function of the automaton.
+        Preconditions:
+            N/A
+        """
+        state = 0
+        for byte in pattern:
+            next_state = self._goto[state].get(byte)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append(dict())
+                self._fail.append(0)
+                self._output.append(list())
+                self._goto[state][byte] = next_state
+            state = next_state
+        self._output[state].append(output)
+
+    def compile(self) -> None:
+        """
+        Args:
+            N/A
+        Procedure:
+            Compute the failure links of the automaton (breadth-first) and
+            merge the outputs of each state's failure chain into the state.
+        Preconditions:
+            N/A
+        """
+        outputs = [list(output) for output in self._output]
+        queue = deque()
+        for next_state in self._goto[0].values():
+            self._fail[next_state] = 0
+            queue.append(next_state)
+        while queue:
+            state = queue.popleft()
+            for byte, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail_state = self._fail[state]
+                while fail_state and byte not in self._goto[fail_state]:
+                    fail_state = self._fail[fail_state]
+                fail_state = self._goto[fail_state].get(byte, 0)
+                self._fail[next_state] = fail_state
+                outputs[next_state].extend(outputs[fail_state])
+        self._merged_output = outputs
+        self._compiled = True
+
+    def match(self, buffer: Buffer) -> Tuple[Any, ...]:
+        """
+        Args:
+            buffer  => buffer (or file header) to match signatures against
+        Returns:
+            Values of all signatures found in buffer without duplicates,
+            longest (most specific) signature first and otherwise in the
+            order the signatures were added.
+        Preconditions:
+            N/A
+        """
+        if not self._compiled:
+            self.compile()
+        view = memoryview(buffer).cast('B')
+        matches = list()
+        for offset, node in self._anchored.items():
+            for byte in view[offset:]:
+                node = node[0].get(byte)
+                if node is None:
+                    break
+                if node[1]:
+                    matches.extend(node[1])
+                if not node[0]:
+                    break
+        if len(self._goto) > 1:
+            goto = self._goto
+            fail = self._fail
+            outputs = self._merged_output
+            state = 0
+            for byte in view:
+                while state and byte not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(byte, 0)
+                if outputs[state]:
+                    matches.extend(outputs[state])
+        matches.sort(key=lambda match: (-match[0], match[1]))
+        seen = set()
+        values = list()
+        for _, _, value in matches:
+            if id(value) not in seen:
+                seen.add(id(value))
+                values.append(value)
+        return tuple(values)
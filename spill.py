@@ -0,0 +1,524 @@
+## -*- coding: UTF-8 -*-
+## spill.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Iterable, Iterator, Tuple
+
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import weakref
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+from itertools import islice
+
+from .patterns import Container
+from .task import BaseTask, TaskResult
+
+
+SAMPLE_SIZE = 16
+IMMUTABLE_TYPES = frozenset((bytes, str, int, float, complex, bool, type(None)))
+
+
+def estimate_size(value: Any, depth: int = 2) -> int:
+    """
+    Args:
+        value   => object to measure
+        depth   => levels of nested containers to descend into
+    Returns:
+        Approximate size in bytes of value including its contents.
+        Collections are measured by sampling up to SAMPLE_SIZE items
+        and extrapolating, so the cost is independent of their length.
+    Preconditions:
+        N/A
+    """
+    if isinstance(value, memoryview):
+        return value.nbytes
+    size = sys.getsizeof(value)
+    if depth <= 0 or isinstance(value, (str, bytes, bytearray)):
+        return size
+    if isinstance(value, Mapping):
+        sample = list(islice(value.items(), SAMPLE_SIZE))
+        sampled = sum(
+            estimate_size(key, depth - 1) + estimate_size(item, depth - 1)
+            for key, item in sample
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        sample = list(islice(value, SAMPLE_SIZE))
+        sampled = sum(estimate_size(item, depth - 1) for item in sample)
+    else:
+        return size
+    if not sample:
+        return size
+    return size + sampled * len(value) // len(sample)
+
+
+def _close_store(connection: sqlite3.Connection, path: str) -> None:
+    """
+    Args:
+        connection  => connection to spill database
+        path        => path of spill database
+    Procedure:
+        Close the connection and remove the database file.
+    Preconditions:
+        N/A
+    """
+    connection.close()
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class SpillContainer(MutableMapping):
+    """Container for task state that may outgrow memory.  Implements the
+    Dict API and attribute-like access of Container, so task code reads
+    and writes it exactly like a Container (state.key, state['key'],
+    state.get, update, iteration in insertion order), but values are only
+    kept in memory while their estimated total size (see estimate_size)
+    stays within memory_limit.  Once the limit is crossed, values of at
+    least value_limit bytes and then the least recently used values are
+    pickled into a temporary sqlite database in directory until the
+    in-memory size is back under the limit.  A spilled value is reloaded
+    (and becomes hot again) the next time it is read; immutable values
+    (bytes, str, numbers) keep their copy on disk, so evicting them again
+    does not rewrite them.  The database is
+    created on the first spill and removed by close or garbage collection.
+
+    A mutable value read from the container may be changed in place
+    through the reference returned (or through anything it contains), so
+    once read it is pinned in memory until it is assigned again: only
+    immutable values and mutable values not read since they were assigned
+    are spilled.  Sizes are estimated when a value is assigned or
+    reloaded, so a value grown in place (state.records.append) is neither
+    re-measured nor spilled.  To accumulate more than fits in memory,
+    assign each chunk to its own key (state['block_%d'%index] = block),
+    or assign a grown value back (state.records = records) so it is
+    re-measured and may spill; changes made after that assignment through
+    an old reference are only kept if it is assigned again.  Values that
+    cannot be pickled stay in memory.
+    Instances are not dict subclasses, so use dict(state) or to_container
+    where a real dict is required; pickling a SpillContainer reloads every
+    spilled value.
+    """
+    __slots__ = (
+        'memory_limit',
+        'value_limit',
+        'directory',
+        '_memory',
+        '_sizes',
+        '_large',
+        '_clean',
+        '_pinned',
+        '_keys',
+        '_memory_size',
+        '_connection',
+        '_path',
+        '_finalizer',
+        '_stats',
+        '__weakref__',
+    )
+
+    def __init__(self,
+        *args: Any,
+        memory_limit: int = 1<<28,
+        value_limit: Optional[int] = None,
+        directory: Optional[str] = None,
+        **kwargs: Any
+    ) -> None:
+        """
+        Args:
+            args, kwargs    => initial contents (as for dict)
+            memory_limit    => estimated bytes of values to keep in memory
+            value_limit     => values at least this large are spilled first
+                               (defaults to memory_limit // 8)
+            directory       => directory of spill database (defaults to
+                               the system temporary directory)
+        """
+        if len(args) > 1:
+            raise TypeError(
+                '%s expected at most 1 positional argument, got %d'%(
+                    type(self).__name__,
+                    len(args)
+                )
+            )
+        if memory_limit < 0:
+            raise ValueError('memory_limit must be non-negative')
+        object.__setattr__(self, 'memory_limit', memory_limit)
+        object.__setattr__(self, 'value_limit',
+            max(memory_limit // 8, 1) if value_limit is None else value_limit
+        )
+        object.__setattr__(self, 'directory', directory)
+        object.__setattr__(self, '_memory', OrderedDict())
+        object.__setattr__(self, '_sizes', dict())
+        object.__setattr__(self, '_large', dict())
+        object.__setattr__(self, '_clean', set())
+        object.__setattr__(self, '_pinned', set())
+        object.__setattr__(self, '_keys', dict())
+        object.__setattr__(self, '_memory_size', 0)
+        object.__setattr__(self, '_connection', None)
+        object.__setattr__(self, '_path', None)
+        object.__setattr__(self, '_finalizer', None)
+        object.__setattr__(self, '_stats', Container(
+            spills=0,
+            reloads=0,
+            spilled_bytes=0
+        ))
+        if args:
+            self.update(args[0])
+        if kwargs:
+            self.update(kwargs)
+
+    @property
+    def memory_size(self) -> int:
+        """Getter for estimated size of values held in memory"""
+        return self._memory_size
+
+    @property
+    def spilled_keys(self) -> Tuple[Any, ...]:
+        """Getter for keys whose values are currently on disk"""
+        memory = self._memory
+        return tuple(key for key in self._keys if key not in memory)
+
+    @property
+    def stats(self) -> Container[str, int]:
+        """Getter for counts of spills, reloads and bytes written to disk"""
+        return Container(self._stats)
+
+    @property
+    def path(self) -> Optional[str]:
+        """Getter for path of spill database (None until first spill)"""
+        return self._path
+
+    def _store(self) -> sqlite3.Connection:
+        """
+        Args:
+            N/A
+        Returns:
+            Connection to spill database, created if necessary.  The
+            database holds throwaway data, so journaling and syncing
+            are disabled.
+        Preconditions:
+            N/A
+        """
+        connection = self._connection
+        if connection is None:
+            fd, path = tempfile.mkstemp(
+                prefix='spill-', suffix='.sqlite', dir=self.directory
+            )
+            os.close(fd)
+            connection = sqlite3.connect(
+                path, isolation_level=None, check_same_thread=False
+            )
+            connection.execute('PRAGMA journal_mode=OFF')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE spill (key BLOB PRIMARY KEY, value BLOB NOT NULL)'
+            )
+            object.__setattr__(self, '_connection', connection)
+            object.__setattr__(self, '_path', path)
+            object.__setattr__(self, '_finalizer',
+                weakref.finalize(self, _close_store, connection, path)
+            )
+        return connection
+
+    def _discard(self, key: Any) -> None:
+        """Remove spilled value of key from the database"""
+        self._connection.execute(
+            'DELETE FROM spill WHERE key = ?', (pickle.dumps(key),)
+        )
+
+    def _admit(self, key: Any, value: Any, size: int) -> None:
+        """
+        Args:
+            key     => key of value
+            value   => value to hold in memory
+            size    => estimated size of value
+        Procedure:
+            Hold value in memory as the most recently used value, then
+            spill values until the memory limit is met.
+        Preconditions:
+            key is not held in memory
+        """
+        self._memory[key] = value
+        self._sizes[key] = size
+        if size >= self.value_limit:
+            self._large[key] = None
+        object.__setattr__(self, '_memory_size', self._memory_size + size)
+        if self._memory_size > self.memory_limit:
+            self._evict()
+
+    def _evict(self) -> None:
+        """
+        Args:
+            N/A
+        Procedure:
+            Spill values of at least value_limit bytes, then least recently
+            used values, until the in-memory size is within memory_limit.
+            Values that cannot be pickled and mutable values read since
+            they were assigned are kept in memory.
+        Preconditions:
+            N/A
+        """
+        memory, sizes, large = self._memory, self._sizes, self._large
+        connection = self._store()
+        connection.execute('BEGIN')
+        try:
+            attempts = len(memory)
+            while self._memory_size > self.memory_limit and attempts:
+                attempts -= 1
+                key = next(iter(large)) if large else next(iter(memory))
+                large.pop(key, None)
+                if key in self._clean:
+                    self._clean.discard(key)
+                    del memory[key]
+                    object.__setattr__(self, '_memory_size',
+                        self._memory_size - sizes.pop(key)
+                    )
+                    continue
+                if key in self._pinned:
+                    memory.move_to_end(key)
+                    continue
+                try:
+                    data = pickle.dumps(memory[key], pickle.HIGHEST_PROTOCOL)
+                    encoded = pickle.dumps(key)
+                except (pickle.PicklingError, TypeError, AttributeError):
+                    memory.move_to_end(key)
+                    continue
+                connection.execute(
+                    'INSERT OR REPLACE INTO spill (key, value) VALUES (?, ?)',
+                    (encoded, data)
+                )
+                del memory[key]
+                object.__setattr__(self, '_memory_size',
+                    self._memory_size - sizes.pop(key)
+                )
+                self._stats.spills += 1
+                self._stats.spilled_bytes += len(data)
+        finally:
+            connection.execute('COMMIT')
+
+    def spill(self) -> None:
+        """Spill every value held in memory to disk"""
+        limit = self.memory_limit
+        object.__setattr__(self, 'memory_limit', -1)
+        try:
+            if self._memory:
+                self._evict()
+        finally:
+            object.__setattr__(self, 'memory_limit', limit)
+
+    def _forget(self, key: Any) -> None:
+        """Drop in-memory value of key (and its clean copy on disk)"""
+        if key in self._clean:
+            self._clean.discard(key)
+            self._discard(key)
+        del self._memory[key]
+        self._pinned.discard(key)
+        self._large.pop(key, None)
+        object.__setattr__(self, '_memory_size',
+            self._memory_size - self._sizes.pop(key)
+        )
+
+    def __getitem__(self, key: Any) -> Any:
+        memory = self._memory
+        try:
+            value = memory[key]
+        except KeyError:
+            if key not in self._keys:
+                raise KeyError(key) from None
+        else:
+            memory.move_to_end(key)
+            if type(value) not in IMMUTABLE_TYPES:
+                self._pinned.add(key)
+            return value
+        encoded = pickle.dumps(key)
+        row = self._connection.execute(
+            'SELECT value FROM spill WHERE key = ?', (encoded,)
+        ).fetchone()
+        value = pickle.loads(row[0])
+        if type(value) in IMMUTABLE_TYPES:
+            self._clean.add(key)
+        else:
+            self._pinned.add(key)
+            self._connection.execute('DELETE FROM spill WHERE key = ?', (encoded,))
+        self._stats.reloads += 1
+        self._admit(key, value, estimate_size(value))
+        return value
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        if key in self._memory:
+            self._forget(key)
+        elif key in self._keys:
+            self._discard(key)
+        else:
+            self._keys[key] = None
+        self._admit(key, value, estimate_size(value))
+
+    def __delitem__(self, key: Any) -> None:
+        if key not in self._keys:
+            raise KeyError(key)
+        del self._keys[key]
+        if key in self._memory:
+            self._forget(key)
+        else:
+            self._discard(key)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._keys
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(list(self._keys))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __getattr__(self, key: str) -> Any:
+        """Attribute access implementation
+        (passthrough to __getitem__)
+        """
+        if key in SpillContainer.__slots__:
+            raise AttributeError(key)
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __setattr__(self, key: str, value: Any) -> None:
+        """Attribute set implementation
+        (passthrough to __setitem__)
+        """
+        if key in SpillContainer.__slots__:
+            object.__setattr__(self, key, value)
+        else:
+            self[key] = value
+
+    def __delattr__(self, key: str) -> None:
+        """Attribute deletion implementation
+        (passthrough to __delitem__)
+        """
+        try:
+            del self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __repr__(self) -> str:
+        return '%s(%d keys, %d spilled)'%(
+            type(self).__name__,
+            len(self._keys),
+            len(self._keys) - len(self._memory)
+        )
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (_rebuild, (
+            type(self),
+            self.memory_limit,
+            self.value_limit,
+            self.directory,
+            list(self.items())
+        ))
+
+    def clear(self) -> None:
+        """Remove all keys, in memory and on disk"""
+        self._keys.clear()
+        self._memory.clear()
+        self._sizes.clear()
+        self._large.clear()
+        self._clean.clear()
+        self._pinned.clear()
+        object.__setattr__(self, '_memory_size', 0)
+        if self._connection is not None:
+            self._connection.execute('DELETE FROM spill')
+
+    def copy(self) -> 'SpillContainer':
+        """Shallow copy of container (same type and limits)"""
+        return type(self)(
+            self,
+            memory_limit=self.memory_limit,
+            value_limit=self.value_limit,
+            directory=self.directory
+        )
+
+    def to_container(self) -> Container[Any, Any]:
+        """Copy of contents as a Container (reloads spilled values)"""
+        return Container(self.items())
+
+    def close(self) -> None:
+        """Remove all keys and the spill database"""
+        self.clear()
+        if self._finalizer is not None:
+            self._finalizer()
+            object.__setattr__(self, '_connection', None)
+            object.__setattr__(self, '_path', None)
+            object.__setattr__(self, '_finalizer', None)
+
+
+def _rebuild(
+    cls: Any,
+    memory_limit: int,
+    value_limit: int,
+    directory: Optional[str],
+    items: Iterable[Tuple[Any, Any]]
+) -> SpillContainer:
+    """Unpickle a SpillContainer (spilling again as items are added)"""
+    container = cls(
+        memory_limit=memory_limit,
+        value_limit=value_limit,
+        directory=directory
+    )
+    container.update(items)
+    return container
+
+
+class SpillStateMixin:
+    """Mixin for BaseTask subclasses whose state may outgrow memory.  Any
+    result assigned to the task has its state converted to a
+    SpillContainer (see above) with the class-level spill settings, so
+    _process_task keeps reading and writing self.result.state as before
+    while large or cold values spill to disk.  A state assigned later
+    through self.result.state = ... is not converted, so assign the result
+    before the state grows (e.g. in _preamble, not at the end of
+    _process_task).  Must precede BaseTask in the bases of the task class.
+    """
+    spill_memory_limit: int = 1<<28
+    spill_value_limit: Optional[int] = None
+    spill_directory: Optional[str] = None
+
+    @property
+    def result(self) -> Optional[TaskResult]:
+        """Getter for result"""
+        return BaseTask.result.fget(self)   #pylint: disable=E1101
+
+    @result.setter
+    def result(self, value: Optional[TaskResult]) -> None:
+        """Setter for result (converts state to a SpillContainer)"""
+        if value is not None and value.state is not None and \
+            not isinstance(value.state, SpillContainer):
+            value.state = SpillContainer(
+                value.state,
+                memory_limit=self.spill_memory_limit,
+                value_limit=self.spill_value_limit,
+                directory=self.spill_directory
+            )
+        BaseTask.result.fset(self, value)   #pylint: disable=E1101
@@ -0,0 +1,219 @@
+## -*- coding: UTF-8 -*-
+## stream.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Iterator
+
+from queue import Full, Queue
+from threading import Event, Thread
+
+from .patterns import Container
+from .task import TaskStatus, TaskResult, BaseTask
+
+_END_OF_STREAM = object()
+
+
+class StreamingTask(BaseTask):
+    """Task whose _process_task is a generator yielding incremental
+    results (e.g. batches of records) that consumers iterate as they are
+    produced with stream(), instead of the whole output being held in
+    TaskResult.state until the task finishes.
+
+    With buffer_size 0 the generator runs in the consumer's thread and is
+    only advanced when the consumer asks for the next item.  Otherwise
+    it runs in a producer thread that blocks once buffer_size items are
+    waiting to be consumed (backpressure), overlapping production with
+    consumption.
+
+    Errors raised by _process_task end the stream rather than propagating
+    to the consumer.  After the stream ends, result.status is SUCCESS
+    (or the status set by the task) if the generator completed,
+    PARTIAL_SUCCESS if it raised after producing items or the consumer
+    stopped early (state.cancelled), and FAILURE if it raised before
+    producing anything.  state.produced counts the items produced and
+    error details are added as by TaskResult.from_exception.
+    """
+
+    def __init__(self, buffer_size: int = 0, result: Optional[TaskResult] = None) -> None:
+        super().__init__(result)
+        self.buffer_size = buffer_size
+
+    def _process_task(self) -> Iterator[Any]:   #pylint: disable=W0236
+        """
+        Args:
+            N/A
+        Returns:
+            Iterator of incremental results of this task.
+        Preconditions:
+            N/A
+        """
+        raise NotImplementedError(
+            '_process_task is not implemented for type %s'%type(self).__name__
+        )
+
+    def stream(self, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        """
+        Args:
+            @BaseTask.run
+        Returns:
+            Iterator of the results yielded by _process_task.  Nothing
+            runs (not even _preamble) until the first result is requested,
+            and closing it early stops the producer.  result is set once
+            it is exhausted or closed.
+        Preconditions:
+            N/A
+        """
+        self._preamble(*args, **kwargs)
+        if self.buffer_size > 0:
+            yield from self._stream_buffered()
+        else:
+            yield from self._stream_direct()
+
+    def run(self, *args: Any, **kwargs: Any) -> Optional[TaskResult]:
+        """
+        Args:
+            @BaseTask.run
+        Returns:
+            Result of the task, with every streamed result collected into
+            the list state.records.
+        Preconditions:
+            N/A
+        """
+        records = list(self.stream(*args, **kwargs))
+        self.result.state.records = records
+        return self.result
+
+    def _stream_direct(self) -> Iterator[Any]:
+        """
+        Args:
+            N/A
+        Returns:
+            Iterator of results produced in the consumer's thread.
+        Preconditions:
+            _preamble has been called
+        """
+        produced = 0
+        error = None
+        completed = False
+        generator = None
+        try:
+            generator = self._process_task()
+            for item in generator:
+                produced += 1
+                yield item
+            completed = True
+        except Exception as exc:    #pylint: disable=W0703
+            error = exc
+        finally:
+            if generator is not None:
+                generator.close()
+            self._postamble()
+            self._finish(produced, error, completed)
+
+    def _stream_buffered(self) -> Iterator[Any]:
+        """
+        Args:
+            N/A
+        Returns:
+            Iterator of results produced in a producer thread through a
+            queue of at most buffer_size items.
+        Preconditions:
+            _preamble has been called
+        """
+        buffer = Queue(maxsize=self.buffer_size)
+        stopped = Event()
+        outcome = Container(produced=0, error=None, completed=False)
+
+        def put(item: Any) -> bool:
+            while not stopped.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def produce() -> None:
+            generator = None
+            try:
+                generator = self._process_task()
+                for item in generator:
+                    if not put(item):
+                        return
+                    outcome.produced += 1
+                outcome.completed = True
+            except Exception as exc:    #pylint: disable=W0703
+                outcome.error = exc
+            finally:
+                if generator is not None:
+                    generator.close()
+                put(_END_OF_STREAM)
+
+        producer = Thread(
+            target=produce,
+            name='%s-producer'%type(self).__name__,
+            daemon=True
+        )
+        producer.start()
+        consumed = 0
+        try:
+            while True:
+                item = buffer.get()
+                if item is _END_OF_STREAM:
+                    break
+                consumed += 1
+                yield item
+        finally:
+            stopped.set()
+            producer.join()
+            self._postamble()
+            self._finish(
+                consumed,
+                outcome.error,
+                outcome.completed and consumed == outcome.produced
+            )
+
+    def _finish(self, produced: int, error: Optional[Exception], completed: bool) -> None:
+        """
+        Args:
+            produced    => number of results delivered to the consumer
+            error       => exception raised by _process_task, if any
+            completed   => whether every result was produced and delivered
+        Procedure:
+            Set the final result of the stream (see class docstring).
+        Preconditions:
+            N/A
+        """
+        if self.result is None:
+            self.result = TaskResult()
+        if self.result.state is None:
+            self.result.state = Container()
+        self.result.state.produced = produced
+        if error is not None:
+            self.result.state.update(TaskResult.from_exception(error).state)
+            self.result.status = TaskStatus.PARTIAL_SUCCESS if produced \
+                else TaskStatus.FAILURE
+        elif not completed:
+            self.result.state.cancelled = True
+            self.result.status = TaskStatus.PARTIAL_SUCCESS
+        elif self.result.status is None:
+            self.result.status = TaskStatus.SUCCESS
@@ -0,0 +1,522 @@
+## -*- coding: UTF-8 -*-
+## table.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional, Any, Dict, Iterable, Iterator, List, Mapping, Sequence, Union
+
+import operator
+from array import array
+from collections.abc import Mapping as MappingABC
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .patterns import Container
+
+OBJECT_TYPECODE = 'O'
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge
+}
+AGGREGATES = ('count', 'sum', 'mean', 'min', 'max')
+
+Column = Union[array, List[Any]]
+
+
+class RowView(MappingABC):
+    """Read-only, Container-compatible view of one row of a ContainerTable.
+    Values are read from the table's columns on access, so no per-row
+    object holds the row's data.
+    """
+    __slots__ = ('_columns', '_index')
+
+    def __init__(self, columns: Dict[str, Column], index: int) -> None:
+        self._columns = columns
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any:
+        return self._columns[key][self._index]
+
+    def __getattr__(self, key: str) -> Any:
+        try:
+            return self._columns[key][self._index]
+        except (KeyError, AttributeError):
+            raise AttributeError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __repr__(self) -> str:
+        return 'RowView(%r)'%dict(self)
+
+    def to_container(self) -> Container:
+        """Copy of row as a Container"""
+        return Container(self.items())
+
+
+class ContainerTable(MappingABC):
+    """Columnar table of Container-like rows.  Rows are ingested in
+    batches and each field is stored in its own column: an array.array
+    for fields whose values are all ints ('q') or numbers ('d'), or a
+    list otherwise ('O').  Columns are returned as zero-copy NumPy arrays
+    when NumPy is installed (and as memoryviews/lists otherwise), and filter,
+    sort, group_by and aggregate are vectorized over them with NumPy.
+    Rows are available on demand as Container-compatible RowViews.
+
+    The table itself is a read-only mapping of field name to column with
+    attribute-like access (table.size is the size column), so it can be
+    used directly as TaskResult.state.  Note that len(table) is therefore
+    the number of fields; use num_rows for the number of rows.
+    """
+
+    def __init__(self,
+        rows: Optional[Iterable[Mapping[str, Any]]] = None,
+        schema: Optional[Mapping[str, str]] = None,
+        batch_size: int = 4096
+    ) -> None:
+        """
+        Args:
+            rows        => initial rows
+            schema      => mapping of field name to array typecode (or 'O'),
+                           otherwise inferred from the first batch of rows
+            batch_size  => number of rows buffered before being appended
+                           to the columns
+        """
+        self._columns = dict()
+        self._typecodes = dict()
+        self._pending = list()
+        self._num_rows = 0
+        self.batch_size = batch_size
+        if schema is not None:
+            for field, typecode in schema.items():
+                self._add_column(field, typecode)
+        if rows is not None:
+            self.extend(rows)
+
+    @property
+    def num_rows(self) -> int:
+        """Getter for number of rows"""
+        return self._num_rows + len(self._pending)
+
+    @property
+    def schema(self) -> Dict[str, str]:
+        """Getter for mapping of field name to column typecode"""
+        self._flush()
+        return dict(self._typecodes)
+
+    def __getitem__(self, field: str) -> Any:
+        return self.column(field)
+
+    def __getattr__(self, field: str) -> Any:
+        if field.startswith('_'):
+            raise AttributeError(field)
+        try:
+            return self.column(field)
+        except KeyError:
+            raise AttributeError(field)
+
+    def __iter__(self) -> Iterator[str]:
+        self._flush()
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        self._flush()
+        return len(self._columns)
+
+    def __repr__(self) -> str:
+        return 'ContainerTable(num_rows=%d, fields=%r)'%(self.num_rows, list(self))
+
+    def __getstate__(self) -> Dict[str, Any]:
+        self._flush()
+        return dict(self.__dict__)
+
+    def append(self, row: Mapping[str, Any]) -> None:
+        """
+        Args:
+            row => row to append
+        Procedure:
+            Buffer row, appending the buffered batch to the columns once
+            it reaches batch_size rows.
+        Preconditions:
+            N/A
+        """
+        self._pending.append(row)
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def extend(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        """
+        Args:
+            rows    => rows to append
+        Procedure:
+            Append rows in batches of batch_size.
+        Preconditions:
+            N/A
+        """
+        for row in rows:
+            self.append(row)
+
+    def column(self, field: str) -> Any:
+        """
+        Args:
+            field   => name of field
+        Returns:
+            Column of field as a NumPy array if NumPy is installed, otherwise
+            as a memoryview (typed columns) or a list.  Typed columns are
+            zero-copy views and keep their contents if rows are appended
+            later, while list columns are copied.
+        Preconditions:
+            N/A
+        """
+        self._flush()
+        column = self._columns[field]
+        if numpy is None:
+            if isinstance(column, list):
+                return list(column)
+            return memoryview(column)
+        if isinstance(column, list):
+            values = numpy.empty(len(column), dtype=object)
+            values[:] = column
+            return values
+        return numpy.frombuffer(column, dtype=column.typecode)
+
+    def row(self, index: int) -> RowView:
+        """
+        Args:
+            index   => index of row (negative indexes count from the end)
+        Returns:
+            View of row index.
+        Preconditions:
+            -num_rows <= index < num_rows
+        """
+        self._flush()
+        if index < 0:
+            index += self._num_rows
+        if not 0 <= index < self._num_rows:
+            raise IndexError('row index out of range')
+        return RowView(self._columns, index)
+
+    def rows(self) -> Iterator[RowView]:
+        """Iterator of views of every row"""
+        self._flush()
+        for index in range(self._num_rows):
+            yield RowView(self._columns, index)
+
+    def where(self, field: str, op: str, value: Any) -> Sequence[bool]:
+        """
+        Args:
+            field   => name of field to compare
+            op      => comparison operator (==, !=, <, <=, >, >= or in)
+            value   => value (or collection of values for in) to compare to
+        Returns:
+            Boolean mask of the rows satisfying the comparison, which can be
+            combined with & and | when NumPy is installed and passed to
+            compress.  Ordering comparisons with None are False.
+        Preconditions:
+            N/A
+        """
+        self._flush()
+        column = self._columns[field]
+        if op == 'in':
+            if numpy is not None and not isinstance(column, list):
+                return numpy.isin(self.column(field), list(value))
+            value = set(value)
+            return [item in value for item in column]
+        comparison = OPERATORS[op]
+        if numpy is not None and not isinstance(column, list):
+            return comparison(self.column(field), value)
+        if op in ('==', '!='):
+            return [comparison(item, value) for item in column]
+        return [item is not None and comparison(item, value) for item in column]
+
+    def filter(self, field: str, op: str, value: Any) -> 'ContainerTable':
+        """
+        Args:
+            @where
+        Returns:
+            New table of the rows satisfying the comparison.
+        Preconditions:
+            N/A
+        """
+        return self.compress(self.where(field, op, value))
+
+    def compress(self, mask: Sequence[bool]) -> 'ContainerTable':
+        """
+        Args:
+            mask    => boolean mask with one entry per row
+        Returns:
+            New table of the rows whose mask entry is true.
+        Preconditions:
+            len(mask) == num_rows
+        """
+        self._flush()
+        if len(mask) != self._num_rows:
+            raise ValueError('mask has %d entries, table has %d rows'%(
+                len(mask),
+                self._num_rows
+            ))
+        if numpy is not None:
+            return self.take(numpy.flatnonzero(numpy.asarray(mask, dtype=bool)))
+        return self.take([index for index, keep in enumerate(mask) if keep])
+
+    def take(self, indexes: Sequence[int]) -> 'ContainerTable':
+        """
+        Args:
+            indexes => indexes of rows to take, in order
+        Returns:
+            New table of the rows at indexes.
+        Preconditions:
+            N/A
+        """
+        self._flush()
+        table = type(self)(batch_size=self.batch_size)
+        for field, column in self._columns.items():
+            typecode = self._typecodes[field]
+            if isinstance(column, list):
+                taken = [column[index] for index in indexes]
+            elif numpy is not None:
+                taken = array(typecode)
+                taken.frombytes(
+                    self.column(field)[numpy.asarray(indexes, dtype=numpy.intp)].tobytes()
+                )
+            else:
+                taken = array(typecode, [column[index] for index in indexes])
+            table._columns[field] = taken  #pylint: disable=W0212
+            table._typecodes[field] = typecode #pylint: disable=W0212
+        table._num_rows = len(indexes)    #pylint: disable=W0212
+        return table
+
+    def sort(self, field: str, reverse: bool = False) -> 'ContainerTable':
+        """
+        Args:
+            field   => name of field to sort by
+            reverse => whether to sort in descending order
+        Returns:
+            New table of the rows stably sorted by field.
+        Preconditions:
+            Values of field are mutually comparable
+        """
+        return self.take(self._argsort(field, reverse))
+
+    def group_by(self, field: str) -> Dict[Any, 'ContainerTable']:
+        """
+        Args:
+            field   => name of field to group by
+        Returns:
+            Mapping of each distinct value of field to a new table of the
+            rows with that value (in their original order).
+        Preconditions:
+            Values of field are hashable
+        """
+        return {
+            value: self.take(indexes) for value, indexes in self._groups(field)
+        }
+
+    def aggregate(self,
+        by: str,
+        field: Optional[str] = None,
+        func: str = 'count'
+    ) -> Dict[Any, Any]:
+        """
+        Args:
+            by      => name of field to group by
+            field   => name of field to aggregate (not needed for count)
+            func    => aggregate function (count, sum, mean, min or max)
+        Returns:
+            Mapping of each distinct value of by to the aggregate of field
+            over the rows with that value.
+        Preconditions:
+            Values of by are hashable
+        """
+        if func not in AGGREGATES:
+            raise ValueError('Unknown aggregate %s'%func)
+        groups = self._groups(by)
+        if func == 'count':
+            return {value: len(indexes) for value, indexes in groups}
+        column = self._columns[field]
+        if numpy is not None and not isinstance(column, list):
+            values = self.column(field)
+            reducer = dict(
+                sum=numpy.sum,
+                mean=numpy.mean,
+                min=numpy.min,
+                max=numpy.max
+            )[func]
+            return {
+                value: reducer(values[indexes]).item() for value, indexes in groups
+            }
+        reducer = dict(
+            sum=sum,
+            mean=lambda items: sum(items) / len(items),
+            min=min,
+            max=max
+        )[func]
+        return {
+            value: reducer([column[index] for index in indexes]) \
+            for value, indexes in groups
+        }
+
+    def to_containers(self) -> Iterator[Container]:
+        """Iterator of copies of every row as a Container"""
+        for row in self.rows():
+            yield row.to_container()
+
+    def _argsort(self, field: str, reverse: bool) -> Sequence[int]:
+        """
+        Args:
+            @sort
+        Returns:
+            Indexes of rows in stable sorted order of field.
+        Preconditions:
+            N/A
+        """
+        self._flush()
+        column = self._columns[field]
+        if numpy is not None and not isinstance(column, list):
+            values = self.column(field)
+            if not reverse:
+                return numpy.argsort(values, kind='stable')
+            return len(values) - 1 - numpy.argsort(values[::-1], kind='stable')[::-1]
+        return sorted(range(self._num_rows), key=column.__getitem__, reverse=reverse)
+
+    def _groups(self, field: str) -> List[Any]:
+        """
+        Args:
+            field   => name of field to group by
+        Returns:
+            List of (value, indexes) pairs for each distinct value of field,
+            where indexes are the indexes of the rows with that value.
+        Preconditions:
+            N/A
+        """
+        self._flush()
+        column = self._columns[field]
+        if numpy is not None and not isinstance(column, list) and self._num_rows:
+            values, inverse = numpy.unique(self.column(field), return_inverse=True)
+            order = numpy.argsort(inverse, kind='stable')
+            splits = numpy.cumsum(numpy.bincount(inverse, minlength=len(values)))[:-1]
+            return [
+                (value.item(), indexes) for value, indexes in \
+                zip(values, numpy.split(order, splits))
+            ]
+        groups = dict()
+        for index, value in enumerate(column):
+            groups.setdefault(value, list()).append(index)
+        return list(groups.items())
+
+    def _add_column(self, field: str, typecode: str) -> None:
+        """
+        Args:
+            field       => name of new field
+            typecode    => typecode of new column
+        Procedure:
+            Add an empty column for field (or a list column of None if the
+            table already has rows).
+        Preconditions:
+            N/A
+        """
+        if self._num_rows:
+            typecode = OBJECT_TYPECODE
+        self._typecodes[field] = typecode
+        if typecode == OBJECT_TYPECODE:
+            self._columns[field] = [None] * self._num_rows
+        else:
+            self._columns[field] = array(typecode)
+
+    def _flush(self) -> None:
+        """
+        Args:
+            N/A
+        Procedure:
+            Append buffered rows to the columns, adding columns for new
+            fields and converting columns to lists when a value does not
+            fit their typecode.
+        Preconditions:
+            N/A
+        """
+        pending = self._pending
+        if not pending:
+            return
+        self._pending = list()
+        for row in pending:
+            for field in row:
+                if field not in self._typecodes:
+                    self._add_column(field, _infer_typecode(
+                        item.get(field) for item in pending
+                    ))
+        for field in self._columns:
+            self._extend_column(field, [row.get(field) for row in pending])
+        self._num_rows += len(pending)
+
+    def _extend_column(self, field: str, values: List[Any]) -> None:
+        """
+        Args:
+            field   => name of field
+            values  => values to append to column of field
+        Procedure:
+            Append values to the column of field.  If the column is exported
+            (e.g. as a NumPy array) it is copied first, so the exported view
+            keeps its contents.
+        Preconditions:
+            N/A
+        """
+        column = self._columns[field]
+        if isinstance(column, list):
+            column.extend(values)
+            return
+        length = len(column)
+        try:
+            column.extend(values)
+        except BufferError:
+            self._columns[field] = array(column.typecode, column)
+            self._extend_column(field, values)
+        except (TypeError, OverflowError):
+            del column[length:]
+            self._columns[field] = column.tolist() + values
+            self._typecodes[field] = OBJECT_TYPECODE
+
+
+def _infer_typecode(values: Iterable[Any]) -> str:
+    """
+    Args:
+        values  => values of a field
+    Returns:
+        'q' if all values are ints, 'd' if all values are ints or floats,
+        'O' otherwise.
+    Preconditions:
+        N/A
+    """
+    kinds = set(type(value) for value in values)
+    if kinds == {int}:
+        return 'q'
+    if kinds and kinds <= {int, float}:
+        return 'd'
+    return OBJECT_TYPECODE
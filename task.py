@@ -21,11 +21,12 @@
 ## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 ## SOFTWARE.
 
-from typing import Optional, Any
+from typing import Optional, Any, Iterable
 
 from enum import Enum
 
 from .patterns import Container
+from . import instrument
 
 
 class TaskStatus(Enum):
@@ -38,21 +39,66 @@ class TaskStatus(Enum):
     PARTIAL_SUCCESS = 1
     FAILURE = 2
 
+    @classmethod
+    def aggregate(cls, statuses: Iterable['TaskStatus']) -> 'TaskStatus':
+        """
+        Args:
+            statuses    => statuses of a group of tasks (or subtasks)
+        Returns:
+            SUCCESS if every status is SUCCESS (or there are none), FAILURE
+            if every status is FAILURE, and PARTIAL_SUCCESS otherwise.
+        Preconditions:
+            N/A
+        """
+        seen = set(statuses)
+        if not seen or seen == {cls.SUCCESS}:
+            return cls.SUCCESS
+        if seen == {cls.FAILURE}:
+            return cls.FAILURE
+        return cls.PARTIAL_SUCCESS
+
 
 class TaskResult:
     """Container for the result from running a task.  The status attribute
     contains a TaskStatus enum value signaling if the task was successful,
     and the state attribute is a mapping of data returned from running
     the task.  The state data could be used, for example, to pass data
-    from one task to another in a pipeline-like fashion.
+    from one task to another in a pipeline-like fashion.  The metrics
+    attribute holds instrumentation of the run that produced the result
+    (see instrument.Instrumentation), if any.
     """
 
     def __init__(self,
         status: Optional[TaskStatus] = None,
-        state: Optional[Container[str, Any]] = None
+        state: Optional[Container[str, Any]] = None,
+        metrics: Optional[Container[str, Any]] = None
     ) -> None:
         self.status = status
         self.state = state
+        self.metrics = metrics
+
+    @classmethod
+    def from_exception(cls,
+        exc: BaseException,
+        status: TaskStatus = TaskStatus.FAILURE
+    ) -> 'TaskResult':
+        """
+        Args:
+            exc     => exception raised while running a task
+            status  => status of the result
+        Returns:
+            Result with status and the exception's type name, message and
+            formatted traceback in state (as plain strings, so the result
+            can always be pickled).
+        Preconditions:
+            N/A
+        """
+        from traceback import format_exception  #pylint: disable=C0415
+        return cls(status, Container(
+            error=str(exc),
+            error_type=type(exc).__name__,
+            traceback=''.join(format_exception(type(exc), exc, exc.__traceback__))
+        ))
 
     @property
     def status(self) -> Optional[TaskStatus]:
@@ -74,14 +120,27 @@ class TaskResult:
         """Setter for state"""
         self.__state = value
 
+    @property
+    def metrics(self) -> Optional[Container[str, Any]]:
+        """Getter for metrics"""
+        return self.__metrics
+
+    @metrics.setter
+    def metrics(self, value: Optional[Container[str, Any]]) -> None:
+        """Setter for metrics"""
+        self.__metrics = value
+
 
 class BaseTask:
     """Abstract task class, can be used for any kind of task
     that involves (optional) setup steps, a main step or loop,
     and (optional) teardown steps.  The term 'task' is used
     loosely here, and this class is purposefully flexible
-    in order to serve many different use cases.
+    in order to serve many different use cases.  Runs are instrumented
+    if instrumentation (or the global default, see instrument.configure)
+    is set and enabled.
     """
+    instrumentation: Optional['instrument.Instrumentation'] = None
 
     def __init__(self, result: Optional[TaskResult] = None) -> None:
         self.result = result
@@ -143,6 +202,11 @@ class BaseTask:
         Preconditions:
             N/A
         """
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            instrumentation = instrument.get_default()
+        if instrumentation is not None and instrumentation.enabled:
+            return instrumentation.run(self, args, kwargs)
         self._preamble(*args, **kwargs)
         self._process_task()
         self._postamble()
@@ -0,0 +1,110 @@
+## -*- coding: UTF-8 -*-
+## test_asynctask.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from unittest import IsolatedAsyncioTestCase
+import asyncio
+import threading
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult, BaseTask
+from ..asynctask import AsyncBaseTask, AsyncTaskExecutor
+
+
+class SleepTask(AsyncBaseTask):
+    """Async task that sleeps, tracking how many run at once."""
+    running = 0
+    peak = 0
+
+    async def _preamble(self, value: int = 0) -> None:  #pylint: disable=W0221
+        """@AsyncBaseTask._preamble"""
+        self.value = value
+
+    async def _process_task(self) -> None:
+        """@AsyncBaseTask._process_task"""
+        SleepTask.running += 1
+        SleepTask.peak = max(SleepTask.peak, SleepTask.running)
+        await asyncio.sleep(0.001 * (self.value % 3))
+        SleepTask.running -= 1
+        if self.value < 0:
+            raise ValueError('negative input')
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(value=self.value))
+
+
+class ThreadTask(BaseTask):
+    """Blocking task recording the thread it ran in."""
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        self.result = TaskResult(
+            TaskStatus.SUCCESS,
+            Container(thread=threading.get_ident())
+        )
+
+
+class TestAsyncBaseTask(IsolatedAsyncioTestCase):
+    """Unit tests for AsyncBaseTask and AsyncTaskExecutor."""
+
+    def setUp(self):
+        """Reset concurrency tracking."""
+        SleepTask.running = 0
+        SleepTask.peak = 0
+
+    async def test_await_task(self):
+        """Tasks awaitable via call and run."""
+        result = await SleepTask()(2)
+        self.assertEqual(result.state.value, 2)
+        result = await SleepTask().run(3)
+        self.assertEqual(result.status, TaskStatus.SUCCESS)
+
+    async def test_bounded_concurrency(self):
+        """No more than max_concurrency tasks run at once."""
+        executor = AsyncTaskExecutor(max_concurrency=4)
+        results = dict()
+        async for index, result in executor.map(SleepTask, range(20)):
+            results[index] = result
+        self.assertEqual(len(results), 20)
+        self.assertLessEqual(SleepTask.peak, 4)
+        self.assertGreater(SleepTask.peak, 1)
+        self.assertEqual(executor.summary[TaskStatus.SUCCESS], 20)
+
+    async def test_failures_reported(self):
+        """Failing tasks yield failure results."""
+        executor = AsyncTaskExecutor()
+        results = await executor.gather([SleepTask(), SleepTask()], -1)
+        self.assertTrue(all(result.status == TaskStatus.FAILURE for result in results))
+        self.assertEqual(executor.summary[TaskStatus.FAILURE], 2)
+
+    async def test_sync_tasks_offloaded(self):
+        """BaseTasks run in a thread pool alongside async tasks."""
+        executor = AsyncTaskExecutor()
+        results = await executor.gather([ThreadTask(), SleepTask()])
+        self.assertNotEqual(results[0].state.thread, threading.get_ident())
+        self.assertEqual(results[1].status, TaskStatus.SUCCESS)
+
+    async def test_starmap(self):
+        """Starmap passes argument tuples."""
+        executor = AsyncTaskExecutor(max_concurrency=2)
+        results = dict()
+        async for index, result in executor.starmap(SleepTask, [(1,), (2,)]):
+            results[index] = result.state.value
+        self.assertEqual(results, {0: 1, 1: 2})
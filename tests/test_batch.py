@@ -0,0 +1,102 @@
+## -*- coding: UTF-8 -*-
+## test_batch.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Any
+
+import re
+from unittest import TestCase
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult
+from ..batch import BatchTask
+
+
+class MatchTask(BatchTask):
+    """Counts matches of a pattern compiled once per batch."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.preambles = 0
+        self.postambles = 0
+
+    def _preamble(self, pattern: str) -> None:
+        """@BaseTask._preamble"""
+        self.preambles += 1
+        self.pattern = re.compile(pattern)
+
+    def _process_task(self, item: Any) -> None:
+        """@BatchTask._process_task"""
+        if item is None:
+            return
+        self.result = TaskResult(
+            TaskStatus.SUCCESS,
+            Container(matches=len(self.pattern.findall(item)))
+        )
+
+    def _postamble(self) -> None:
+        """@BaseTask._postamble"""
+        self.postambles += 1
+
+
+class TestBatchTask(TestCase):
+    """Unit tests for BatchTask."""
+
+    def test_setup_amortized(self):
+        """Preamble and postamble run once per batch."""
+        task = MatchTask()
+        result = task.run(['aa', 'a', ''], 'a')
+        self.assertEqual((task.preambles, task.postambles), (1, 1))
+        self.assertEqual(
+            [item.state.matches for item in result.state.results],
+            [2, 1, 0]
+        )
+        self.assertEqual(result.status, TaskStatus.SUCCESS)
+        self.assertEqual(result.state.inputs, 3)
+
+    def test_error_isolation(self):
+        """Bad input fails alone and is reported in summary."""
+        result = MatchTask().run(['a', 5, None, 'aa'], 'a')
+        self.assertEqual(result.status, TaskStatus.PARTIAL_SUCCESS)
+        self.assertEqual(result.state.failed, [1])
+        self.assertEqual(result.state.results[1].state.error_type, 'TypeError')
+        self.assertEqual(result.state.results[2].status, TaskStatus.SUCCESS)
+        self.assertEqual(result.state.results[3].state.matches, 2)
+        self.assertEqual(result.state.summary[TaskStatus.SUCCESS], 3)
+
+    def test_stopped_early(self):
+        """Closing the batch runs postamble and marks it cancelled."""
+        task = MatchTask()
+        batch = task.batch(iter(['a'] * 10), 'a')
+        self.assertEqual(task.preambles, 0)
+        self.assertEqual(next(batch)[0], 0)
+        batch.close()
+        self.assertEqual(task.postambles, 1)
+        self.assertTrue(task.result.state.cancelled)
+        self.assertEqual(task.result.status, TaskStatus.PARTIAL_SUCCESS)
+        self.assertEqual(task.result.state.inputs, 1)
+
+    def test_empty_batch(self):
+        """Empty batch succeeds."""
+        result = MatchTask().run([], 'a')
+        self.assertEqual(result.status, TaskStatus.SUCCESS)
+        self.assertEqual(result.state.results, [])
@@ -0,0 +1,167 @@
+## -*- coding: UTF-8 -*-
+## test_cache.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Any, Iterable
+
+import os
+import tempfile
+from unittest import TestCase
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult, BaseTask
+from ..cache import ResultCache, CachedTaskMixin
+
+
+class LineCountTask(CachedTaskMixin, BaseTask):
+    calls = 0
+
+    def _preamble(self, path: str, fail: bool = False) -> None:
+        """@BaseTask._preamble"""
+        self.path = path
+        self.fail = fail
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        type(self).calls += 1
+        with open(self.path, 'rb') as input_file:
+            lines = input_file.read().count(b'\n')
+        self.result = TaskResult(
+            TaskStatus.FAILURE if self.fail else TaskStatus.SUCCESS,
+            Container(lines=lines)
+        )
+
+    def _cache_inputs(self, path: str, fail: bool = False) -> Iterable[str]:
+        """@CachedTaskMixin._cache_inputs"""
+        return (path,)
+
+
+class MarkerCountTask(LineCountTask):
+    def __init__(self, marker: bytes = b'\n') -> None:
+        super().__init__()
+        self.marker = marker
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        type(self).calls += 1
+        with open(self.path, 'rb') as input_file:
+            lines = input_file.read().count(self.marker)
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(lines=lines))
+
+
+class TestResultCache(TestCase):
+    """Unit tests for ResultCache and CachedTaskMixin."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'evidence.txt')
+        self._write(b'a\nb\n')
+        LineCountTask.calls = 0
+        LineCountTask.result_cache = ResultCache(max_entries=2)
+
+    def tearDown(self):
+        LineCountTask.result_cache = None
+        self.tmpdir.cleanup()
+
+    def _write(self, data: bytes, mtime: Any = None) -> None:
+        with open(self.path, 'wb') as input_file:
+            input_file.write(data)
+        if mtime is not None:
+            os.utime(self.path, ns=(mtime, mtime))
+
+    def test_hit_skips_task(self):
+        """Second run with same arguments and inputs is a hit."""
+        first = LineCountTask().run(self.path)
+        second = LineCountTask().run(self.path)
+        self.assertEqual(LineCountTask.calls, 1)
+        self.assertEqual(second.state.lines, 2)
+        self.assertIsNot(first, second)
+        cache = LineCountTask.result_cache
+        self.assertEqual((cache.stats.hits, cache.stats.misses), (1, 1))
+        self.assertEqual(cache.hit_rate, 0.5)
+
+    def test_input_change_invalidates(self):
+        """Changed input file fingerprint is a miss."""
+        self._write(b'a\n', mtime=10**18)
+        LineCountTask().run(self.path)
+        self._write(b'a\nb\nc\n', mtime=2 * 10**18)
+        self.assertEqual(LineCountTask().run(self.path).state.lines, 3)
+        self.assertEqual(LineCountTask.calls, 2)
+
+    def test_content_fingerprint(self):
+        """Content fingerprint ignores mtime-only changes."""
+        LineCountTask.result_cache = ResultCache(fingerprint='content')
+        self._write(b'a\n', mtime=10**18)
+        LineCountTask().run(self.path)
+        self._write(b'a\n', mtime=2 * 10**18)
+        LineCountTask().run(self.path)
+        self.assertEqual(LineCountTask.calls, 1)
+        self.assertRaises(ValueError, ResultCache, fingerprint='size')
+
+    def test_failure_not_cached(self):
+        """Only SUCCESS results are cached by default."""
+        LineCountTask().run(self.path, fail=True)
+        LineCountTask().run(self.path, fail=True)
+        self.assertEqual(LineCountTask.calls, 2)
+        self.assertEqual(LineCountTask.result_cache.stats.stores, 0)
+
+    def test_cache_version(self):
+        """Changing cache_version invalidates results."""
+        cache = LineCountTask.result_cache
+        task = LineCountTask()
+        before = cache.key(task, (self.path,), {}, (self.path,))
+        task.cache_version = 2
+        self.assertNotEqual(before, cache.key(task, (self.path,), {}, (self.path,)))
+        self.assertIsNone(cache.key(task, (lambda: None,), {}))
+
+    def test_configuration_in_key(self):
+        """Differently configured instances do not share results."""
+        MarkerCountTask.calls = 0
+        self.assertEqual(MarkerCountTask().run(self.path).state.lines, 2)
+        self.assertEqual(MarkerCountTask(b'a').run(self.path).state.lines, 1)
+        self.assertEqual(MarkerCountTask(b'a').run(self.path).state.lines, 1)
+        self.assertEqual(MarkerCountTask.calls, 2)
+
+    def test_disk_store(self):
+        """Results survive in on-disk store shared between caches."""
+        directory = os.path.join(self.tmpdir.name, 'cache')
+        LineCountTask.result_cache = ResultCache(directory=directory)
+        LineCountTask().run(self.path)
+        LineCountTask.result_cache = ResultCache(directory=directory)
+        self.assertEqual(LineCountTask().run(self.path).state.lines, 2)
+        self.assertEqual(LineCountTask.calls, 1)
+        self.assertEqual(LineCountTask.result_cache.stats.disk_hits, 1)
+
+    def test_lru_eviction(self):
+        """Least recently used results are evicted from memory and disk."""
+        directory = os.path.join(self.tmpdir.name, 'cache')
+        cache = ResultCache(max_entries=2, directory=directory, max_bytes=0)
+        for index in range(3):
+            cache.put(
+                str(index) * 8,
+                TaskResult(TaskStatus.SUCCESS, Container(index=index))
+            )
+        self.assertEqual(list(cache._memory), ['11111111', '22222222'])
+        self.assertEqual(cache.stats.evictions, 3)
+        self.assertIsNone(cache.get('00000000'))
+        cache.clear()
+        self.assertIsNone(cache.get('11111111'))
@@ -0,0 +1,164 @@
+## -*- coding: UTF-8 -*-
+## test_checkpoint.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional
+
+import os
+import tempfile
+from unittest import TestCase
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult, BaseTask
+from ..checkpoint import CheckpointMixin
+
+
+class SumTask(CheckpointMixin, BaseTask):
+    checkpoint_interval = 0.0
+    fail_at: Optional[int] = None
+
+    def _preamble(self, count: int) -> None:
+        """@BaseTask._preamble"""
+        self.count = count
+        self.processed = []
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        start = self.resume_cursor or 0
+        total = self.resume_state.total if self.resume_state else 0
+        for index in range(start, self.count):
+            if index == self.fail_at:
+                raise IOError('read error')
+            self.processed.append(index)
+            total += index
+            state = Container(total=total)
+            self.checkpoint(index + 1, state, snapshot=lambda: state)
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(total=total))
+
+
+class RecordTask(CheckpointMixin, BaseTask):
+    """Collects records into a list kept in (and checkpointed with) state."""
+    checkpoint_interval = 60.0
+    fail_at: Optional[int] = None
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        start = self.resume_cursor or 0
+        state = self.resume_state or Container(records=[])
+        for index in range(start, 5):
+            state.records.append(index)
+            if index == self.fail_at:
+                raise IOError('read error')
+            self.checkpoint(index + 1, state)
+        self.result = TaskResult(TaskStatus.SUCCESS, state)
+
+
+class CountingState:
+    """State that counts how often it is pickled."""
+    pickled = 0
+
+    def __getstate__(self):
+        type(self).pickled += 1
+        return dict()
+
+
+class TestCheckpointMixin(TestCase):
+    """Unit tests for CheckpointMixin."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        SumTask.checkpoint_directory = self.tmpdir.name
+        RecordTask.checkpoint_directory = self.tmpdir.name
+
+    def tearDown(self):
+        SumTask.checkpoint_directory = None
+        RecordTask.checkpoint_directory = None
+        SumTask.checkpoint_interval = 0.0
+        self.tmpdir.cleanup()
+
+    def test_resume_after_failure(self):
+        """Failed run resumes from last checkpoint."""
+        task = SumTask()
+        task.fail_at = 6
+        self.assertRaises(IOError, task.run, 10)
+        self.assertTrue(os.path.exists(task.checkpoint_path))
+        task = SumTask()
+        result = task.run(10)
+        self.assertEqual(task.processed, [6, 7, 8, 9])
+        self.assertEqual(result.state.total, sum(range(10)))
+        self.assertFalse(os.path.exists(task.checkpoint_path))
+
+    def test_throttled_checkpoint_flushed_on_failure(self):
+        """Deferred checkpoints are still written when the run fails."""
+        SumTask.checkpoint_interval = 3600.0
+        task = SumTask()
+        task.fail_at = 4
+        self.assertRaises(IOError, task.run, 10)
+        task = SumTask()
+        task._start_checkpointing((10,), dict())
+        self.assertEqual(task.resume_cursor, 4)
+        self.assertEqual(task.resume_state.total, 0 + 1 + 2 + 3)
+
+    def test_deferred_checkpoint_not_pickled(self):
+        """Deferred checkpoints do not pickle state."""
+        task = SumTask()
+        task._start_checkpointing((5,), dict())
+        task.checkpoint_interval = 3600.0
+        state = CountingState()
+        CountingState.pickled = 0
+        for cursor in range(100):
+            self.assertFalse(task.checkpoint(cursor, state))
+        self.assertEqual(CountingState.pickled, 0)
+        self.assertTrue(task.checkpoint(100, state, force=True))
+        self.assertEqual(CountingState.pickled, 1)
+
+    def test_deferred_checkpoint_without_snapshot(self):
+        """Deferred checkpoints without a snapshot are not flushed."""
+        task = RecordTask()
+        task.fail_at = 3
+        self.assertRaises(IOError, task.run)
+        result = RecordTask().run()
+        self.assertEqual(result.state.records, [0, 1, 2, 3, 4])
+
+    def test_success_clears_checkpoint(self):
+        """Successful run starts fresh and leaves no checkpoint."""
+        task = SumTask()
+        self.assertEqual(task.run(5).state.total, 10)
+        self.assertIsNone(task.resume_cursor)
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+    def test_corrupt_checkpoint_ignored(self):
+        """Unreadable checkpoint is ignored rather than failing the run."""
+        task = SumTask()
+        task._start_checkpointing((5,), dict())
+        with open(task.checkpoint_path, 'wb') as checkpoint_file:
+            checkpoint_file.write(b'\x80garbage')
+        self.assertEqual(SumTask().run(5).state.total, 10)
+
+    def test_disabled(self):
+        """Checkpointing is a no-op without checkpoint_directory."""
+        SumTask.checkpoint_directory = None
+        RecordTask.checkpoint_directory = None
+        task = SumTask()
+        self.assertEqual(task.run(5).state.total, 10)
+        self.assertIsNone(task.checkpoint_path)
+        self.assertFalse(task.checkpoint(1))
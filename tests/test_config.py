@@ -23,10 +23,19 @@
 
 #pylint: disable=C0103
 from unittest import TestCase
+import importlib
+import importlib.resources
+import os
 import sys
+import tempfile
+import zipfile
 from os import path
 
-from ..config import include_dependencies_in_path
+from ..config import (
+    DEPENDENCY_BUNDLE_NAME,
+    include_dependencies_in_path,
+    build_dependency_bundle
+)
 
 
 class TestConfigIncludeDependenciesInPath(TestCase):
@@ -34,8 +43,8 @@ class TestConfigIncludeDependenciesInPath(TestCase):
 
     def setUp(self):
         """Set argv[0] to full path to test file."""
-        self.original_argv = sys.argv
-        self.original_path = sys.path
+        self.original_argv = list(sys.argv)
+        self.original_path = list(sys.path)
         sys.argv[0] = path.abspath(__file__)
 
     def test_no_dirpath(self):
@@ -54,7 +63,82 @@ class TestConfigIncludeDependenciesInPath(TestCase):
             'lib'
         ))
 
+    def test_no_duplicates(self):
+        """dirpath already in sys.path is not added again."""
+        dirpath = path.abspath(path.dirname(__file__))
+        include_dependencies_in_path(dirpath)
+        include_dependencies_in_path()
+        include_dependencies_in_path(path.join(dirpath, 'lib', '..'))
+        self.assertEqual(sys.path.count(dirpath), 1)
+        self.assertEqual(len(sys.path), len(self.original_path) + 1)
+
     def tearDown(self):
-        """Reset sys.argv to original value."""
-        sys.argv = self.original_argv
-        sys.path = self.original_path
+        """Reset sys.argv and sys.path to original values."""
+        sys.argv[:] = self.original_argv
+        sys.path[:] = self.original_path
+
+
+class TestConfigBuildDependencyBundle(TestCase):
+    """Unit tests for build_dependency_bundle."""
+
+    def setUp(self):
+        """Create a dependency directory with a package and a module."""
+        self.original_path = list(sys.path)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dirpath = path.join(self.tmpdir.name, 'lib')
+        os.makedirs(path.join(self.dirpath, 'bundledpkg', 'sub'))
+        os.makedirs(path.join(self.dirpath, 'bundledpkg-1.0.dist-info'))
+        files = {
+            ('bundledpkg', '__init__.py'): 'VALUE = 1\n',
+            ('bundledpkg', 'sub', '__init__.py'): '',
+            ('bundledpkg', 'sub', 'mod.py'): 'from .. import VALUE\nDOUBLE = 2 * VALUE\n',
+            ('bundledpkg', 'data.txt'): 'data\n',
+            ('bundledpkg-1.0.dist-info', 'METADATA'): 'Name: bundledpkg\nVersion: 1.0\n',
+            ('bundledmod.py',): 'NAME = "bundledmod"\n'
+        }
+        for parts, content in files.items():
+            with open(path.join(self.dirpath, *parts), 'w') as dependency_file:
+                dependency_file.write(content)
+
+    def tearDown(self):
+        """Remove bundled modules and reset sys.path."""
+        sys.path[:] = self.original_path
+        for name in list(sys.modules):
+            if name.startswith(('bundledpkg', 'bundledmod')):
+                del sys.modules[name]
+        importlib.invalidate_caches()
+        self.tmpdir.cleanup()
+
+    def test_bundle(self):
+        """Bundle holds bytecode only and is preferred to the directory."""
+        names = build_dependency_bundle(self.dirpath)
+        self.assertIn('bundledpkg/sub/mod.pyc', names)
+        self.assertIn('bundledpkg-1.0.dist-info/METADATA', names)
+        bundle = path.join(self.dirpath, DEPENDENCY_BUNDLE_NAME)
+        with zipfile.ZipFile(bundle) as bundle_file:
+            self.assertFalse([
+                name for name in bundle_file.namelist() if name.endswith('.py')
+            ])
+        include_dependencies_in_path(self.dirpath)
+        self.assertEqual(sys.path[-1], bundle)
+        self.assertNotIn(self.dirpath, sys.path)
+        importlib.invalidate_caches()
+        mod = importlib.import_module('bundledpkg.sub.mod')
+        self.assertEqual(mod.DOUBLE, 2)
+        self.assertTrue(mod.__file__.startswith(bundle))
+        self.assertEqual(importlib.import_module('bundledmod').NAME, 'bundledmod')
+        self.assertEqual(
+            importlib.resources.files('bundledpkg').joinpath('data.txt').read_text(),
+            'data\n'
+        )
+
+    def test_rebuild(self):
+        """Rebuilding does not bundle the previous bundle."""
+        build_dependency_bundle(self.dirpath)
+        self.assertNotIn(DEPENDENCY_BUNDLE_NAME, build_dependency_bundle(self.dirpath))
+
+    def test_extension_modules(self):
+        """Extension modules cannot be bundled."""
+        open(path.join(self.dirpath, 'bundledpkg', 'speedups.so'), 'w').close()
+        self.assertRaises(ValueError, build_dependency_bundle, self.dirpath)
+        self.assertFalse(path.exists(path.join(self.dirpath, DEPENDENCY_BUNDLE_NAME)))
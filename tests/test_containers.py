@@ -0,0 +1,263 @@
+## -*- coding: UTF-8 -*-
+## test_containers.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from unittest import TestCase
+import mmap
+import operator
+import pickle
+import struct
+import tempfile
+
+from ..patterns import Container
+from ..containers import (
+    make_container_type,
+    make_view_type,
+    LazyContainer,
+    LazySequence,
+    to_container,
+    unwrap_nested
+)
+
+Record = make_container_type('Record', ('name', 'size', 'flags'))
+Header = make_view_type('Header', (
+    ('signature', '4s'),
+    ('sequence', 'H'),
+    (None, 2),
+    ('size', 'I'),
+    ('pair', '2H'),
+    ('payload', 4)
+))
+CachedHeader = make_view_type('CachedHeader', (
+    ('signature', '4s'),
+    ('size', 'I')
+), cache=('size',))
+HEADER_BYTES = struct.pack('<4sH2xI2H4s', b'FILE', 3, 1024, 7, 8, b'DATA')
+
+
+class TestSlottedContainer(TestCase):
+    """Unit tests for make_container_type and SlottedContainer."""
+
+    def test_attribute_and_item_access(self):
+        """Fields readable as attributes, items and via get."""
+        record = Record(name='$MFT', size=1024)
+        self.assertEqual(record.name, '$MFT')
+        self.assertEqual(record['size'], 1024)
+        self.assertEqual(record.get('name'), '$MFT')
+
+    def test_unset_field_is_missing(self):
+        """Unset fields behave like missing keys."""
+        record = Record(name='$MFT')
+        self.assertIsNone(record.get('flags'))
+        self.assertRaises(KeyError, record.__getitem__, 'flags')
+        self.assertRaises(AttributeError, getattr, record, 'flags')
+        self.assertNotIn('flags', record)
+
+    def test_set_and_delete(self):
+        """Fields set and deleted via attribute and item methods."""
+        record = Record()
+        record.name = 'a'
+        record['size'] = 1
+        self.assertEqual(dict(record), dict(name='a', size=1))
+        del record.name
+        del record['size']
+        self.assertEqual(len(record), 0)
+
+    def test_unknown_field(self):
+        """Keys outside the schema are rejected."""
+        record = Record()
+        self.assertRaises(KeyError, record.__setitem__, 'other', 1)
+        self.assertRaises(AttributeError, setattr, record, 'other', 1)
+        self.assertRaises(KeyError, record.__getitem__, 'keys')
+
+    def test_no_instance_dict(self):
+        """Instances do not carry a __dict__."""
+        self.assertFalse(hasattr(Record(), '__dict__'))
+
+    def test_mapping_api(self):
+        """Iteration, keys, items and equality match Container."""
+        record = Record([('size', 1), ('name', 'a')])
+        container = Container(name='a', size=1)
+        self.assertEqual(list(record), ['name', 'size'])
+        self.assertEqual(sorted(record.items()), sorted(container.items()))
+        self.assertEqual(record, container)
+
+    def test_copy_and_pickle(self):
+        """Copies and pickles round-trip."""
+        record = Record(name='a', size=1, flags=0)
+        self.assertEqual(record.copy(), record)
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+
+    def test_invalid_schema(self):
+        """Duplicate and reserved field names are rejected."""
+        self.assertRaises(ValueError, make_container_type, 'Bad', ('a', 'a'))
+        self.assertRaises(ValueError, make_container_type, 'Bad', ('items',))
+
+
+class TestStructContainerView(TestCase):
+    """Unit tests for make_view_type and StructContainerView."""
+
+    def test_size(self):
+        """Structure size includes padding and raw fields."""
+        self.assertEqual(Header.struct_size(), len(HEADER_BYTES))
+
+    def test_field_access(self):
+        """Fields decoded via attribute, item and get access."""
+        header = Header(HEADER_BYTES)
+        self.assertEqual(header.signature, b'FILE')
+        self.assertEqual(header['sequence'], 3)
+        self.assertEqual(header.get('size'), 1024)
+        self.assertEqual(header.pair, (7, 8))
+        self.assertIsNone(header.get('missing'))
+
+    def test_raw_field_is_zero_copy(self):
+        """Raw fields are memoryviews over the underlying buffer."""
+        buffer = bytearray(HEADER_BYTES)
+        header = Header(buffer)
+        payload = header.payload
+        self.assertIsInstance(payload, memoryview)
+        buffer[-4:] = b'ATAD'
+        self.assertEqual(payload.tobytes(), b'ATAD')
+
+    def test_lazy_decoding(self):
+        """Fields reflect buffer contents at first access."""
+        buffer = bytearray(HEADER_BYTES)
+        header = Header(buffer)
+        struct.pack_into('<I', buffer, 8, 2048)
+        self.assertEqual(header.size, 2048)
+
+    def test_cached_field(self):
+        """Cached fields are decoded only once."""
+        buffer = bytearray(HEADER_BYTES[:4] + HEADER_BYTES[8:12])
+        header = CachedHeader(buffer)
+        self.assertEqual(header.size, 1024)
+        struct.pack_into('<I', buffer, 4, 2048)
+        self.assertEqual(header.size, 1024)
+
+    def test_mapping_api(self):
+        """keys, iteration and dict conversion match Container."""
+        header = Header(HEADER_BYTES)
+        self.assertEqual(
+            list(header.keys()),
+            ['signature', 'sequence', 'size', 'pair', 'payload']
+        )
+        converted = dict(header)
+        self.assertEqual(converted['size'], 1024)
+        self.assertEqual(header.to_container().sequence, 3)
+        self.assertNotIn('missing', header)
+
+    def test_read_only(self):
+        """Views cannot be modified."""
+        header = Header(HEADER_BYTES)
+        self.assertRaises(AttributeError, setattr, header, 'size', 1)
+        self.assertRaises(TypeError, operator.setitem, header, 'size', 1)
+
+    def test_short_buffer(self):
+        """Buffers too short for the structure are rejected."""
+        self.assertRaises(ValueError, Header, HEADER_BYTES[:-1])
+        self.assertRaises(ValueError, Header, HEADER_BYTES, 1)
+
+    def test_iter_from(self):
+        """Consecutive structures are viewed without copying."""
+        headers = list(Header.iter_from(HEADER_BYTES * 3 + b'\x00'))
+        self.assertEqual(len(headers), 3)
+        self.assertEqual([header.sequence for header in headers], [3, 3, 3])
+
+    def test_mmap_buffer(self):
+        """Views over memory-mapped files."""
+        with tempfile.TemporaryFile() as backing_file:
+            backing_file.write(HEADER_BYTES)
+            backing_file.flush()
+            mapping = mmap.mmap(backing_file.fileno(), 0, access=mmap.ACCESS_READ)
+            header = Header(mapping)
+            self.assertEqual(header.signature, b'FILE')
+            del header
+            mapping.close()
+
+    def test_pickle(self):
+        """Views pickle as a copy of their structure bytes."""
+        header = Header(b'\x00' + HEADER_BYTES, 1)
+        self.assertEqual(dict(pickle.loads(pickle.dumps(header))), dict(header))
+
+
+class TestLazyContainer(TestCase):
+    def setUp(self):
+        self.data = dict(
+            event=dict(host=dict(name='ws01', ips=['10.0.0.1'])),
+            files=[dict(path='a.txt'), dict(path='b.txt')],
+            count=2
+        )
+        self.lazy = LazyContainer(self.data)
+
+    def test_nested_access(self):
+        """Nested dicts and lists are wrapped when read."""
+        self.assertEqual(self.lazy.event.host.name, 'ws01')
+        self.assertEqual(self.lazy['event']['host'].ips[0], '10.0.0.1')
+        self.assertIsInstance(self.lazy.event, LazyContainer)
+        self.assertIsInstance(self.lazy.files, LazySequence)
+        self.assertEqual([item.path for item in self.lazy.files], ['a.txt', 'b.txt'])
+        self.assertEqual(self.lazy.files[-1:][0].path, 'b.txt')
+        self.assertEqual(self.lazy.count, 2)
+        self.assertIsNone(self.lazy.get('missing'))
+        with self.assertRaises(AttributeError):
+            self.lazy.missing
+
+    def test_no_copy(self):
+        """Wrapping shares the underlying data and writes go through."""
+        self.assertIs(unwrap_nested(self.lazy), self.data)
+        self.assertIs(unwrap_nested(self.lazy.event), self.data['event'])
+        self.lazy.event.host.name = 'ws02'
+        self.lazy.files.append(LazyContainer(path='c.txt'))
+        self.lazy.tags = LazySequence(['x'])
+        del self.lazy.count
+        self.assertEqual(self.data['event']['host']['name'], 'ws02')
+        self.assertEqual(self.data['files'][-1], dict(path='c.txt'))
+        self.assertIs(type(self.data['files'][-1]), dict)
+        self.assertEqual(self.data['tags'], ['x'])
+        self.assertNotIn('count', self.data)
+
+    def test_equality(self):
+        self.assertEqual(self.lazy, self.data)
+        self.assertEqual(self.lazy.files, self.data['files'])
+        self.assertEqual(self.lazy, Container(self.data))
+        self.assertNotEqual(self.lazy.files, 'files')
+
+    def test_to_container(self):
+        """to_container converts eagerly into nested Containers."""
+        container = self.lazy.to_container()
+        self.assertIsInstance(container, Container)
+        self.assertIsInstance(container.event.host, Container)
+        self.assertIsInstance(container.files[0], Container)
+        self.assertEqual(container, self.data)
+        self.assertIsNot(container.event, self.data['event'])
+        self.assertEqual(to_container([dict(a=1)])[0].a, 1)
+
+    def test_pickle(self):
+        copy = pickle.loads(pickle.dumps(self.lazy))
+        self.assertIsInstance(copy, LazyContainer)
+        self.assertEqual(copy, self.data)
+
+    def test_invalid_data(self):
+        with self.assertRaises(TypeError):
+            LazyContainer(['not', 'a', 'dict'])
+        with self.assertRaises(TypeError):
+            LazySequence(dict())
@@ -0,0 +1,141 @@
+## -*- coding: UTF-8 -*-
+## test_distributed.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+import os
+import socket
+import time
+from multiprocessing.connection import Client
+from unittest import TestCase
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult, BaseTask
+from ..distributed import TaskBroker, LocalCluster
+
+
+class SquareTask(BaseTask):
+
+    def _preamble(self, value: int, delay: float = 0.0) -> None:
+        """@BaseTask._preamble"""
+        self.value = value
+        self.delay = delay
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        if self.value < 0:
+            raise ValueError('negative')
+        time.sleep(self.delay)
+        self.result = TaskResult(
+            TaskStatus.SUCCESS,
+            Container(square=self.value ** 2, pid=os.getpid())
+        )
+
+
+class CrashTask(BaseTask):
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        os._exit(1)
+
+
+class TestDistributed(TestCase):
+    """Unit tests for TaskBroker, run_worker and LocalCluster."""
+
+    def test_run(self):
+        """Tasks run on every worker and results stream back."""
+        with LocalCluster(workers=2) as cluster:
+            results = dict(cluster.broker.run(
+                [SquareTask() for _ in range(20)] + [SquareTask()], 3, delay=0.01
+            ))
+            error = cluster.broker.submit(SquareTask(), -1).result(10)
+            stats = cluster.broker.stats
+        self.assertEqual(len(results), 21)
+        self.assertTrue(all(result.state.square == 9 for result in results.values()))
+        self.assertEqual(len({result.state.pid for result in results.values()}), 2)
+        self.assertEqual(error.status, TaskStatus.FAILURE)
+        self.assertEqual(error.state.error_type, 'ValueError')
+        self.assertEqual((stats.completed, stats.failed, stats.workers), (21, 1, 2))
+
+    def test_lost_worker_requeued(self):
+        """Tasks in flight on a killed worker are requeued."""
+        with LocalCluster(workers=2) as cluster:
+            futures = [
+                cluster.broker.submit(SquareTask(), value, 0.05) for value in range(10)
+            ]
+            time.sleep(0.1)
+            cluster.kill_worker(0)
+            results = [future.result(30) for future in futures]
+            stats = cluster.broker.stats
+        self.assertEqual(
+            [result.state.square for result in results],
+            [value ** 2 for value in range(10)]
+        )
+        self.assertEqual(stats.lost_workers, 1)
+        self.assertGreater(stats.requeued, 0)
+
+    def test_poison_task(self):
+        """Task that keeps crashing workers fails after max_attempts."""
+        with LocalCluster(workers=1, max_attempts=2, prefetch=1) as cluster:
+            future = cluster.broker.submit(CrashTask())
+            cluster.add_worker()
+            result = future.result(30)
+            cluster.add_worker()
+            self.assertTrue(cluster.broker.wait_for_workers(1, timeout=30))
+            after = cluster.broker.submit(SquareTask(), 2).result(30)
+        self.assertEqual(result.status, TaskStatus.FAILURE)
+        self.assertEqual(result.state.attempts, 2)
+        self.assertEqual(after.state.square, 4)
+
+    def test_unpicklable_task(self):
+        """Unpicklable tasks fail without losing the worker."""
+        with LocalCluster(workers=1) as cluster:
+            task = SquareTask()
+            task.callback = lambda: None
+            result = cluster.broker.submit(task, 1).result(10)
+            after = cluster.broker.submit(SquareTask(), 2).result(10)
+        self.assertEqual(result.status, TaskStatus.FAILURE)
+        self.assertEqual(after.state.square, 4)
+
+    def test_authentication(self):
+        """Connections with the wrong authkey are rejected."""
+        with TaskBroker() as broker:
+            self.assertRaises(Exception, Client, broker.address, authkey=b'wrong')
+            self.assertEqual(broker.stats.workers, 0)
+
+    def test_bad_connections(self):
+        """Connections that close, stall or misbehave do not stop the broker."""
+        with LocalCluster(workers=0) as cluster:
+            broker = cluster.broker
+            socket.create_connection(broker.address).close()
+            garbage = socket.create_connection(broker.address)
+            garbage.sendall(b'\xff' * 64)
+            garbage.close()
+            silent = socket.create_connection(broker.address)
+            try:
+                self.assertRaises(Exception, Client, broker.address, authkey=b'wrong')
+                cluster.add_worker()
+                self.assertTrue(broker.wait_for_workers(1, timeout=30))
+                result = broker.submit(SquareTask(), 2).result(30)
+                self.assertTrue(broker._accepter.is_alive())    #pylint: disable=W0212
+            finally:
+                silent.close()
+        self.assertEqual(result.state.square, 4)
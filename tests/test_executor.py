@@ -0,0 +1,150 @@
+## -*- coding: UTF-8 -*-
+## test_executor.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Any
+
+from unittest import TestCase
+import os
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult, BaseTask
+from ..executor import TaskExecutor
+
+
+class SquareTask(BaseTask):
+    """Task squaring its input, failing on negative inputs."""
+
+    def _preamble(self, value: int = 0, offset: int = 0) -> None: #pylint: disable=W0221
+        """@BaseTask._preamble"""
+        self.value = value
+        self.offset = offset
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        if self.value < 0:
+            raise ValueError('negative input %d'%self.value)
+        self.result = TaskResult(
+            TaskStatus.SUCCESS,
+            Container(value=self.value ** 2 + self.offset)
+        )
+
+
+class UnpicklableResultTask(BaseTask):
+    """Task whose result cannot be pickled."""
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(value=lambda: None))
+
+
+class CrashTask(BaseTask):
+    """Task killing its (worker) process on odd inputs."""
+
+    def _preamble(self, value: int = 0) -> None: #pylint: disable=W0221
+        """@BaseTask._preamble"""
+        self.value = value
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        if self.value % 2:
+            os._exit(1)                 #pylint: disable=W0212
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(value=self.value))
+
+
+def collect(results: Any) -> dict:
+    """Map of index to result."""
+    return dict(results)
+
+
+class TestTaskExecutor(TestCase):
+    """Unit tests for TaskExecutor."""
+
+    def test_run_task_instances(self):
+        """Run task instances on thread pool."""
+        with TaskExecutor(max_workers=4) as executor:
+            results = collect(executor.run([SquareTask() for _ in range(8)], 3))
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result.state.value == 9 for result in results.values()))
+        self.assertEqual(executor.summary[TaskStatus.SUCCESS], 8)
+
+    def test_map_inputs(self):
+        """Map task class over inputs with keyword arguments."""
+        with TaskExecutor(max_workers=4, chunksize=3) as executor:
+            results = collect(executor.map(SquareTask, range(10), offset=1))
+        self.assertEqual(
+            [results[index].state.value for index in range(10)],
+            [value ** 2 + 1 for value in range(10)]
+        )
+
+    def test_starmap_inputs(self):
+        """Starmap task class over argument tuples."""
+        with TaskExecutor(max_workers=2) as executor:
+            results = collect(executor.starmap(SquareTask, [(2, 1), (3, 2)]))
+        self.assertEqual(results[0].state.value, 5)
+        self.assertEqual(results[1].state.value, 11)
+
+    def test_failures_reported(self):
+        """Failing tasks yield failure results without stopping the batch."""
+        with TaskExecutor(max_workers=2) as executor:
+            results = collect(executor.map(SquareTask, [1, -1, 2]))
+        self.assertEqual(results[1].status, TaskStatus.FAILURE)
+        self.assertEqual(results[1].state.error_type, 'ValueError')
+        self.assertEqual(results[2].state.value, 4)
+        self.assertEqual(executor.summary[TaskStatus.FAILURE], 1)
+        self.assertEqual(executor.summary[TaskStatus.SUCCESS], 2)
+
+    def test_process_pool(self):
+        """Run tasks across a process pool."""
+        with TaskExecutor(max_workers=2, use_processes=True, chunksize=4) as executor:
+            results = collect(executor.map(SquareTask, [1, 2, -3, 4, 5]))
+        self.assertEqual(results[4].state.value, 25)
+        self.assertEqual(results[2].status, TaskStatus.FAILURE)
+        self.assertEqual(executor.summary[TaskStatus.SUCCESS], 4)
+
+    def test_process_pool_unpicklable_result(self):
+        """Results that cannot be returned from a worker are failures."""
+        with TaskExecutor(max_workers=1, use_processes=True) as executor:
+            results = collect(executor.run([UnpicklableResultTask()]))
+        self.assertEqual(results[0].status, TaskStatus.FAILURE)
+
+    def test_process_pool_crashed_worker(self):
+        """A crashed worker fails its chunk and the pool is replaced."""
+        with TaskExecutor(max_workers=1, use_processes=True) as executor:
+            results = collect(executor.map(CrashTask, range(10)))
+            self.assertEqual(sorted(results), list(range(10)))
+            for index in range(1, 10, 2):
+                self.assertEqual(results[index].status, TaskStatus.FAILURE)
+            summary = executor.summary
+            self.assertEqual(
+                summary[TaskStatus.SUCCESS] + summary[TaskStatus.FAILURE], 10
+            )
+            self.assertEqual(collect(executor.map(SquareTask, [3]))[0].state.value, 9)
+
+    def test_early_exit(self):
+        """Consumers can stop iterating before all tasks complete."""
+        with TaskExecutor(max_workers=1) as executor:
+            results = executor.map(SquareTask, range(100))
+            next(results)
+            results.close()
+            self.assertEqual(sum(executor.summary.values()), 1)
+
@@ -0,0 +1,176 @@
+## -*- coding: UTF-8 -*-
+## test_export.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+from unittest import TestCase
+
+from ..containers import LazyContainer
+from ..patterns import Container
+from ..spill import SpillContainer
+from .. import export
+from ..export import flatten, iter_json, write_csv, write_json, write_jsonl
+
+
+def _random_tree(generator: random.Random, depth: int) -> object:
+    """Random nested JSON-compatible data."""
+    kind = generator.randrange(6 if depth else 4)
+    if kind == 0:
+        return generator.randrange(-1000, 1000)
+    if kind == 1:
+        return generator.random()
+    if kind == 2:
+        return generator.choice(['', 'text', 'quote"', 'line\n', 'é', None, True])
+    if kind == 3:
+        return [generator.randrange(10) for _ in range(generator.randrange(5))]
+    if kind == 4:
+        return [_random_tree(generator, depth - 1) for _ in range(generator.randrange(4))]
+    return {
+        'key%d'%index: _random_tree(generator, depth - 1)
+        for index in range(generator.randrange(4))
+    }
+
+
+class TestIterJSON(TestCase):
+    def test_matches_json(self):
+        """Encoding matches json.dumps for random trees."""
+        generator = random.Random(7)
+        for _ in range(200):
+            tree = _random_tree(generator, 5)
+            expected = json.dumps(tree, ensure_ascii=False, separators=(',', ':'))
+            self.assertEqual(''.join(iter_json(tree, buffer_size=8)), expected)
+
+    def test_chunked_wide_data(self):
+        """Wide mappings and arrays are encoded in chunks."""
+        tree = dict(
+            values=list(range(50000)),
+            names={'name%d'%index: index for index in range(50000)}
+        )
+        chunks = list(iter_json(tree, buffer_size=1024))
+        self.assertGreater(len(chunks), 10)
+        self.assertLess(max(map(len, chunks)), 1024 + 100000)
+        self.assertEqual(json.loads(''.join(chunks)), tree)
+        records = [dict(index=index, tags=['a']) for index in range(50000)]
+        chunks = list(iter_json(records, buffer_size=1024))
+        self.assertLess(max(map(len, chunks)), 1024 + 100000)
+        self.assertEqual(json.loads(''.join(chunks)), records)
+
+    def test_mappings_iterables_and_default(self):
+        state = SpillContainer(memory_limit=0)
+        state.records = (Container(index=index) for index in range(3))
+        state.lazy = LazyContainer(dict(nested=dict(value=1)))
+        state.set = frozenset([1])
+        state.keys = {1: 'one', None: 'none', 2.5: True}
+        state.raw = b'bytes'
+        encoded = ''.join(iter_json(state, default=lambda value: value.decode()))
+        state.close()
+        self.assertEqual(json.loads(encoded), dict(
+            records=[dict(index=0), dict(index=1), dict(index=2)],
+            lazy=dict(nested=dict(value=1)),
+            set=[1],
+            keys={'1': 'one', 'null': 'none', '2.5': True},
+            raw='bytes'
+        ))
+
+    def test_deep_nesting(self):
+        """Nesting depth is not limited by the recursion limit."""
+        tree = dict()
+        node = tree
+        for _ in range(5000):
+            node['child'] = node = dict()
+        self.assertEqual(''.join(iter_json(tree)), '{"child":' * 5000 + '{}' + '}' * 5000)
+
+    def test_unserializable(self):
+        with self.assertRaises(TypeError):
+            ''.join(iter_json(dict(value=object())))
+        with self.assertRaises(TypeError):
+            ''.join(iter_json(dict(value=object()), default=lambda value: value))
+        with self.assertRaises(TypeError):
+            ''.join(iter_json({(1, 2): 'tuple key'}))
+
+
+class TestWriters(TestCase):
+    def setUp(self):
+        self.records = [
+            Container(index=index, host=dict(name='ws%02d'%index), tags=['a', index])
+            for index in range(2500)
+        ]
+
+    def test_write_json(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'records.json')
+            written = write_json(iter(self.records), path)
+            with open(path, encoding='utf-8') as json_file:
+                text = json_file.read()
+        self.assertEqual(written, len(text))
+        self.assertEqual(json.loads(text), self.records)
+
+    def test_write_jsonl(self):
+        stream = io.StringIO()
+        count = write_jsonl((record for record in self.records), stream)
+        self.assertEqual(count, len(self.records))
+        lines = stream.getvalue().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], self.records)
+        stream = io.StringIO()
+        self.assertEqual(write_jsonl(LazyContainer(dict(a=dict(b=[1]))), stream), 1)
+        self.assertEqual(stream.getvalue(), '{"a":{"b":[1]}}\n')
+
+    def test_write_csv(self):
+        stream = io.StringIO(newline='')
+        records = iter(self.records + [Container(index=-1, extra=True)])
+        self.assertEqual(write_csv(records, stream), len(self.records) + 1)
+        rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+        self.assertEqual(list(rows[0]), ['index', 'host.name', 'tags'])
+        self.assertEqual(rows[7], {'index': '7', 'host.name': 'ws07', 'tags': '["a",7]'})
+        self.assertEqual(rows[-1], {'index': '-1', 'host.name': '', 'tags': ''})
+        with self.assertRaises(ValueError):
+            write_csv(self.records + [dict(extra=1)], io.StringIO(), extrasaction='raise')
+        self.assertEqual(write_csv(iter([]), io.StringIO()), 0)
+
+    def test_flatten(self):
+        self.assertEqual(
+            dict(flatten(dict(a=dict(b=dict(c=1)), d=[1]), separator='/')),
+            {'a/b/c': 1, 'd': '[1]'}
+        )
+
+    def test_bounded_batches(self):
+        """Writers consume their input one batch at a time."""
+        consumed = list()
+        def records():
+            for record in self.records:
+                consumed.append(record)
+                yield record
+        class RecordingStream(io.StringIO):
+            """Stream recording how many records were consumed at each write."""
+            def write(self, text):
+                consumed_at_write.append(len(consumed))
+                return super().write(text)
+        consumed_at_write = list()
+        write_jsonl(records(), RecordingStream())
+        self.assertGreater(len(consumed_at_write), 1)
+        for writes, count in enumerate(consumed_at_write, 1):
+            self.assertLessEqual(count, export.CHUNK_ITEMS * writes)
@@ -0,0 +1,110 @@
+## -*- coding: UTF-8 -*-
+## test_filetask.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+import os
+import tempfile
+from unittest import TestCase
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult
+from ..filetask import MappedFileTask
+
+
+class ChecksumTask(MappedFileTask):
+    """Sums bytes of the input file chunk by chunk."""
+    fail = False
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        total = 0
+        chunks = 0
+        for _, chunk in self.chunks(4096):
+            total += sum(chunk)
+            chunks += 1
+            if self.fail:
+                raise IOError('read error')
+        self.result = TaskResult(
+            TaskStatus.SUCCESS,
+            Container(total=total, chunks=chunks, header=bytes(self.window(0, 4)))
+        )
+
+
+class TestMappedFileTask(TestCase):
+    """Unit tests for MappedFileTask."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'image.bin')
+        self.data = bytes(range(256)) * 40
+        with open(self.path, 'wb') as image_file:
+            image_file.write(self.data)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_chunks_and_window(self):
+        """Chunks cover file and windows are zero-copy slices."""
+        task = ChecksumTask(drop_behind=True)
+        result = task.run(self.path)
+        self.assertEqual(result.state.total, sum(self.data))
+        self.assertEqual(result.state.chunks, 3)
+        self.assertEqual(result.state.header, b'\x00\x01\x02\x03')
+        self.assertIsNone(task._map)
+        self.assertIsNone(task._file)
+
+    def test_overlap_and_bounds(self):
+        """Chunks overlap by requested bytes and stop at end."""
+        task = ChecksumTask()
+        task._preamble(self.path)
+        try:
+            chunks = list(task.chunks(4000, start=1000, end=9000, overlap=10))
+            self.assertEqual([offset for offset, _ in chunks], [1000, 5000])
+            self.assertEqual(len(chunks[0][1]), 4010)
+            self.assertEqual(len(chunks[1][1]), 4000)
+            self.assertEqual(bytes(task.window(10230, 100)), self.data[10230:])
+        finally:
+            task._postamble()
+
+    def test_unmapped_on_failure(self):
+        """Mapping released even if _process_task raises."""
+        task = ChecksumTask()
+        task.fail = True
+        self.assertRaises(IOError, task.run, self.path)
+        self.assertIsNone(task._map)
+        self.assertIsNone(task._file)
+        self.assertEqual(len(task.view), 0)
+
+    def test_empty_file(self):
+        """Empty files are handled without mapping."""
+        open(self.path, 'wb').close()
+        result = ChecksumTask().run(self.path)
+        self.assertEqual((result.state.total, result.state.chunks), (0, 0))
+
+    def test_held_view(self):
+        """Views held past the run do not prevent cleanup."""
+        task = ChecksumTask()
+        task._preamble(self.path)
+        window = task.window(0, 8)
+        task._postamble()
+        self.assertEqual(bytes(window), self.data[:8])
+        self.assertIsNone(task._file)
@@ -0,0 +1,131 @@
+## -*- coding: UTF-8 -*-
+## test_instrument.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from unittest import TestCase
+import pickle
+import time
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult, BaseTask
+from .. import instrument
+from ..instrument import Instrumentation, TaskStats
+
+
+class WorkTask(BaseTask):
+    """Task that sleeps in its preamble and allocates in _process_task."""
+
+    def _preamble(self, fail: bool = False) -> None:   #pylint: disable=W0221
+        """@BaseTask._preamble"""
+        self.fail = fail
+        time.sleep(0.02)
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        data = bytearray(1 << 20)
+        if self.fail:
+            raise RuntimeError('failed')
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(size=len(data)))
+
+
+class TestInstrumentation(TestCase):
+    """Unit tests for BaseTask.run instrumentation."""
+
+    def setUp(self):
+        """Use private stats collector."""
+        self.stats = TaskStats()
+        self.observed = list()
+
+    def tearDown(self):
+        """Reset global instrumentation."""
+        instrument.configure(None)
+
+    def test_disabled_by_default(self):
+        """No metrics recorded without instrumentation."""
+        self.assertIsNone(WorkTask().run().metrics)
+
+    def test_phase_timings(self):
+        """Per-phase wall and CPU timings recorded on result."""
+        task = WorkTask()
+        task.instrumentation = Instrumentation(observers=[self.stats])
+        metrics = task.run().metrics
+        self.assertEqual(list(metrics.phases), ['preamble', 'process_task', 'postamble'])
+        self.assertGreaterEqual(metrics.phases.preamble.wall, 0.02)
+        self.assertLess(metrics.phases.preamble.cpu, metrics.phases.preamble.wall)
+        self.assertAlmostEqual(
+            metrics.wall,
+            sum(phase.wall for phase in metrics.phases.values())
+        )
+        self.assertIsNone(metrics.profile)
+
+    def test_trace_memory(self):
+        """Peak memory of each phase traced."""
+        task = WorkTask()
+        task.instrumentation = Instrumentation(trace_memory=True, observers=[])
+        metrics = task.run().metrics
+        self.assertGreaterEqual(metrics.phases.process_task.peak_memory, 1 << 20)
+        self.assertLess(metrics.phases.preamble.peak_memory, 1 << 20)
+
+    def test_profile(self):
+        """cProfile stats recorded and loadable."""
+        task = WorkTask()
+        task.instrumentation = Instrumentation(profile=True, observers=[])
+        metrics = task.run().metrics
+        stats = instrument.profile_stats(metrics)
+        self.assertTrue(any(
+            function[2] == '_process_task' for function in stats.stats
+        ))
+        pickle.dumps(metrics)
+
+    def test_observers_and_errors(self):
+        """Observers notified even when a phase raises."""
+        task = WorkTask()
+        task.instrumentation = Instrumentation(observers=[self.stats])
+        task.instrumentation.add_observer(
+            lambda task, metrics: self.observed.append(metrics)
+        )
+        self.assertRaises(RuntimeError, task.run, True)
+        self.assertEqual(self.observed[0].error, 'RuntimeError: failed')
+        self.assertIn('process_task', self.observed[0].phases)
+        self.assertNotIn('postamble', self.observed[0].phases)
+
+    def test_global_configuration_and_stats(self):
+        """Global instrumentation aggregates stats across runs."""
+        instrument.configure(Instrumentation(observers=[self.stats]))
+        for _ in range(3):
+            WorkTask().run()
+        self.assertRaises(RuntimeError, WorkTask().run, True)
+        stats = self.stats.get(WorkTask)
+        self.assertEqual(stats.runs, 4)
+        self.assertEqual(stats.errors, 1)
+        self.assertEqual(stats.phases.preamble.count, 4)
+        self.assertEqual(sum(stats.phases.preamble.histogram), 4)
+        self.assertGreaterEqual(stats.phases.preamble.wall_min, 0.02)
+        self.stats.reset()
+        self.assertIsNone(self.stats.get(WorkTask))
+
+    def test_task_instrumentation_overrides_global(self):
+        """Disabled task instrumentation overrides global default."""
+        instrument.configure(Instrumentation(observers=[self.stats]))
+        task = WorkTask()
+        task.instrumentation = Instrumentation(enabled=False)
+        self.assertIsNone(task.run().metrics)
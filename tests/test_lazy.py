@@ -0,0 +1,123 @@
+## -*- coding: UTF-8 -*-
+## test_lazy.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+from .. import lazy
+
+PACKAGE = __name__.split('.')[0]
+PACKAGE_PARENT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+class TestLazy(TestCase):
+    """Unit tests for lazy."""
+
+    def run_python(self, code: str, path: str = PACKAGE_PARENT) -> str:
+        return subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=path,
+            check=True,
+            stdout=subprocess.PIPE,
+            env=dict(os.environ, PYTHONPATH=path)
+        ).stdout.decode('utf-8').split()
+
+    def test_package_import_is_lazy(self):
+        """Importing the package imports no other submodules."""
+        loaded = self.run_python(
+            'import sys, %s\n'
+            'print(" ".join(sorted(m for m in sys.modules if m.startswith("%s."))))'%(
+                PACKAGE, PACKAGE
+            )
+        )
+        self.assertEqual(loaded, ['%s.lazy'%PACKAGE])
+
+    def test_star_import(self):
+        """A star import only imports the modules of exported attributes."""
+        loaded = self.run_python(
+            'import sys\n'
+            'from %s import *\n'
+            'print(" ".join(sorted(m for m in sys.modules if m.startswith("%s."))))'%(
+                PACKAGE, PACKAGE
+            )
+        )
+        expected = self.run_python(
+            'import sys, %s.patterns, %s.task\n'
+            'print(" ".join(sorted(m for m in sys.modules if m.startswith("%s."))))'%(
+                PACKAGE, PACKAGE, PACKAGE
+            )
+        )
+        self.assertEqual(loaded, expected)
+        self.assertNotIn('%s.executor'%PACKAGE, loaded)
+
+    def test_package_attributes(self):
+        """Exported names load their submodule on first access."""
+        output = self.run_python(
+            'import sys, %s as package\n'
+            'print(package.BaseTask.__module__, "%s.executor" in sys.modules)\n'
+            'print(package.executor.__name__, "Container" in dir(package))'%(
+                PACKAGE, PACKAGE
+            )
+        )
+        self.assertEqual(output, [
+            '%s.task'%PACKAGE, 'False', '%s.executor'%PACKAGE, 'True'
+        ])
+
+    def test_attach(self):
+        """attach works for other packages."""
+        with tempfile.TemporaryDirectory() as directory:
+            os.mkdir(os.path.join(directory, 'plugin'))
+            with open(os.path.join(directory, 'plugin', '__init__.py'), 'w') as init_file:
+                init_file.write(
+                    'from %s import lazy\n'
+                    '__getattr__, __dir__, __all__ = lazy.attach(\n'
+                    '    __name__, ["parsers"], dict(parsers=["parse"]))\n'%PACKAGE
+                )
+            parsers_path = os.path.join(directory, 'plugin', 'parsers.py')
+            with open(parsers_path, 'w') as module_file:
+                module_file.write('def parse():\n    return "parsed"\n')
+            output = self.run_python(
+                'import sys\n'
+                'sys.path.insert(0, %r)\n'
+                'import plugin\n'
+                'print("plugin.parsers" in sys.modules, plugin.__all__)\n'
+                'print(plugin.parse(), "plugin.parsers" in sys.modules)\n'
+                'print(hasattr(plugin, "missing"))'%directory
+            )
+        self.assertEqual(output, [
+            'False', "['parse']", 'parsed', 'True', 'False'
+        ])
+
+    def test_unknown_attribute(self):
+        """Unknown names raise AttributeError."""
+        getattr_, dir_, all_ = lazy.attach(PACKAGE, ['task'], dict(task=['BaseTask']))
+        self.assertRaises(AttributeError, getattr_, 'missing')
+        self.assertIs(getattr_('task'), sys.modules['%s.task'%PACKAGE])
+        self.assertEqual(all_, ['BaseTask'])
+        self.assertIn('task', dir_())
+        self.assertIn('BaseTask', dir_())
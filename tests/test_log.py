@@ -0,0 +1,129 @@
+## -*- coding: UTF-8 -*-
+## test_log.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest import TestCase
+
+from ..log import configure_logging, configure_worker_logging
+
+
+def _work(value: int) -> int:
+    """Log from a worker process."""
+    logging.getLogger('worker').info('processed %d', value)
+    return value
+
+
+class TestLog(TestCase):
+    """Unit tests for log."""
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.writer = None
+
+    def tearDown(self):
+        if self.writer is not None:
+            self.writer.stop()
+
+    def test_text(self):
+        """Records formatted with LOGGING_DEFAULTS once written."""
+        self.writer = configure_logging(self.stream, logger='test.text')
+        values = [1]
+        logging.getLogger('test.text').info('values %s', values)
+        logging.getLogger('test.text').debug('hidden')
+        values.append(2)
+        self.writer.stop()
+        line, = self.stream.getvalue().splitlines()
+        self.assertTrue(line.endswith('\tINFO\ttest.text\tvalues [1]'))
+        logging.getLogger('test.text').info('after stop')
+        self.assertEqual(len(self.stream.getvalue().splitlines()), 1)
+
+    def test_structured(self):
+        """JSON lines include extras and exceptions."""
+        self.writer = configure_logging(self.stream, structured=True, logger='test.json')
+        logger = logging.getLogger('test.json')
+        logger.warning(
+            'parsed %d records', 10, extra=dict(path='/evidence/mft', records=10)
+        )
+        try:
+            raise ValueError('bad record')
+        except ValueError:
+            logger.exception('failed')
+        self.writer.stop()
+        first, second = [json.loads(line) for line in self.stream.getvalue().splitlines()]
+        self.assertEqual(first['message'], 'parsed 10 records')
+        self.assertEqual((first['level'], first['logger']), ('WARNING', 'test.json'))
+        self.assertEqual((first['path'], first['records']), ('/evidence/mft', 10))
+        self.assertIn('ValueError: bad record', second['exception'])
+
+    def test_flush_interval(self):
+        """Buffered records written after flush_interval without stopping."""
+        self.writer = configure_logging(
+            self.stream, logger='test.flush', flush_interval=0.05
+        )
+        logging.getLogger('test.flush').info('one')
+        deadline = time.monotonic() + 5
+        while not self.stream.getvalue() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIn('one', self.stream.getvalue())
+
+    def test_capacity(self):
+        """Full buffer written in one batch."""
+        self.writer = configure_logging(
+            self.stream, logger='test.capacity', capacity=10, flush_interval=60
+        )
+        for index in range(25):
+            logging.getLogger('test.capacity').info('record %d', index)
+        deadline = time.monotonic() + 5
+        while len(self.stream.getvalue().splitlines()) < 20 and \
+            time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.stream.getvalue().splitlines()), 20)
+        self.writer.stop()
+        self.assertEqual(len(self.stream.getvalue().splitlines()), 25)
+
+    def test_worker_processes(self):
+        """Worker processes log through the writer's queue."""
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'tasks.log')
+            self.writer = configure_logging(
+                filename=filename,
+                structured=True,
+                logger='test.workers',
+                multiprocess=True
+            )
+            with ProcessPoolExecutor(
+                max_workers=2,
+                initializer=configure_worker_logging,
+                initargs=(self.writer.queue,)
+            ) as pool:
+                self.assertEqual(sorted(pool.map(_work, range(4))), [0, 1, 2, 3])
+            self.writer.stop()
+            with open(filename) as log_file:
+                messages = sorted(json.loads(line)['message'] for line in log_file)
+        self.assertEqual(messages, ['processed %d'%value for value in range(4)])
@@ -0,0 +1,266 @@
+## -*- coding: UTF-8 -*-
+## test_manifest.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Any
+
+from unittest import TestCase
+import os
+import sys
+import tempfile
+import time
+from threading import Barrier, Thread
+
+from ..patterns import RegistryMetaclassMixin
+from ..manifest import RegistryManifest
+
+
+class ManifestMetaClass(RegistryMetaclassMixin, type):
+    _REGISTRY = dict()
+    _INDEXED_ATTRIBUTES = ('extension',)
+
+    @classmethod
+    def _add_class(cls, name: str, new_cls: Any) -> None:
+        if name.find('Base') != -1:
+            return
+        cls._register_class(name, new_cls)
+
+
+MODULE_SOURCE = '''
+from %s import ManifestMetaClass
+
+class %s(metaclass=ManifestMetaClass):
+    extension = %r
+'''
+
+SLOW_MODULE_SOURCE = '''
+import time
+from %s import ManifestMetaClass, EXECUTIONS
+
+EXECUTIONS.append(__name__)
+time.sleep(0.05)
+
+class %s(metaclass=ManifestMetaClass):
+    extension = %r
+'''
+
+EXECUTIONS = list()
+
+
+class TestRegistryManifest(TestCase):
+    """Unit tests for RegistryManifest and lazy registries."""
+
+    def setUp(self):
+        """Create plugin package on sys.path with two plugin modules."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.package = 'manifest_plugins_%d'%id(self)
+        package_path = os.path.join(self.directory.name, self.package)
+        os.mkdir(package_path)
+        self.mtime = int(time.time())
+        with open(os.path.join(package_path, '__init__.py'), 'w'):
+            pass
+        self.write_plugin('alpha', 'AlphaPlugin', '.a')
+        self.write_plugin('beta', 'BetaPlugin', '.b')
+        self.manifest_path = os.path.join(self.directory.name, 'manifest.json')
+        sys.path.insert(0, self.directory.name)
+        ManifestMetaClass._REGISTRY = dict()        #pylint: disable=W0212
+        ManifestMetaClass._INDEXES = None           #pylint: disable=W0212
+        ManifestMetaClass._MANIFEST = None          #pylint: disable=W0212
+
+    def write_plugin(self,
+        module: str,
+        name: str,
+        extension: str,
+        source: str = MODULE_SOURCE
+    ) -> None:
+        """Write plugin module defining class name."""
+        path = os.path.join(self.directory.name, self.package, module + '.py')
+        with open(path, 'w') as plugin_file:
+            plugin_file.write(source%(__name__, name, extension))
+        self.mtime += 10
+        os.utime(path, (self.mtime, self.mtime))
+
+    def simulate_restart(self) -> None:
+        """Forget plugin modules and registered classes."""
+        for module in list(sys.modules):
+            if module.startswith(self.package):
+                del sys.modules[module]
+        ManifestMetaClass._REGISTRY = dict()        #pylint: disable=W0212
+        ManifestMetaClass._INDEXES = None           #pylint: disable=W0212
+        ManifestMetaClass._MANIFEST = None          #pylint: disable=W0212
+
+    def tearDown(self):
+        """Remove plugin package."""
+        self.simulate_restart()
+        sys.path.remove(self.directory.name)
+        self.directory.cleanup()
+
+    def test_discover_records_entries(self):
+        """Discovery records every registered class in package."""
+        manifest = RegistryManifest.load(self.manifest_path)
+        ManifestMetaClass.use_manifest(manifest, package=self.package)
+        self.assertEqual(
+            sorted(manifest.entries),
+            ['AlphaPlugin', 'BetaPlugin']
+        )
+        self.assertEqual(
+            manifest.entries['AlphaPlugin'].module,
+            self.package + '.alpha'
+        )
+        self.assertTrue(os.path.exists(self.manifest_path))
+
+    def test_lazy_import_on_retrieve(self):
+        """Fresh modules are only imported on first retrieve."""
+        ManifestMetaClass.use_manifest(
+            RegistryManifest.load(self.manifest_path),
+            package=self.package
+        )
+        self.simulate_restart()
+        ManifestMetaClass.use_manifest(
+            RegistryManifest.load(self.manifest_path),
+            package=self.package
+        )
+        self.assertNotIn(self.package + '.alpha', sys.modules)
+        plugin = ManifestMetaClass.retrieve('AlphaPlugin')
+        self.assertEqual(plugin.__name__, 'AlphaPlugin')
+        self.assertIn(self.package + '.alpha', sys.modules)
+        self.assertNotIn(self.package + '.beta', sys.modules)
+
+    def test_retrieve_by_uses_manifest_metadata(self):
+        """Indexed lookups import only matching modules."""
+        ManifestMetaClass.use_manifest(
+            RegistryManifest.load(self.manifest_path),
+            package=self.package
+        )
+        self.simulate_restart()
+        ManifestMetaClass.use_manifest(
+            RegistryManifest.load(self.manifest_path),
+            package=self.package
+        )
+        plugins = ManifestMetaClass.retrieve_by('extension', '.b')
+        self.assertEqual([plugin.__name__ for plugin in plugins], ['BetaPlugin'])
+        self.assertNotIn(self.package + '.alpha', sys.modules)
+
+    def test_changed_module_is_rediscovered(self):
+        """Entries of a module that changed are never served."""
+        ManifestMetaClass.use_manifest(
+            RegistryManifest.load(self.manifest_path),
+            package=self.package
+        )
+        self.simulate_restart()
+        self.write_plugin('alpha', 'GammaPlugin', '.g')
+        manifest = RegistryManifest.load(self.manifest_path)
+        ManifestMetaClass.use_manifest(manifest, package=self.package)
+        self.assertNotIn('AlphaPlugin', manifest.entries)
+        self.assertIsNone(ManifestMetaClass.retrieve('AlphaPlugin'))
+        self.assertEqual(
+            ManifestMetaClass.retrieve('GammaPlugin').__name__, 'GammaPlugin'
+        )
+
+    def test_changed_module_detected_on_resolve(self):
+        """Modules changed after discovery are re-recorded on retrieve."""
+        ManifestMetaClass.use_manifest(
+            RegistryManifest.load(self.manifest_path),
+            package=self.package
+        )
+        self.simulate_restart()
+        manifest = RegistryManifest.load(self.manifest_path)
+        ManifestMetaClass.use_manifest(manifest)
+        self.write_plugin('beta', 'DeltaPlugin', '.d')
+        self.assertIsNone(ManifestMetaClass.retrieve('BetaPlugin'))
+        self.assertIn('DeltaPlugin', manifest.entries)
+
+    def test_touched_module_with_same_contents_is_fresh(self):
+        """Only an mtime change does not invalidate entries."""
+        ManifestMetaClass.use_manifest(
+            RegistryManifest.load(self.manifest_path),
+            package=self.package
+        )
+        path = os.path.join(self.directory.name, self.package, 'alpha.py')
+        os.utime(path, (1, 1))
+        manifest = RegistryManifest.load(self.manifest_path)
+        self.assertTrue(manifest.is_fresh(self.package + '.alpha'))
+        self.assertTrue(manifest.modified)
+
+    def test_removed_module_is_forgotten(self):
+        """Entries of deleted modules are dropped."""
+        ManifestMetaClass.use_manifest(
+            RegistryManifest.load(self.manifest_path),
+            package=self.package
+        )
+        os.remove(os.path.join(self.directory.name, self.package, 'beta.py'))
+        manifest = RegistryManifest.load(self.manifest_path)
+        manifest.discover_package(ManifestMetaClass, self.package)
+        self.assertEqual(sorted(manifest.entries), ['AlphaPlugin'])
+
+    def test_removed_module_detected_on_resolve(self):
+        """Retrieving a class of a deleted module forgets the module."""
+        ManifestMetaClass.use_manifest(
+            RegistryManifest.load(self.manifest_path),
+            package=self.package
+        )
+        self.simulate_restart()
+        manifest = RegistryManifest.load(self.manifest_path)
+        ManifestMetaClass.use_manifest(manifest)
+        os.remove(os.path.join(self.directory.name, self.package, 'beta.py'))
+        self.assertIsNone(ManifestMetaClass.retrieve('BetaPlugin'))
+        self.assertEqual(sorted(manifest.entries), ['AlphaPlugin'])
+        self.assertEqual(
+            sorted(RegistryManifest.load(self.manifest_path).entries),
+            ['AlphaPlugin']
+        )
+        self.assertEqual(
+            ManifestMetaClass.retrieve('AlphaPlugin').__name__, 'AlphaPlugin'
+        )
+
+    def test_load_invalid_manifest(self):
+        """Invalid manifest files load as empty manifests."""
+        with open(self.manifest_path, 'w') as manifest_file:
+            manifest_file.write('not json')
+        manifest = RegistryManifest.load(self.manifest_path)
+        self.assertEqual(manifest.entries, dict())
+        self.assertTrue(manifest.modified)
+
+    def test_concurrent_resolve(self):
+        """Threads retrieving a changed module's class reload it once."""
+        ManifestMetaClass.use_manifest(
+            RegistryManifest.load(self.manifest_path),
+            package=self.package
+        )
+        ManifestMetaClass._REGISTRY = dict()        #pylint: disable=W0212
+        self.write_plugin('alpha', 'AlphaPlugin', '.z', SLOW_MODULE_SOURCE)
+        del EXECUTIONS[:]
+        barrier = Barrier(8)
+        plugins = list()
+
+        def retrieve():
+            barrier.wait()
+            plugins.append(ManifestMetaClass.retrieve('AlphaPlugin'))
+
+        threads = [Thread(target=retrieve) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(EXECUTIONS, [self.package + '.alpha'])
+        self.assertEqual(len(plugins), 8)
+        self.assertEqual({plugin.extension for plugin in plugins}, {'.z'})
@@ -0,0 +1,150 @@
+## -*- coding: UTF-8 -*-
+## test_mapreduce.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Any, Iterable, Sequence
+
+import io
+import os
+import tempfile
+from unittest import TestCase
+
+from ..patterns import Container
+from ..task import TaskStatus
+from ..mapreduce import split_range, split_records, SplittableTask
+
+
+class LineSumTask(SplittableTask):
+    """Sums the integers on each line of a file."""
+
+    def _preamble(self, path: str, chunk_size: int, bad_offset: int = -1) -> None:
+        """@BaseTask._preamble"""
+        self.path = path
+        self.chunk_size = chunk_size
+        self.bad_offset = bad_offset
+
+    def _split(self) -> Iterable[Any]:
+        """@SplittableTask._split"""
+        return split_records(self.path, self.chunk_size)
+
+    def _process_chunk(self, chunk: Any) -> Container:
+        """@SplittableTask._process_chunk"""
+        offset, length = chunk
+        if offset == self.bad_offset:
+            raise ValueError('corrupt range')
+        with open(self.path, 'rb') as input_file:
+            input_file.seek(offset)
+            lines = input_file.read(length).splitlines()
+        return Container(total=sum(int(line) for line in lines), lines=len(lines))
+
+    def _reduce(self, states: Sequence[Container]) -> Container:
+        """@SplittableTask._reduce"""
+        return Container(
+            total=sum(state.total for state in states),
+            lines=sum(state.lines for state in states)
+        )
+
+
+class CrashingLineSumTask(LineSumTask):
+    """Kills its worker process on the chunk at bad_offset."""
+
+    def _process_chunk(self, chunk: Any) -> Container:
+        """@SplittableTask._process_chunk"""
+        if chunk[0] == self.bad_offset:
+            os._exit(1)                 #pylint: disable=W0212
+        return super()._process_chunk(chunk)
+
+
+class TestSplitting(TestCase):
+    """Unit tests for split_range and split_records."""
+
+    def test_split_range(self):
+        """Ranges cover size and start at multiples of alignment."""
+        self.assertEqual(split_range(10, 4), [(0, 4), (4, 4), (8, 2)])
+        self.assertEqual(
+            split_range(2048, 1000, alignment=512),
+            [(0, 512), (512, 512), (1024, 512), (1536, 512)]
+        )
+        self.assertEqual(split_range(0, 4), [])
+
+    def test_split_records(self):
+        """Ranges end on record delimiters."""
+        data = b'aaaa\nbb\ncccccc\nd\n'
+        ranges = split_records(io.BytesIO(data), 3)
+        self.assertEqual(b''.join(data[o:o + n] for o, n in ranges), data)
+        for offset, length in ranges:
+            self.assertTrue(data[offset:offset + length].endswith(b'\n'))
+        self.assertEqual(ranges[0], (0, 5))
+
+    def test_split_records_multibyte_delimiter(self):
+        """Delimiters spanning read blocks are found."""
+        data = b'xxxxx\r\nyyyyy\r\nzz'
+        ranges = split_records(io.BytesIO(data), 2, delimiter=b'\r\n', block_size=3)
+        self.assertEqual(ranges, [(0, 7), (7, 7), (14, 2)])
+
+
+class TestSplittableTask(TestCase):
+    """Unit tests for SplittableTask."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'numbers.txt')
+        with open(self.path, 'wb') as input_file:
+            input_file.write(b''.join(b'%d\n'%number for number in range(1000)))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_processes(self):
+        """Chunks processed in worker processes and reduced."""
+        result = LineSumTask(max_workers=2).run(self.path, 500)
+        self.assertEqual(result.status, TaskStatus.SUCCESS)
+        self.assertEqual(result.state.total, sum(range(1000)))
+        self.assertEqual(result.state.lines, 1000)
+        self.assertNotIn('failed_chunks', result.state)
+
+    def test_failed_chunk(self):
+        """Failed chunk yields PARTIAL_SUCCESS listing its range."""
+        ranges = split_records(self.path, 500)
+        result = LineSumTask(use_processes=False).run(self.path, 500, ranges[1][0])
+        self.assertEqual(result.status, TaskStatus.PARTIAL_SUCCESS)
+        self.assertEqual(len(result.state.failed_chunks), 1)
+        self.assertEqual(tuple(result.state.failed_chunks[0].chunk), ranges[1])
+        self.assertEqual(result.state.failed_chunks[0].error, 'corrupt range')
+        self.assertLess(result.state.lines, 1000)
+
+    def test_all_chunks_failed(self):
+        """Result fails if every chunk fails."""
+        with open(self.path, 'wb') as input_file:
+            input_file.write(b'1\n')
+        result = LineSumTask(use_processes=False).run(self.path, 500, 0)
+        self.assertEqual(result.status, TaskStatus.FAILURE)
+        self.assertEqual(result.state.total, 0)
+
+    def test_crashed_worker(self):
+        """Chunks on a crashed worker fail without aborting the run."""
+        ranges = split_records(self.path, 500)
+        result = CrashingLineSumTask(max_workers=1).run(self.path, 500, ranges[1][0])
+        self.assertEqual(result.status, TaskStatus.PARTIAL_SUCCESS)
+        failed = [failure.chunk for failure in result.state.failed_chunks]
+        self.assertIn(ranges[1], failed)
+        self.assertLess(len(failed), len(ranges))
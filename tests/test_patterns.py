@@ -24,6 +24,7 @@
 from typing import Any
 
 from unittest import TestCase
+from threading import Thread
 from ..patterns import RegistryMetaclassMixin, Container
 
 
@@ -57,6 +58,59 @@ class AnotherMetaClass(RegistryMetaclassMixin, type):
         pass
 
 
+class IndexedMetaClass(RegistryMetaclassMixin, type):
+    _REGISTRY = dict()
+    _INDEXED_ATTRIBUTES = ('tag', 'extensions')
+
+    @classmethod
+    def _add_class(cls, name: str, new_cls: Any) -> None:
+        if name.find('Base') != -1:
+            return
+        cls._register_class(name, new_cls)
+
+
+class IndexedBaseClass(metaclass=IndexedMetaClass):
+    tag = None
+    extensions = None
+
+
+class IndexedImplementationA(IndexedBaseClass):
+    tag = 'alpha'
+    extensions = ('.a', '.shared')
+
+
+class IndexedImplementationB(IndexedBaseClass):
+    tag = 'beta'
+    extensions = ['.b', '.shared']
+
+
+class SignatureMetaClass(RegistryMetaclassMixin, type):
+    _REGISTRY = dict()
+    _SIGNATURE_ATTRIBUTE = 'signatures'
+
+    @classmethod
+    def _add_class(cls, name: str, new_cls: Any) -> None:
+        if name.find('Base') != -1:
+            return
+        cls._register_class(name, new_cls)
+
+
+class SignatureBaseClass(metaclass=SignatureMetaClass):
+    signatures = None
+
+
+class PortableExecutable(SignatureBaseClass):
+    signatures = b'MZ'
+
+
+class MasterFileTableEntry(SignatureBaseClass):
+    signatures = (b'FILE0', b'BAAD')
+
+
+class TapeArchive(SignatureBaseClass):
+    signatures = ((257, b'ustar'),)
+
+
 class TestRegistryMixin(TestCase):
     """Unit tests for RegistryMetaclassMixin."""
 
@@ -83,6 +137,107 @@ class TestRegistryMixin(TestCase):
         """MetaClass and AnotherMetaClass have different registries."""
         self.assertIsNot(MetaClass._REGISTRY, AnotherMetaClass._REGISTRY) #pylint: disable=W0212
 
+    def test_registry_is_read_only(self):
+        """registry returns a read-only view."""
+        with self.assertRaises(TypeError):
+            MetaClass.registry()['ImplementationC'] = None
+
+    def test_retrieve_by_single_value(self):
+        """Classes indexed by scalar attribute."""
+        self.assertEqual(
+            IndexedMetaClass.retrieve_by('tag', 'alpha'),
+            (IndexedImplementationA,)
+        )
+
+    def test_retrieve_by_multiple_values(self):
+        """Classes indexed by each element of sequence attribute."""
+        self.assertEqual(
+            IndexedMetaClass.retrieve_by('extensions', '.shared'),
+            (IndexedImplementationA, IndexedImplementationB)
+        )
+        self.assertEqual(
+            IndexedMetaClass.retrieve_by('extensions', '.b'),
+            (IndexedImplementationB,)
+        )
+
+    def test_retrieve_by_missing_value(self):
+        """No class indexed under value."""
+        self.assertEqual(IndexedMetaClass.retrieve_by('tag', 'gamma'), tuple())
+
+    def test_retrieve_by_unindexed_attribute(self):
+        """Attribute not declared in _INDEXED_ATTRIBUTES."""
+        self.assertRaises(KeyError, IndexedMetaClass.retrieve_by, 'version', 1)
+
+    def test_register_replaces_previous_class(self):
+        """Re-registering a name replaces the class in every index."""
+        class IndexedMetaClassCopy(IndexedMetaClass):
+            _REGISTRY = dict()
+        class ImplementationC(metaclass=IndexedMetaClassCopy):
+            tag = 'old'
+        original = ImplementationC
+        class ImplementationC(metaclass=IndexedMetaClassCopy): #pylint: disable=E0102
+            tag = 'new'
+        self.assertIs(IndexedMetaClassCopy.retrieve('ImplementationC'), ImplementationC)
+        self.assertIsNot(ImplementationC, original)
+        self.assertEqual(IndexedMetaClassCopy.retrieve_by('tag', 'old'), tuple())
+        self.assertEqual(IndexedMetaClassCopy.retrieve_by('tag', 'alpha'), tuple())
+        self.assertEqual(
+            IndexedMetaClassCopy.retrieve_by('tag', 'new'),
+            (ImplementationC,)
+        )
+
+    def test_registry_snapshot_unaffected_by_registration(self):
+        """A registry view taken before registration does not change."""
+        class IndexedMetaClassCopy(IndexedMetaClass):
+            _REGISTRY = dict()
+        snapshot = IndexedMetaClassCopy.registry()
+        class ImplementationD(metaclass=IndexedMetaClassCopy): #pylint: disable=W0612
+            pass
+        self.assertNotIn('ImplementationD', snapshot)
+        self.assertIn('ImplementationD', IndexedMetaClassCopy.registry())
+
+    def test_identify(self):
+        """Classes identified by declared signatures."""
+        self.assertEqual(SignatureMetaClass.identify(b'MZ\x90'), (PortableExecutable,))
+        self.assertEqual(SignatureMetaClass.identify(b'BAAD'), (MasterFileTableEntry,))
+        self.assertEqual(
+            SignatureMetaClass.identify(bytes(257) + b'ustar'),
+            (TapeArchive,)
+        )
+
+    def test_identify_no_match(self):
+        """No registered class matches buffer."""
+        self.assertEqual(SignatureMetaClass.identify(b'\x00' * 16), tuple())
+
+    def test_identify_without_signature_attribute(self):
+        """identify is empty if registry does not declare signatures."""
+        self.assertEqual(IndexedMetaClass.identify(b'MZ'), tuple())
+
+    def test_identify_after_registration(self):
+        """Matcher is rebuilt after a new class is registered."""
+        class SignatureMetaClassCopy(SignatureMetaClass):
+            _REGISTRY = dict()
+        class Zip(metaclass=SignatureMetaClassCopy):
+            signatures = b'PK\x03\x04'
+        self.assertEqual(SignatureMetaClassCopy.identify(b'PK\x03\x04'), (Zip,))
+        class Gzip(metaclass=SignatureMetaClassCopy):
+            signatures = b'\x1f\x8b'
+        self.assertEqual(SignatureMetaClassCopy.identify(b'\x1f\x8b\x08'), (Gzip,))
+
+    def test_concurrent_registration(self):
+        """Classes registered from many threads are all retained."""
+        class IndexedMetaClassCopy(IndexedMetaClass):
+            _REGISTRY = dict()
+        def register(i):
+            IndexedMetaClassCopy('Implementation%d'%i, tuple(), dict(tag='threaded'))
+        threads = [Thread(target=register, args=(i,)) for i in range(32)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(IndexedMetaClassCopy.registry()), 32)
+        self.assertEqual(len(IndexedMetaClassCopy.retrieve_by('tag', 'threaded')), 32)
+
 
 class TestContainer(TestCase):
     """Unit tests for Container."""
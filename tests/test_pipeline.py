@@ -0,0 +1,198 @@
+## -*- coding: UTF-8 -*-
+## test_pipeline.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Optional
+
+from unittest import TestCase
+import threading
+import time
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult, BaseTask
+from ..pipeline import FailurePolicy, TaskPipeline
+
+
+class SourceTask(BaseTask):
+    """Task producing a list of numbers."""
+
+    def _preamble(self, count: int = 3) -> None:   #pylint: disable=W0221
+        """@BaseTask._preamble"""
+        self.count = count
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        self.result = TaskResult(
+            TaskStatus.SUCCESS,
+            Container(numbers=list(range(self.count)))
+        )
+
+
+class SumTask(BaseTask):
+    """Task summing the values of every upstream result."""
+
+    def _preamble(self, *previous_results: TaskResult) -> None:  #pylint: disable=W0221
+        """@BaseTask._preamble"""
+        self.previous_results = previous_results
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(numbers=[
+            sum(sum(result.state.numbers) for result in self.previous_results)
+        ]))
+
+
+class FailingTask(BaseTask):
+    """Task that always raises."""
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        raise RuntimeError('stage failed')
+
+
+class PartialTask(BaseTask):
+    """Task that partially succeeds."""
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        self.result = TaskResult(TaskStatus.PARTIAL_SUCCESS, Container(numbers=[1]))
+
+
+class BarrierTask(BaseTask):
+    """Task that only completes if another task runs concurrently."""
+    barrier: Optional[threading.Barrier] = None
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        BarrierTask.barrier.wait(timeout=5)
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(numbers=[]))
+
+
+class SlowTask(SourceTask):
+    """Source task that takes a noticeable amount of time."""
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        time.sleep(0.05)
+        super()._process_task()
+
+
+class TestTaskPipeline(TestCase):
+    """Unit tests for TaskPipeline."""
+
+    def test_linear_pipeline(self):
+        """State passed from one stage to the next."""
+        pipeline = TaskPipeline() \
+            .add_stage('source', SourceTask) \
+            .add_stage('sum', SumTask, ['source'])
+        result = pipeline.run(5)
+        self.assertEqual(result.status, TaskStatus.SUCCESS)
+        self.assertEqual(result.state.sum.state.numbers, [10])
+
+    def test_fan_in(self):
+        """Stage receives results of every dependency in order."""
+        pipeline = TaskPipeline() \
+            .add_stage('left', SourceTask) \
+            .add_stage('right', SourceTask) \
+            .add_stage('sum', SumTask, ['left', 'right'])
+        result = pipeline(4)
+        self.assertEqual(result.state.sum.state.numbers, [12])
+
+    def test_route(self):
+        """Route maps upstream results to run arguments."""
+        pipeline = TaskPipeline() \
+            .add_stage('source', SourceTask) \
+            .add_stage('count', SourceTask, ['source'],
+                route=lambda upstream: (
+                    (len(upstream.source.state.numbers) * 2,),
+                    dict()
+                ))
+        result = pipeline(2)
+        self.assertEqual(result.state['count'].state.numbers, [0, 1, 2, 3])
+
+    def test_independent_branches_run_concurrently(self):
+        """Independent stages run at the same time."""
+        BarrierTask.barrier = threading.Barrier(2)
+        pipeline = TaskPipeline(max_workers=2) \
+            .add_stage('a', BarrierTask) \
+            .add_stage('b', BarrierTask)
+        self.assertEqual(pipeline().status, TaskStatus.SUCCESS)
+
+    def test_skip_downstream_policy(self):
+        """Stages downstream of a failure are skipped, others run."""
+        pipeline = TaskPipeline() \
+            .add_stage('bad', FailingTask) \
+            .add_stage('after_bad', SumTask, ['bad']) \
+            .add_stage('last', SumTask, ['after_bad']) \
+            .add_stage('good', SourceTask)
+        result = pipeline()
+        self.assertEqual(result.status, TaskStatus.PARTIAL_SUCCESS)
+        self.assertEqual(result.state.bad.state.error_type, 'RuntimeError')
+        self.assertTrue(result.state.after_bad.state.skipped)
+        self.assertEqual(result.state.after_bad.state.failed, ['bad'])
+        self.assertTrue(result.state.last.state.skipped)
+        self.assertEqual(result.state.good.status, TaskStatus.SUCCESS)
+
+    def test_halt_policy(self):
+        """No stages start after a failure."""
+        pipeline = TaskPipeline(max_workers=1, policy=FailurePolicy.HALT) \
+            .add_stage('bad', FailingTask) \
+            .add_stage('good', SourceTask, ['bad'])
+        result = pipeline()
+        self.assertEqual(result.status, TaskStatus.FAILURE)
+        self.assertTrue(result.state.good.state.skipped)
+
+    def test_continue_policy(self):
+        """Failed results passed downstream."""
+        pipeline = TaskPipeline(policy=FailurePolicy.CONTINUE) \
+            .add_stage('partial', PartialTask) \
+            .add_stage('sum', SumTask, ['partial'])
+        result = pipeline()
+        self.assertEqual(result.state.sum.state.numbers, [1])
+
+    def test_partial_is_failure(self):
+        """PARTIAL_SUCCESS can be treated as failure."""
+        pipeline = TaskPipeline(partial_is_failure=True) \
+            .add_stage('partial', PartialTask) \
+            .add_stage('sum', SumTask, ['partial'])
+        result = pipeline()
+        self.assertTrue(result.state.sum.state.skipped)
+
+    def test_invalid_stages(self):
+        """Duplicate stages and unknown dependencies are rejected."""
+        pipeline = TaskPipeline().add_stage('a', SourceTask)
+        self.assertRaises(ValueError, pipeline.add_stage, 'a', SourceTask)
+        self.assertRaises(ValueError, pipeline.add_stage, 'b', SumTask, ['c'])
+
+    def test_timings_and_critical_path(self):
+        """Per-stage timings and critical path recorded."""
+        pipeline = TaskPipeline() \
+            .add_stage('fast', SourceTask) \
+            .add_stage('slow', SlowTask) \
+            .add_stage('sum', SumTask, ['fast', 'slow'])
+        pipeline()
+        self.assertGreaterEqual(pipeline.timings['slow'].duration, 0.05)
+        self.assertGreaterEqual(
+            pipeline.timings['sum'].start,
+            pipeline.timings['slow'].end
+        )
+        self.assertEqual(pipeline.critical_path(), ['slow', 'sum'])
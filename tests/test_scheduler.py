@@ -0,0 +1,248 @@
+## -*- coding: UTF-8 -*-
+## test_scheduler.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Any, List, Optional
+
+import os
+import time
+from threading import Event, Lock
+from unittest import TestCase
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult, BaseTask
+from ..scheduler import ResourceScheduler
+
+
+class SleepTask(BaseTask):
+    """Records when it ran and how many tasks ran at once."""
+    lock = Lock()
+    active = 0
+    peak = 0
+    order: List[Any] = list()
+
+    def __init__(self, name: Any = None, **costs: Any) -> None:
+        super().__init__()
+        self.name = name
+        for attribute, value in costs.items():
+            setattr(self, attribute, value)
+
+    def _preamble(self, duration: float = 0.01, release: Optional[Event] = None) -> None:
+        """@BaseTask._preamble"""
+        self.duration = duration
+        self.release = release
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+            cls.order.append(self.name)
+        if self.release is not None:
+            self.release.wait(5)
+        time.sleep(self.duration)
+        with cls.lock:
+            cls.active -= 1
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(name=self.name))
+
+
+class GreedyTask(BaseTask):
+    """Raises MemoryError unless given enough memory."""
+    attempts = 0
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        type(self).attempts += 1
+        if type(self).attempts < 3:
+            raise MemoryError()
+        self.result = TaskResult(TaskStatus.SUCCESS, Container())
+
+
+class CrashTask(BaseTask):
+    """Kills its worker process if crash is set."""
+
+    def _preamble(self, crash: bool = False) -> None:
+        """@BaseTask._preamble"""
+        self.crash = crash
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        if self.crash:
+            os._exit(1)     #pylint: disable=W0212
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(pid=os.getpid()))
+
+
+class AllocateTask(BaseTask):
+    """Allocates size bytes."""
+
+    def _preamble(self, size: int = 0) -> None:
+        """@BaseTask._preamble"""
+        self.size = size
+
+    def _process_task(self) -> None:
+        """@BaseTask._process_task"""
+        data = bytearray(self.size)
+        self.result = TaskResult(TaskStatus.SUCCESS, Container(size=len(data)))
+
+
+def wait_running(scheduler: ResourceScheduler, count: int) -> None:
+    """Wait until count tasks are running."""
+    deadline = time.monotonic() + 5
+    while scheduler.metrics.running < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+class TestResourceScheduler(TestCase):
+    """Unit tests for ResourceScheduler."""
+
+    def setUp(self):
+        SleepTask.active = 0
+        SleepTask.peak = 0
+        SleepTask.order = list()
+        GreedyTask.attempts = 0
+
+    def test_cpu_budget(self):
+        """Running tasks never exceed the CPU budget."""
+        with ResourceScheduler(cpu_budget=2, max_workers=8) as scheduler:
+            futures = [scheduler.submit(SleepTask(index)) for index in range(8)]
+            results = [future.result(5) for future in futures]
+        self.assertTrue(all(result.status == TaskStatus.SUCCESS for result in results))
+        self.assertEqual(SleepTask.peak, 2)
+        metrics = scheduler.metrics
+        self.assertEqual(
+            (metrics.completed, metrics.queue_depth, metrics.running),
+            (8, 0, 0)
+        )
+        self.assertGreater(metrics.wait_max, 0.0)
+        self.assertGreater(metrics.mean_cpu_utilization, 0.0)
+
+    def test_memory_budget_and_priority(self):
+        """Tasks admitted by priority while they fit the memory budget."""
+        release = Event()
+        with ResourceScheduler(cpu_budget=4, memory_budget=100) as scheduler:
+            blocker = scheduler.submit(
+                SleepTask('blocker', memory_cost=60), release=release
+            )
+            wait_running(scheduler, 1)
+            futures = [
+                scheduler.submit(SleepTask('low', memory_cost=50), priority=0),
+                scheduler.submit(SleepTask('high', memory_cost=50), priority=5)
+            ]
+            time.sleep(0.05)
+            metrics = scheduler.metrics
+            self.assertEqual((metrics.running, metrics.queue_depth), (1, 2))
+            self.assertEqual(metrics.memory_utilization, 0.6)
+            release.set()
+            for future in [blocker] + futures:
+                future.result(5)
+        self.assertEqual(SleepTask.order, ['blocker', 'high', 'low'])
+
+    def test_over_budget(self):
+        """Tasks costlier than a budget fail immediately."""
+        with ResourceScheduler(cpu_budget=1, memory_budget=10) as scheduler:
+            result = scheduler.submit(SleepTask(memory_cost=11)).result(5)
+        self.assertEqual(result.status, TaskStatus.FAILURE)
+        self.assertEqual(result.state.reason, 'over_budget')
+        self.assertEqual(scheduler.metrics.rejected, 1)
+
+    def test_deadline(self):
+        """Queued and running tasks fail at their deadline."""
+        release = Event()
+        with ResourceScheduler(cpu_budget=1) as scheduler:
+            running = scheduler.submit(
+                SleepTask('running'), release=release, deadline=0.05
+            )
+            wait_running(scheduler, 1)
+            queued = scheduler.submit(SleepTask('queued'), deadline=0.05)
+            self.assertEqual(running.result(5).state.reason, 'deadline')
+            self.assertEqual(queued.result(5).state.reason, 'deadline')
+            self.assertEqual(scheduler.metrics.running, 1)
+            release.set()
+        self.assertEqual(SleepTask.order, ['running'])
+        self.assertEqual(scheduler.metrics.expired, 2)
+
+    def test_memory_error_rescheduled(self):
+        """MemoryError reschedules with a larger estimate, then fails."""
+        with ResourceScheduler(memory_budget=1000, max_retries=2) as scheduler:
+            result = scheduler.submit(GreedyTask(), memory=100).result(5)
+        self.assertEqual(result.status, TaskStatus.SUCCESS)
+        self.assertEqual(scheduler.metrics.rescheduled, 2)
+        GreedyTask.attempts = 0
+        with ResourceScheduler(max_retries=1) as scheduler:
+            result = scheduler.submit(GreedyTask()).result(5)
+        self.assertEqual(result.state.reason, 'memory')
+        self.assertEqual(result.state.attempts, 2)
+
+    def test_shutdown_without_wait(self):
+        """Queued tasks are cancelled by shutdown without wait."""
+        release = Event()
+        scheduler = ResourceScheduler(cpu_budget=1)
+        running = scheduler.submit(SleepTask(), release=release)
+        wait_running(scheduler, 1)
+        queued = scheduler.submit(SleepTask())
+        release.set()
+        scheduler.shutdown(wait=False)
+        self.assertEqual(queued.result(5).state.reason, 'cancelled')
+        self.assertEqual(running.result(5).status, TaskStatus.SUCCESS)
+        self.assertRaises(RuntimeError, scheduler.submit, SleepTask())
+
+    def test_worker_crash(self):
+        """A dead worker breaks the pool, which is replaced."""
+        with ResourceScheduler(
+            cpu_budget=1,
+            use_processes=True,
+            max_workers=1
+        ) as scheduler:
+            futures = [
+                scheduler.submit(CrashTask(), crash=index == 1) for index in range(4)
+            ]
+            results = [future.result(30) for future in futures]
+            self.assertTrue(scheduler._dispatcher.is_alive())   #pylint: disable=W0212
+            self.assertEqual(
+                scheduler.submit(CrashTask()).result(30).status, TaskStatus.SUCCESS
+            )
+        self.assertEqual(
+            [result.status for result in results],
+            [TaskStatus.SUCCESS, TaskStatus.FAILURE] + [TaskStatus.SUCCESS] * 2
+        )
+        self.assertEqual(results[1].state.reason, 'crashed')
+        self.assertEqual(results[1].state.attempts, 2)
+        metrics = scheduler.metrics
+        self.assertEqual((metrics.running, metrics.queue_depth), (0, 0))
+
+    def test_enforce_memory(self):
+        """Tasks over their memory cost raise MemoryError in process mode."""
+        if not os.path.exists('/proc/self/statm'):
+            self.skipTest('address space size unavailable')
+        with ResourceScheduler(
+            use_processes=True,
+            max_workers=1,
+            max_retries=0,
+            enforce_memory=True
+        ) as scheduler:
+            small = scheduler.submit(AllocateTask(), size=1 << 20, memory=64 << 20)
+            large = scheduler.submit(AllocateTask(), size=1 << 30, memory=64 << 20)
+            self.assertEqual(small.result(30).status, TaskStatus.SUCCESS)
+            self.assertEqual(large.result(30).state.reason, 'memory')
+            after = scheduler.submit(AllocateTask(), size=1 << 30).result(30)
+        self.assertEqual(after.status, TaskStatus.SUCCESS)
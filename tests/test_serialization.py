@@ -0,0 +1,114 @@
+## -*- coding: UTF-8 -*-
+## test_serialization.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+import pickle
+from multiprocessing import Pipe, Process
+from unittest import TestCase
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult
+from .. import serialization
+
+
+def _echo(connection) -> None:
+    """Receive an object and send it back."""
+    serialization.send(connection, serialization.recv(connection))
+    connection.close()
+
+
+class TestSerialization(TestCase):
+    """Unit tests for serialization."""
+
+    def setUp(self):
+        self.payload = bytes(range(256)) * 1024
+        self.result = TaskResult(
+            TaskStatus.PARTIAL_SUCCESS,
+            Container(
+                image=self.payload,
+                scratch=bytearray(self.payload),
+                words=memoryview(bytearray(self.payload)).cast('I'),
+                name='mft',
+                nested=Container(small=b'\x00\x01', count=3)
+            ),
+            Container(duration=1.5)
+        )
+
+    def assertRoundTrip(self, result):
+        self.assertIs(type(result), TaskResult)
+        self.assertEqual(result.status, TaskStatus.PARTIAL_SUCCESS)
+        self.assertIs(type(result.state), Container)
+        self.assertIs(type(result.state.image), bytes)
+        self.assertEqual(result.state.image, self.payload)
+        self.assertIs(type(result.state.scratch), bytearray)
+        self.assertEqual(result.state.scratch, self.payload)
+        self.assertEqual(result.state.words.format, 'I')
+        self.assertEqual(result.state.words.tobytes(), self.payload)
+        self.assertEqual(result.state.nested, dict(small=b'\x00\x01', count=3))
+        self.assertIs(type(result.state.nested), Container)
+        self.assertEqual(result.metrics.duration, 1.5)
+
+    def test_out_of_band(self):
+        """Large buffers are out of band and rebuilt without copies."""
+        data, buffers = serialization.dumps(self.result)
+        self.assertEqual(len(buffers), 3)
+        self.assertLess(len(data), 1024)
+        received = [bytes(buffer) for buffer in buffers]
+        result = serialization.loads(data, received)
+        self.assertRoundTrip(result)
+        self.assertIs(result.state.image, received[0])
+
+    def test_shared_buffer(self):
+        """A payload referenced twice is sent once and stays shared."""
+        payload = bytes(1 << 17)
+        scratch = bytearray(payload)
+        state = Container(a=payload, b=payload, scratch=[scratch, scratch])
+        data, buffers = serialization.dumps(state)
+        self.assertEqual(len(buffers), 2)
+        result = serialization.loads(data, [bytes(buffer) for buffer in buffers])
+        self.assertIs(result.a, result.b)
+        self.assertIs(result.scratch[0], result.scratch[1])
+        self.assertEqual(result.a, payload)
+
+    def test_in_band(self):
+        """Everything is in band below threshold."""
+        data, buffers = serialization.dumps(self.result, threshold=1 << 30)
+        self.assertEqual(buffers, [])
+        self.assertRoundTrip(serialization.loads(data))
+
+    def test_compact(self):
+        """TaskResult encodes smaller than with plain pickle."""
+        result = TaskResult(TaskStatus.SUCCESS, Container(count=1))
+        data, _ = serialization.dumps(result)
+        self.assertLess(len(data), len(pickle.dumps(result, protocol=5)))
+        self.assertEqual(serialization.loads(data).state, dict(count=1))
+
+    def test_send_recv(self):
+        """Results round trip through another process."""
+        parent, child = Pipe()
+        process = Process(target=_echo, args=(child,))
+        process.start()
+        try:
+            serialization.send(parent, self.result)
+            self.assertRoundTrip(serialization.recv(parent))
+        finally:
+            process.join()
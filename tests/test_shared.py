@@ -0,0 +1,149 @@
+## -*- coding: UTF-8 -*-
+## test_shared.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+import os
+import pickle
+import signal
+import subprocess
+import sys
+import time
+from multiprocessing import Pipe, Process
+from unittest import TestCase
+
+from ..patterns import Container
+from ..shared import SharedContainer
+
+
+PACKAGE = __name__.split('.')[0]
+PACKAGE_PARENT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+def _lookup(shared: SharedContainer, connection) -> None:
+    """Look up keys of shared in a worker process."""
+    connection.send((
+        shared.known_files['notepad.exe'],
+        shared[7],
+        b'\x00\x01' in shared,
+        sorted(map(str, shared))
+    ))
+    shared.close()
+    connection.close()
+
+
+class TestSharedContainer(TestCase):
+    """Unit tests for SharedContainer."""
+
+    def setUp(self):
+        self.data = {
+            'known_files': {'notepad.exe': 'c0ffee'},
+            'timezone': 'UTC',
+            7: [1, 2, 3],
+            b'\x00\x01': None,
+            (1, 'a'): 1.5
+        }
+        self.shared = SharedContainer.create(self.data)
+
+    def tearDown(self):
+        self.shared.close()
+
+    def test_access(self):
+        """Container access API."""
+        self.assertEqual(self.shared.timezone, 'UTC')
+        self.assertEqual(self.shared['known_files'], {'notepad.exe': 'c0ffee'})
+        self.assertEqual(self.shared[(1, 'a')], 1.5)
+        self.assertIsNone(self.shared.get(b'\x00\x01', 'missing'))
+        self.assertEqual(self.shared.get('missing', 5), 5)
+        self.assertNotIn(8, self.shared)
+        self.assertNotIn([1], self.shared)
+        self.assertRaises(AttributeError, getattr, self.shared, 'missing')
+        self.assertRaises(AttributeError, setattr, self.shared, 'timezone', 'EST')
+        self.assertEqual(list(self.shared), list(self.data))
+        self.assertEqual(len(self.shared), 5)
+        self.assertIsInstance(self.shared.to_container(), Container)
+        self.assertEqual(self.shared.to_container(), self.data)
+
+    def test_large(self):
+        """Many keys with collisions are all found."""
+        data = {'%032x'%key: key for key in range(5000)}
+        with SharedContainer.create(data) as shared:
+            self.assertTrue(all(shared[key] == value for key, value in data.items()))
+            self.assertEqual(dict(shared), data)
+
+    def test_worker_attach(self):
+        """Workers attach through pickling and see the same data."""
+        parent, child = Pipe()
+        process = Process(target=_lookup, args=(self.shared, child))
+        process.start()
+        found = parent.recv()
+        process.join()
+        self.assertEqual(found[:3], ('c0ffee', [1, 2, 3], True))
+        attached = pickle.loads(pickle.dumps(self.shared))
+        self.assertEqual(attached.timezone, 'UTC')
+        attached.close()
+        self.assertTrue(attached.closed)
+        self.assertEqual(self.shared.timezone, 'UTC')
+
+    def test_owner_unlinks(self):
+        """Closing the owner unlinks the segment."""
+        name = self.shared.shm_name
+        self.shared.close()
+        self.assertRaises(ValueError, self.shared.get, 'timezone')
+        self.assertRaises(FileNotFoundError, SharedContainer.attach, name)
+
+    def test_empty(self):
+        """Empty mappings can be shared."""
+        with SharedContainer.create({}) as shared:
+            self.assertEqual(len(shared), 0)
+            self.assertNotIn('a', shared)
+
+    def test_creator_killed_after_worker_attach(self):
+        """The resource tracker unlinks the segment of a killed creator."""
+        if not os.path.isdir('/dev/shm'):
+            self.skipTest('requires /dev/shm')
+        creator = subprocess.Popen(
+            [sys.executable, '-c',
+                'import multiprocessing, sys, time\n'
+                'from %s.shared import SharedContainer\n'
+                'shared = SharedContainer.create(dict(timezone="UTC"))\n'
+                'with multiprocessing.get_context("spawn").Pool(1) as pool:\n'
+                '    assert pool.apply(len, (shared,)) == 1\n'
+                'print(shared.shm_name, flush=True)\n'
+                'time.sleep(60)\n'%PACKAGE
+            ],
+            cwd=PACKAGE_PARENT,
+            stdout=subprocess.PIPE,
+            text=True
+        )
+        try:
+            path = os.path.join('/dev/shm', creator.stdout.readline().strip().lstrip('/'))
+            self.assertTrue(os.path.exists(path))
+        finally:
+            creator.send_signal(signal.SIGKILL)
+            creator.wait()
+            creator.stdout.close()
+        deadline = time.monotonic() + 10
+        while os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,79 @@
+## -*- coding: UTF-8 -*-
+## test_signatures.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from unittest import TestCase
+
+from ..signatures import SignatureMatcher
+
+
+class TestSignatureMatcher(TestCase):
+    """Unit tests for SignatureMatcher."""
+
+    def setUp(self):
+        """Create matcher with anchored and unanchored signatures."""
+        self.matcher = SignatureMatcher()
+        self.matcher.add(b'MZ', 'pe')
+        self.matcher.add(b'FILE0', 'mft')
+        self.matcher.add(b'ustar', 'tar', 257)
+
+    def test_match_at_offset_zero(self):
+        """Signature at start of buffer."""
+        self.assertEqual(self.matcher.match(b'MZ\x90\x00'), ('pe',))
+
+    def test_match_at_offset(self):
+        """Signature at non-zero offset."""
+        buffer = bytes(257) + b'ustar\x0000'
+        self.assertEqual(self.matcher.match(buffer), ('tar',))
+
+    def test_no_match_at_wrong_offset(self):
+        """Anchored signature present at wrong offset."""
+        self.assertEqual(self.matcher.match(b'\x00MZ'), tuple())
+
+    def test_unanchored_match(self):
+        """Signature with offset None matches anywhere."""
+        self.matcher.add(b'\x55\xaa', 'boot', None)
+        self.assertIsNone(self.matcher.window)
+        self.assertEqual(self.matcher.match(bytes(510) + b'\x55\xaa'), ('boot',))
+
+    def test_overlapping_signatures_longest_first(self):
+        """Signatures sharing a prefix all match, longest first."""
+        self.matcher.add(b'MZ\x90', 'dos')
+        self.assertEqual(self.matcher.match(b'MZ\x90\x00'), ('dos', 'pe'))
+
+    def test_suffix_signature(self):
+        """Signature that is a suffix of another found via failure links."""
+        self.matcher.add(b'ZIP', 'suffix', None)
+        self.matcher.add(b'AZI', 'prefix', None)
+        self.assertEqual(self.matcher.match(b'AZIP'), ('suffix', 'prefix'))
+
+    def test_window(self):
+        """Window covers end of furthest anchored signature."""
+        self.assertEqual(self.matcher.window, 262)
+
+    def test_empty_signature(self):
+        """Empty signatures are rejected."""
+        self.assertRaises(ValueError, self.matcher.add, b'', 'empty')
+
+    def test_match_memoryview(self):
+        """Buffers may be memoryviews."""
+        self.assertEqual(self.matcher.match(memoryview(b'FILE0\x00')), ('mft',))
@@ -0,0 +1,252 @@
+## -*- coding: UTF-8 -*-
+## test_spill.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from ..patterns import Container
+from ..spill import SpillContainer, SpillStateMixin, estimate_size
+from ..task import BaseTask, TaskResult, TaskStatus
+
+
+class AccumulatingTask(SpillStateMixin, BaseTask):
+    """Task that accumulates blocks of output in its state."""
+    spill_memory_limit = 1<<16
+
+    def _preamble(self, blocks: int) -> None:
+        self.result = TaskResult(TaskStatus.FAILURE, Container(count=0))
+        self.blocks = blocks
+
+    def _process_task(self) -> None:
+        state = self.result.state
+        for index in range(self.blocks):
+            state['block_%d'%index] = bytes([index % 256]) * 8192
+            state.count += 1
+        self.result.status = TaskStatus.SUCCESS
+
+
+class RecordingTask(SpillStateMixin, BaseTask):
+    """Task that appends records to a list held in its state."""
+    spill_memory_limit = 1<<14
+
+    def _preamble(self, count: int) -> None:
+        self.result = TaskResult(TaskStatus.FAILURE, Container(records=list()))
+        self.count = count
+
+    def _process_task(self) -> None:
+        records = self.result.state.records
+        for index in range(self.count):
+            records.append(index)
+            self.result.state['block_%d'%index] = bytes([index % 256]) * 1024
+        self.result.status = TaskStatus.SUCCESS
+
+
+class TestSpillContainer(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make(self, **kwargs):
+        kwargs.setdefault('memory_limit', 1<<14)
+        return SpillContainer(directory=self.directory, **kwargs)
+
+    def test_container_access(self):
+        state = self.make(a=1)
+        state.b = 2
+        state['c'] = 3
+        self.assertEqual(state.a, 1)
+        self.assertEqual(state['b'], 2)
+        self.assertEqual(state.get('c'), 3)
+        self.assertIsNone(state.get('d'))
+        self.assertEqual(list(state), ['a', 'b', 'c'])
+        del state.a
+        self.assertNotIn('a', state)
+        with self.assertRaises(AttributeError):
+            state.a
+        with self.assertRaises(KeyError):
+            state['a']
+        self.assertEqual(dict(state), dict(b=2, c=3))
+        self.assertEqual(state, Container(b=2, c=3))
+        self.assertIsNone(state.path)
+
+    def test_spills_cold_values(self):
+        state = self.make()
+        for index in range(8):
+            state[index] = b'%d'%index * 4096
+        self.assertLessEqual(state.memory_size, state.memory_limit)
+        spilled = state.spilled_keys
+        self.assertTrue(spilled)
+        self.assertEqual(spilled[0], 0)
+        self.assertTrue(os.path.exists(state.path))
+        self.assertEqual(state[0], b'0' * 4096)
+        self.assertNotIn(0, state.spilled_keys)
+        self.assertEqual(state.stats.reloads, 1)
+        self.assertEqual(list(state), list(range(8)))
+        self.assertEqual(
+            dict(state),
+            {index: b'%d'%index * 4096 for index in range(8)}
+        )
+
+    def test_reloaded_immutable_values_are_not_rewritten(self):
+        state = self.make(memory_limit=10000, value_limit=1<<20)
+        state.a = b'a' * 6000
+        state.b = b'b' * 6000
+        state.c = [b'c' * 6000]
+        spills = state.stats.spills
+        self.assertEqual(state.a, b'a' * 6000)
+        self.assertEqual(state.b, b'b' * 6000)
+        self.assertEqual(state.stats.spills, spills + 1)
+        state.b = b'new' * 2000
+        state.a
+        self.assertEqual(state.b, b'new' * 2000)
+        self.assertEqual(state.c, [b'c' * 6000])
+
+    def test_spills_large_values_first(self):
+        state = self.make(value_limit=1<<13)
+        state.small = [b'x' * 100] * 10
+        state.large = b'y' * 10000
+        state.other = b'z' * 8000
+        self.assertEqual(state.spilled_keys, ('large',))
+        self.assertEqual(state.large, b'y' * 10000)
+
+    def test_overwrite_and_delete_spilled(self):
+        state = self.make()
+        state.old = b'a' * 20000
+        self.assertEqual(state.spilled_keys, ('old',))
+        state.old = 1
+        self.assertEqual(state.spilled_keys, tuple())
+        state.new = b'b' * 20000
+        del state.new
+        self.assertEqual(len(state), 1)
+        count, = state._connection.execute('SELECT COUNT(*) FROM spill').fetchone()
+        self.assertEqual(count, 0)
+
+    def test_unpicklable_values_stay_in_memory(self):
+        state = self.make(memory_limit=0)
+        lock = threading.Lock()
+        state.lock = lock
+        state.data = b'x' * 100
+        self.assertIs(state.lock, lock)
+        self.assertEqual(state.spilled_keys, ('data',))
+
+    def test_read_mutable_values_stay_in_memory(self):
+        state = self.make(memory_limit=2000)
+        state.index = {'k': [1]}
+        entry = state.index['k']
+        state.big = bytes(5000)
+        entry.append(2)
+        state.spill()
+        self.assertEqual(state.spilled_keys, ('big',))
+        self.assertEqual(state.index, {'k': [1, 2]})
+        state.index = state.index
+        state.spill()
+        self.assertEqual(set(state.spilled_keys), {'index', 'big'})
+        reloaded = state.index
+        reloaded['k'].append(3)
+        state.spill()
+        self.assertEqual(state.index, {'k': [1, 2, 3]})
+
+    def test_assigned_values_remeasured(self):
+        state = self.make(memory_limit=10000, value_limit=1<<20)
+        state.records = list()
+        records = state.records
+        for index in range(200):
+            records.append(b'%04d'%index * 25)
+        self.assertLess(state.memory_size, 1000)
+        state.spill()
+        self.assertEqual(state.spilled_keys, tuple())
+        state.records = records
+        self.assertEqual(state.spilled_keys, ('records',))
+        self.assertGreater(state.stats.spilled_bytes, 20000)
+        self.assertEqual(state.records, [b'%04d'%index * 25 for index in range(200)])
+
+    def test_spill_and_pickle(self):
+        state = self.make(a=[1, 2, 3], b='text')
+        state.spill()
+        self.assertEqual(state.memory_size, 0)
+        self.assertEqual(set(state.spilled_keys), {'a', 'b'})
+        copy = pickle.loads(pickle.dumps(state))
+        self.assertIsInstance(copy, SpillContainer)
+        self.assertEqual(copy.memory_limit, state.memory_limit)
+        self.assertEqual(copy.to_container(), Container(a=[1, 2, 3], b='text'))
+
+    def test_close_removes_database(self):
+        state = self.make()
+        state.data = b'x' * 20000
+        path = state.path
+        state.close()
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(len(state), 0)
+        state = self.make()
+        state.data = b'x' * 20000
+        path = state.path
+        del state
+        self.assertFalse(os.path.exists(path))
+
+    def test_estimate_size(self):
+        self.assertGreaterEqual(estimate_size(b'x' * 1000), 1000)
+        self.assertEqual(estimate_size(memoryview(bytearray(500))), 500)
+        nested = [b'x' * 1000 for _ in range(100)]
+        self.assertGreaterEqual(estimate_size(nested), 100000)
+        self.assertGreaterEqual(estimate_size({'k': nested}), 100000)
+
+
+class TestSpillStateMixin(TestCase):
+    def test_task_state_spills(self):
+        directory = tempfile.mkdtemp()
+        try:
+            task = AccumulatingTask()
+            task.spill_directory = directory
+            result = task.run(32)
+            self.assertEqual(result.status, TaskStatus.SUCCESS)
+            state = result.state
+            self.assertIsInstance(state, SpillContainer)
+            self.assertEqual(state.count, 32)
+            self.assertLessEqual(state.memory_size, 1<<16)
+            self.assertTrue(state.spilled_keys)
+            self.assertEqual(state.block_0, b'\x00' * 8192)
+            state.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_records_appended_in_place(self):
+        directory = tempfile.mkdtemp()
+        try:
+            task = RecordingTask()
+            task.spill_directory = directory
+            state = task.run(200).state
+            self.assertTrue(state.spilled_keys)
+            self.assertEqual(state.records, list(range(200)))
+            state.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_none_result(self):
+        task = AccumulatingTask()
+        self.assertIsNone(task.result)
@@ -0,0 +1,132 @@
+## -*- coding: UTF-8 -*-
+## test_stream.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from typing import Any, Iterator
+
+from unittest import TestCase
+
+from ..task import TaskStatus
+from ..stream import StreamingTask
+
+
+class CountingTask(StreamingTask):
+    """Streams batches of numbers, optionally failing part way through."""
+
+    def _preamble(self,                 #pylint: disable=W0221
+        batches: int = 3,
+        fail_after: int = -1
+    ) -> None:
+        """@BaseTask._preamble"""
+        self.batches = batches
+        self.fail_after = fail_after
+        self.produced = 0
+        self.closed = False
+
+    def _process_task(self) -> Iterator[Any]:
+        """@StreamingTask._process_task"""
+        for batch in range(self.batches):
+            if batch == self.fail_after:
+                raise IOError('read error')
+            self.produced += 1
+            yield [batch * 10 + offset for offset in range(10)]
+
+    def _postamble(self) -> None:
+        """@BaseTask._postamble"""
+        self.closed = True
+
+
+class TestStreamingTask(TestCase):
+    """Unit tests for StreamingTask."""
+
+    def test_direct_stream(self):
+        """Results streamed in consumer's thread."""
+        task = CountingTask()
+        batches = list(task.stream(3))
+        self.assertEqual(len(batches), 3)
+        self.assertEqual(batches[2][0], 20)
+        self.assertEqual(task.result.status, TaskStatus.SUCCESS)
+        self.assertEqual(task.result.state.produced, 3)
+        self.assertTrue(task.closed)
+
+    def test_buffered_stream(self):
+        """Results streamed from producer thread."""
+        task = CountingTask(buffer_size=2)
+        self.assertEqual(len(list(task.stream(50))), 50)
+        self.assertEqual(task.result.status, TaskStatus.SUCCESS)
+        self.assertTrue(task.closed)
+
+    def test_backpressure(self):
+        """Producer runs at most buffer_size items ahead of consumer."""
+        task = CountingTask(buffer_size=2)
+        stream = task.stream(100)
+        for consumed in range(1, 20):
+            next(stream)
+            # queued items plus the item blocked waiting to be queued
+            self.assertLessEqual(task.produced, consumed + 2 + 1)
+        stream.close()
+
+    def test_error_after_progress(self):
+        """Error after producing results is a partial success."""
+        for buffer_size in (0, 2):
+            with self.subTest(buffer_size=buffer_size):
+                task = CountingTask(buffer_size=buffer_size)
+                self.assertEqual(len(list(task.stream(5, fail_after=2))), 2)
+                self.assertEqual(task.result.status, TaskStatus.PARTIAL_SUCCESS)
+                self.assertEqual(task.result.state.error_type, 'OSError')
+                self.assertTrue(task.closed)
+
+    def test_error_before_progress(self):
+        """Error before producing results is a failure."""
+        for buffer_size in (0, 2):
+            with self.subTest(buffer_size=buffer_size):
+                task = CountingTask(buffer_size=buffer_size)
+                self.assertEqual(list(task.stream(5, fail_after=0)), list())
+                self.assertEqual(task.result.status, TaskStatus.FAILURE)
+
+    def test_consumer_stops_early(self):
+        """Closing the stream early cancels the producer."""
+        for buffer_size in (0, 2):
+            with self.subTest(buffer_size=buffer_size):
+                task = CountingTask(buffer_size=buffer_size)
+                stream = task.stream(100)
+                next(stream)
+                stream.close()
+                self.assertEqual(task.result.status, TaskStatus.PARTIAL_SUCCESS)
+                self.assertTrue(task.result.state.cancelled)
+                self.assertTrue(task.closed)
+
+    def test_unstarted_stream(self):
+        """Nothing runs until the stream is iterated."""
+        for buffer_size in (0, 2):
+            task = CountingTask(buffer_size=buffer_size)
+            stream = task.stream(3)
+            self.assertFalse(hasattr(task, 'produced'))
+            stream.close()
+            self.assertFalse(hasattr(task, 'produced'))
+            self.assertIsNone(task.result)
+
+    def test_run_collects_records(self):
+        """run collects every streamed result."""
+        result = CountingTask()(2)
+        self.assertEqual(result.status, TaskStatus.SUCCESS)
+        self.assertEqual(len(result.state.records), 2)
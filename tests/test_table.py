@@ -0,0 +1,146 @@
+## -*- coding: UTF-8 -*-
+## test_table.py
+##
+## Copyright (c) 2019 analyzeDFIR
+##
+## Permission is hereby granted, free of charge, to any person obtaining a copy
+## of this software and associated documentation files (the "Software"), to deal
+## in the Software without restriction, including without limitation the rights
+## to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+## copies of the Software, and to permit persons to whom the Software is
+## furnished to do so, subject to the following conditions:
+##
+## The above copyright notice and this permission notice shall be included in all
+## copies or substantial portions of the Software.
+##
+## THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+## IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+## FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+## AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+## LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+## OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+## SOFTWARE.
+
+from unittest import TestCase
+import pickle
+
+from ..patterns import Container
+from ..task import TaskStatus, TaskResult
+from ..table import ContainerTable
+
+
+def make_rows():
+    """Rows of a small file listing."""
+    return [
+        Container(name='a.txt', size=10, owner='alice', score=1.5),
+        Container(name='b.exe', size=300, owner='bob', score=2.0),
+        Container(name='c.txt', size=20, owner='alice', score=0.5),
+        Container(name='d.dll', size=300, owner='carol', score=3.0),
+    ]
+
+
+class TestContainerTable(TestCase):
+    """Unit tests for ContainerTable."""
+
+    def setUp(self):
+        """Create table with batch size smaller than the number of rows."""
+        self.table = ContainerTable(make_rows(), batch_size=3)
+
+    def test_schema_inference(self):
+        """Typecodes inferred from first batch."""
+        self.assertEqual(
+            self.table.schema,
+            dict(name='O', size='q', owner='O', score='d')
+        )
+        self.assertEqual(self.table.num_rows, 4)
+
+    def test_row_views(self):
+        """Rows are Container-compatible views."""
+        row = self.table.row(1)
+        self.assertEqual(row.name, 'b.exe')
+        self.assertEqual(row['size'], 300)
+        self.assertEqual(row.get('missing'), None)
+        self.assertEqual(dict(self.table.row(-1))['owner'], 'carol')
+        self.assertEqual(
+            [row.to_container() for row in self.table.rows()],
+            make_rows()
+        )
+
+    def test_columns(self):
+        """Columns accessible as items and attributes."""
+        self.assertEqual(list(self.table.size), [10, 300, 20, 300])
+        self.assertEqual(list(self.table['name']), ['a.txt', 'b.exe', 'c.txt', 'd.dll'])
+        self.assertEqual(sorted(self.table), ['name', 'owner', 'score', 'size'])
+
+    def test_filter(self):
+        """Rows filtered by comparison."""
+        filtered = self.table.filter('size', '>', 15)
+        self.assertEqual(list(filtered.name), ['b.exe', 'c.txt', 'd.dll'])
+        filtered = self.table.filter('owner', 'in', ('alice', 'carol'))
+        self.assertEqual(list(filtered.name), ['a.txt', 'c.txt', 'd.dll'])
+
+    def test_compress_combined_masks(self):
+        """Masks combined element-wise."""
+        mask = [
+            left and right for left, right in zip(
+                self.table.where('size', '==', 300),
+                self.table.where('score', '>=', 3.0)
+            )
+        ]
+        self.assertEqual(list(self.table.compress(mask).name), ['d.dll'])
+        self.assertRaises(ValueError, self.table.compress, [True])
+
+    def test_sort(self):
+        """Stable sort ascending and descending."""
+        self.assertEqual(
+            list(self.table.sort('size').name),
+            ['a.txt', 'c.txt', 'b.exe', 'd.dll']
+        )
+        self.assertEqual(
+            list(self.table.sort('size', reverse=True).name),
+            ['b.exe', 'd.dll', 'c.txt', 'a.txt']
+        )
+
+    def test_group_by(self):
+        """Rows grouped by field value."""
+        groups = self.table.group_by('owner')
+        self.assertEqual(sorted(groups), ['alice', 'bob', 'carol'])
+        self.assertEqual(list(groups['alice'].name), ['a.txt', 'c.txt'])
+        groups = self.table.group_by('size')
+        self.assertEqual(list(groups[300].name), ['b.exe', 'd.dll'])
+
+    def test_aggregate(self):
+        """Aggregates computed per group."""
+        self.assertEqual(self.table.aggregate('owner'), dict(alice=2, bob=1, carol=1))
+        self.assertEqual(self.table.aggregate('owner', 'size', 'sum')['alice'], 30)
+        self.assertEqual(self.table.aggregate('size', 'score', 'max')[300], 3.0)
+        self.assertEqual(self.table.aggregate('owner', 'score', 'mean')['alice'], 1.0)
+        self.assertRaises(ValueError, self.table.aggregate, 'owner', 'size', 'median')
+
+    def test_type_change_converts_column(self):
+        """Values not fitting a typed column convert it to a list column."""
+        self.table.append(Container(name='e', size='unknown', owner='dave', score=1.0))
+        self.assertEqual(self.table.schema['size'], 'O')
+        self.assertEqual(list(self.table.size), [10, 300, 20, 300, 'unknown'])
+
+    def test_new_field(self):
+        """Fields first seen after ingestion are filled with None."""
+        self.table.append(
+            Container(name='e', size=1, owner='dave', score=1.0, extra=True)
+        )
+        self.assertEqual(list(self.table.extra), [None, None, None, None, True])
+
+    def test_append_after_column_export(self):
+        """Exported columns keep their contents when rows are appended."""
+        sizes = self.table.size
+        self.table.extend(make_rows())
+        self.assertEqual(len(sizes), 4)
+        self.assertEqual(self.table.num_rows, 8)
+        self.assertEqual(list(self.table.size)[4:], [10, 300, 20, 300])
+
+    def test_task_result_state(self):
+        """Tables pickle and can be used as TaskResult.state."""
+        result = TaskResult(TaskStatus.SUCCESS, self.table)
+        result = pickle.loads(pickle.dumps(result))
+        self.assertEqual(list(result.state.size), [10, 300, 20, 300])
+        self.assertEqual(result.state.row(0).name, 'a.txt')
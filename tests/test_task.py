@@ -80,3 +80,33 @@ class TestTask(TestCase):
             previous_task_result = task()
             with self.subTest(i=i):
                 self.assertEqual(previous_task_result.status, TaskStatus.SUCCESS)
+
+    def test_from_exception(self):
+        """Failure result describes exception."""
+        try:
+            raise KeyError('missing')
+        except KeyError as exc:
+            result = TaskResult.from_exception(exc)
+        self.assertEqual(result.status, TaskStatus.FAILURE)
+        self.assertEqual(result.state.error_type, 'KeyError')
+        self.assertIn('missing', result.state.traceback)
+
+    def test_aggregate_status(self):
+        """Aggregate status of a group of tasks"""
+        self.assertEqual(TaskStatus.aggregate([]), TaskStatus.SUCCESS)
+        self.assertEqual(
+            TaskStatus.aggregate([TaskStatus.SUCCESS, TaskStatus.SUCCESS]),
+            TaskStatus.SUCCESS
+        )
+        self.assertEqual(
+            TaskStatus.aggregate([TaskStatus.FAILURE, TaskStatus.FAILURE]),
+            TaskStatus.FAILURE
+        )
+        self.assertEqual(
+            TaskStatus.aggregate([TaskStatus.SUCCESS, TaskStatus.FAILURE]),
+            TaskStatus.PARTIAL_SUCCESS
+        )
+        self.assertEqual(
+            TaskStatus.aggregate([TaskStatus.PARTIAL_SUCCESS]),
+            TaskStatus.PARTIAL_SUCCESS
+        )